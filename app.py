@@ -1,30 +1,43 @@
 import streamlit as st
-import json
 import os
-from datetime import datetime
-from typing import Sequence
-import autogen
-from autogen import AssistantAgent, GroupChat, GroupChatManager, ConversableAgent
-import openai
-from dotenv import load_dotenv
-import time
-
-# Load environment variables
-load_dotenv()
-
-# Configure OpenAI
-config_list = [
-    {
-        'model': 'gpt-4',
-        'api_key': os.getenv('OPENAI_API_KEY')
-    }
-]
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from config.model_routing import ROUTING_PROFILES, estimate_cost
+from doc_index import DocumentIndex
+from persona_cards import CARDS_DIR, PersonaCardCache
+from persona_store import LEGACY_JSON, STORE_PATH as PERSONA_STORE_PATH, PersonaStore
+from transcript_store import STORE_PATH as TRANSCRIPT_STORE_PATH, TranscriptStore
 
-# Set wider layout
+# Set wider layout; this has to be the first Streamlit command, before any
+# cached resource is built (older Streamlit renders a spinner for those)
 st.set_page_config(layout="wide")
 
+# Streamlit reruns this whole script on every interaction, so anything
+# expensive (the panel engine, .env parsing) lives in cached resources
+# that are built once per process and shared by all sessions
+
+@st.cache_resource
+def load_environment():
+    """Read .env once per process"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+load_environment()
+
+@st.cache_resource
+def get_engine():
+    """The backend panel engine and the loop thread every session's panels run on.
+
+    Imported when the first discussion starts, since it pulls in autogen
+    and the model clients. Discussions share its team pool, caches,
+    admission limits, metrics and transcript store with the API.
+    """
+    import engine
+    return engine, engine.EngineThread()
+
 # Custom CSS for wider components
-st.markdown("""
+WIDE_LAYOUT_CSS = """
     <style>
     .stTextInput > div > div > input {
         width: 100%;
@@ -36,270 +49,145 @@ st.markdown("""
         width: 100%;
     }
     </style>
-""", unsafe_allow_html=True)
-
-# Initialize session state for personas and participants
-if 'personas' not in st.session_state:
-    st.session_state.personas = []
-    # Add default host persona
-    st.session_state.personas.append({
-        'name': 'Host',
-        'description': 'A warm and professional radio show host who guides conversations, asks insightful questions, and ensures balanced participation.',
-        'is_host': True,
-        'created_at': datetime.now().isoformat()
-    })
+"""
+st.markdown(WIDE_LAYOUT_CSS, unsafe_allow_html=True)
+
+@st.cache_resource
+def get_persona_store():
+    """Persona catalog shared by every session and the API (imports personas.json on first run)"""
+    return PersonaStore(os.getenv('PERSONA_STORE_PATH', PERSONA_STORE_PATH), legacy_json=LEGACY_JSON)
+
+PERSONAS_PER_PAGE = 20
 
+@st.cache_resource
+def get_persona_cards():
+    """Distilled cards for long persona descriptions, on disk where the engine keeps them"""
+    return PersonaCardCache(os.getenv('PERSONA_CARDS_DIR', CARDS_DIR))
+
+def card_caption(card):
+    return (f"Persona card: {card.source_tokens:,} → {card.tokens:,} tokens per prompt "
+            f"({card.reduction():.0%} fewer, {card.distiller})")
+
+@st.cache_resource
+def get_transcript_store():
+    """Finished discussions, written by the engine and shared with the backend's /episodes endpoints"""
+    return TranscriptStore(os.getenv('TRANSCRIPT_STORE_PATH', TRANSCRIPT_STORE_PATH))
+
+# Initialize session state for participants
 if 'participants' not in st.session_state:
     st.session_state.participants = []
     # Add host as default participant
     st.session_state.participants.append({
         'role': 'Host',
-        'persona': st.session_state.personas[0]
+        'persona': get_persona_store().host()
     })
 
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
+@st.cache_resource
+def get_document_index():
+    """Shared retrieval index over documents/, loaded in the background"""
+    index = DocumentIndex()
+    index.warm()
+    return index
+
 def process_name(name):
     """Convert spaces to underscores and remove special characters"""
     return "".join(name.split())
 
-def save_personas():
-    """Save personas to a JSON file"""
-    with open('personas.json', 'w') as f:
-        json.dump([{k: v for k, v in p.items() if k != 'created_at'} 
-                  for p in st.session_state.personas], f)
-
-def load_personas():
-    """Load personas from JSON file"""
-    if os.path.exists('personas.json'):
-        with open('personas.json', 'r') as f:
-            personas = json.load(f)
-            for p in personas:
-                p['created_at'] = datetime.now().isoformat()
-            st.session_state.personas = personas
-
-def create_agent_configs(participants):
-    """Create agent configurations for autogen"""
-    configs = {}
-    
-    # Get list of participant names for host's reference
-    participant_names = [p['persona']['name'] for p in participants if not p['persona'].get('is_host')]
-    
-    # Create config for each participant
-    for participant in participants:
-        name = participant['persona']['name']
-        description = participant['persona']['description']
-        
-        # Special config for host
-        if participant['persona'].get('is_host'):
-            system_message = f"""You are the host of 'Starry Night Talks' radio show.
-            Available participants: {', '.join(participant_names)}
-
-            Speaking style:
-            - Warm and professional tone
-            - Precise, brief questions
-            - Maximum 2 sentences per response
-            
-            Dialogue structure:
-            1. Opening: Welcome and introduce the topic
-            2. Interaction: Ask targeted questions to ONLY the available participants listed above
-            3. Summary: Extract key insights from the discussion
-            
-            Must follow:
-            - Only interact with the listed participants
-            - Guide discussion between available participants only
-            - Keep responses focused and concise"""
-        else:
-            system_message = f"""You are {name}.
-            Background and expertise:
-            {description}
-            
-            Speaking requirements:
-            - Maximum 2 sentences per response
-            - Must include specific details from your background
-            - Share relevant experiences and insights
-            
-            Interaction rules:
-            - Actively resonate with other participants' experiences
-            - Stay true to your character and expertise"""
-            
-        configs[name] = {
-            "name": name,
-            "system_message": system_message
-        }
-    
-    return configs
+def debug(label, value):
+    """Show a debug dump only when the sidebar debug toggle is on"""
+    if st.session_state.get('debug'):
+        st.write(f"Debug - {label}:", value)
 
-def create_group_chat(participants, user_input):
-    """Create and configure the group chat with agents"""
-    
-    # Create agent configurations
-    agent_configs = create_agent_configs(participants)
-    
-    # Create the agents
-    agents = []
-    for name, config in agent_configs.items():
-        agent = AssistantAgent(
-            name=config["name"],
-            system_message=config["system_message"],
-            llm_config={
-                "config_list": config_list
-            }
-        )
-        agents.append(agent)
-    
-    # Create the group chat
-    group_chat = GroupChat(
-        agents=agents,
-        messages=[],
-        max_round=12
-    )
-    
-    # Create the manager
-    manager = GroupChatManager(
-        groupchat=group_chat,
-        llm_config={
-            "config_list": config_list
-        }
-    )
+def stream_chat(user_input, participants):
+    """Run the panel on the shared engine and yield each turn as it is spoken.
+
+    Turns arrive token by token; an unfinished turn is yielded with
+    'partial' set and its text so far.
+    """
+    engine, runner = get_engine()
+    from panel import PROTOCOL_DELTAS
+    personas = [p['persona'] for p in participants]
+    roster = engine.Roster.from_store(personas[0], personas[1:], stream=True,
+                                      routing=st.session_state.get('routing', ''),
+                                      cards=engine.persona_cards)
+    names = {name: config.get('display_name', name) for name, config in roster.configs.items()}
+    st.session_state.turn_spans = []
+    st.session_state.early_stop = None
+    st.session_state.usage = None
     
-    return group_chat, manager
+    partial = ''
+    for event in runner.stream(engine.run_panel(roster, user_input, PROTOCOL_DELTAS)):
+        if event['type'] == 'delta':
+            partial += event['content']
+            yield {'role': names.get(event['speaker'], event['speaker']), 'content': partial, 'partial': True}
+        elif event['type'] == 'turn_end':
+            partial = ''
+            yield {'role': names.get(event['speaker'], event['speaker']), 'content': event['content']}
+        elif event['type'] == 'episode_end':
+            debug("Episode Stats", event['stats'])
+            st.session_state.turn_spans = event['stats'].get('turn_spans', [])
+            st.session_state.early_stop = event['stats'].get('termination')
+            st.session_state.usage = event['stats'].get('usage')
 
 def run_chat(user_input, participants):
     """Run the group chat and return messages"""
-    try:
-        group_chat, manager = create_group_chat(participants, user_input)
-        
-        # Add user's initial message
-        messages = [{
-            'role': 'user',
-            'content': user_input
-        }]
-        
-        # Set up the initial prompt
-        initial_prompt = (
-            f"Let's have a panel discussion about: {user_input}\n"
-            "The host should start by welcoming everyone and introducing the topic."
-        )
-        
-        # Run the chat
-        chat_result = manager.run(message=initial_prompt, max_turns=12)
-        
-        # Debug print
-        st.write("Debug - Chat Result:", chat_result)
-        
-        # Process the chat result
-        if hasattr(chat_result, 'chat_history'):
-            history = chat_result.chat_history
-            st.write("Debug - Chat History Length:", len(history))
-            
-            last_role = None
-            # Process each message in the chat history
-            for msg in history:
-                st.write("Debug - Raw Message:", msg)
-                
-                # Skip system messages and empty messages
-                if not msg or (hasattr(msg, 'role') and msg.role == 'system'):
-                    continue
-                
-                # Extract the content and role
-                content = None
-                role = None
-                
-                # Try different ways to get content
-                if isinstance(msg, str):
-                    content = msg
-                elif hasattr(msg, 'content'):
-                    content = msg.content
-                elif isinstance(msg, dict) and 'content' in msg:
-                    content = msg['content']
-                
-                # Try different ways to get role
-                if hasattr(msg, 'name'):
-                    role = msg.name
-                elif hasattr(msg, 'sender'):
-                    role = msg.sender
-                elif isinstance(msg, dict):
-                    role = msg.get('name') or msg.get('sender') or msg.get('role')
-                
-                # Skip if we couldn't get content or role
-                if not content or not role:
-                    continue
-                
-                # Clean up content if it starts with role
-                if content.startswith(f"{role}: "):
-                    content = content[len(f"{role}: "):]
-                
-                # Skip duplicate consecutive messages from same role
-                if role == last_role:
-                    continue
-                
-                last_role = role
-                
-                # Add the processed message
-                messages.append({
-                    'role': role,
-                    'content': content
-                })
-                st.write("Debug - Processed Message:", {
-                    'role': role,
-                    'content': content
-                })
-        
-        return messages
-    except Exception as e:
-        st.error(f"Error in run_chat: {str(e)}")
-        st.write("Debug - Exception details:", str(e))
-        import traceback
-        st.write("Debug - Traceback:", traceback.format_exc())
-        raise e
-
-def display_messages(messages, message_placeholder):
-    """Display messages in a streaming fashion"""
-    try:
-        full_response = ""
-        
-        # Debug print
-        st.write("Debug - Messages to display:", messages)
-        
-        # Add user message first
-        if messages and messages[0]['role'] == 'user':
-            full_response += f"👤 **You asked about:** {messages[0]['content']}\n\n"
-            message_placeholder.markdown(full_response)
-            time.sleep(1)  # Pause for effect
-        
-        # Display each message with a delay
-        for msg in messages[1:]:  # Skip the first message (user's question)
-            st.write("Debug - Processing message:", msg)
-            
-            # Skip if message is empty or has no content
-            if not msg or not msg.get('content'):
-                continue
-                
-            # Skip if content is just a repeat of the user's question
-            if msg['content'].endswith(messages[0]['content']):
-                continue
-            
-            # Add appropriate emoji based on role
-            emoji = "🎙️" if msg['role'].lower() == "host" else "👥"
-            
-            # Format the message
-            formatted_msg = f"{emoji} **{msg['role']}:** {msg['content']}\n\n"
-            
-            # Add to full response and display
+    messages = [{
+        'role': 'user',
+        'content': user_input
+    }]
+    messages.extend(msg for msg in stream_chat(user_input, participants) if not msg.get('partial'))
+    return messages
+
+def format_message(msg, user_input):
+    """Render one turn as markdown, or None if it should be hidden"""
+    # Skip if message is empty or has no content
+    if not msg or not msg.get('content'):
+        return None
+    
+    # Skip if content is just a repeat of the user's question
+    if msg['content'].endswith(user_input):
+        return None
+    
+    # Add appropriate emoji based on role
+    emoji = "🎙️" if msg['role'].lower() == "host" else "👥"
+    return f"{emoji} **{msg['role']}:** {msg['content']}\n\n"
+
+def stream_messages(user_input, participants, message_placeholder):
+    """Render each turn into the placeholder the moment it is produced"""
+    messages = [{
+        'role': 'user',
+        'content': user_input
+    }]
+    full_response = f"👤 **You asked about:** {user_input}\n\n"
+    message_placeholder.markdown(full_response)
+    
+    for msg in stream_chat(user_input, participants):
+        formatted_msg = format_message(msg, user_input)
+        if msg.get('partial'):
+            if formatted_msg:
+                message_placeholder.markdown(full_response + formatted_msg)
+            continue
+        debug("Processed Message", msg)
+        messages.append(msg)
+        if formatted_msg:
             full_response += formatted_msg
-            message_placeholder.markdown(full_response)
-            time.sleep(0.8)  # Add delay between messages
-            
-    except Exception as e:
-        st.error(f"Error in display_messages: {str(e)}")
-        st.write("Debug - Display error:", str(e))
-        raise e
+        message_placeholder.markdown(full_response)
+    
+    return messages
 
 # Page title
 st.title("Multi-Agent Discussion Panel")
 
+# Debug dumps are off unless explicitly requested
+st.sidebar.checkbox("Show debug output", key="debug")
+st.sidebar.checkbox("Show performance metrics", key="show_metrics")
+st.sidebar.selectbox("Model routing", options=[''] + list(ROUTING_PROFILES), key="routing",
+    format_func=lambda profile: profile or "Server default",
+    help="Which models the host, the speaker selector and the guests run on")
+
 # Create two columns for the layout
 left_col, right_col = st.columns([1, 1])
 
@@ -315,6 +203,16 @@ with right_col:
             key="persona_description",
             help="Describe the persona's background, personality, and expertise",
             height=150)
+        persona_documents = st.multiselect("Grounding Documents",
+            options=get_document_index().sources(),
+            key="persona_documents",
+            help="Files from documents/ this persona can draw facts from")
+        persona_tags = st.text_input("Tags",
+            key="persona_tags",
+            help="Comma-separated, e.g. history, music")
+        persona_model = st.text_input("Model",
+            key="persona_model",
+            help="Optional, e.g. gpt-4o; leave empty to follow the model routing")
         
         if st.button("Add Persona"):
             if persona_name and persona_description:
@@ -323,25 +221,78 @@ with right_col:
                     'name': processed_name,
                     'description': persona_description,
                     'is_host': False,
-                    'created_at': datetime.now().isoformat()
+                    'documents': persona_documents,
+                    'tags': persona_tags,
+                    'model': persona_model.strip()
                 }
-                st.session_state.personas.append(new_persona)
-                save_personas()
-                st.success(f"Added persona: {persona_name}")
-                st.rerun()
+                try:
+                    added = get_persona_store().add(new_persona)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    if added:
+                        # Long descriptions are distilled now rather than on the first discussion
+                        get_persona_cards().card(persona_description)
+                        st.success(f"Added persona: {persona_name}")
+                        st.rerun()
+                    else:
+                        st.error(f"A persona named {processed_name} already exists")
             else:
                 st.error("Please fill in both name and description")
 
-    # Display persona gallery
+    # Display persona gallery, one page at a time
     st.subheader("Available Personas")
-    for persona in st.session_state.personas:
-        if not persona.get('is_host'):  # Don't show host in gallery
-            with st.expander(f"{persona['name']}", expanded=False):
+    search_col, tag_col = st.columns([2, 1])
+    with search_col:
+        gallery_search = st.text_input("Search personas", key="gallery_search")
+    with tag_col:
+        gallery_tag = st.selectbox("Tag", options=['All'] + get_persona_store().tags(), key="gallery_tag")
+    
+    page = st.session_state.get('gallery_page', 0)
+    gallery, total = get_persona_store().query(
+        search=gallery_search,
+        tag=None if gallery_tag == 'All' else gallery_tag,
+        limit=PERSONAS_PER_PAGE,
+        offset=page * PERSONAS_PER_PAGE
+    )
+    # A search or delete can leave the current page past the end
+    if not gallery and page > 0:
+        st.session_state.gallery_page = 0
+        st.rerun()
+    
+    for persona in gallery:
+        with st.expander(f"{persona['name']}", expanded=False):
+            card = get_persona_cards().card(persona['description'])
+            if card:
+                # The card is what the panel sees; the source is only shown in part
+                st.caption(card_caption(card))
+                st.text(card.text())
+                description = persona['description']
+                st.write(description if len(description) <= 500 else description[:500].rstrip() + "…")
+            else:
                 st.write(persona['description'])
-                if st.button("Delete", key=f"del_{persona['name']}"):
-                    st.session_state.personas.remove(persona)
-                    save_personas()
-                    st.rerun()
+            if persona['tags']:
+                st.caption("Tags: " + ", ".join(persona['tags']))
+            if persona['documents']:
+                st.caption("Grounded in: " + ", ".join(persona['documents']))
+            if persona['model']:
+                st.caption("Model: " + persona['model'])
+            if st.button("Delete", key=f"del_{persona['name']}"):
+                get_persona_store().delete(persona['name'])
+                st.rerun()
+    
+    pages = max(1, -(-total // PERSONAS_PER_PAGE))
+    prev_col, info_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("Previous", disabled=page == 0):
+            st.session_state.gallery_page = page - 1
+            st.rerun()
+    with info_col:
+        st.caption(f"Page {page + 1} of {pages} ({total} personas)")
+    with next_col:
+        if st.button("Next", disabled=page + 1 >= pages):
+            st.session_state.gallery_page = page + 1
+            st.rerun()
 
 with left_col:
     st.header("Discussion Setup")
@@ -349,8 +300,8 @@ with left_col:
     # Participant selection
     st.subheader("Select Participants")
     
-    # Get non-host personas for selection
-    available_personas = [p for p in st.session_state.personas if not p.get('is_host')]
+    # Names only; full records are fetched for the selected personas
+    available_personas = get_persona_store().names()
     
     # Allow selecting up to 3 additional participants
     for i in range(3):
@@ -359,12 +310,12 @@ with left_col:
             if len(available_personas) > 0:
                 selected_persona = st.selectbox(
                     f"Participant {i+1}",
-                    options=['None'] + [p['name'] for p in available_personas],
+                    options=['None'] + available_personas,
                     key=f"participant_{i}"
                 )
                 
                 if selected_persona != 'None':
-                    persona = next(p for p in available_personas if p['name'] == selected_persona)
+                    persona = get_persona_store().get(selected_persona)
                     # Update participants list
                     participant_entry = {
                         'role': f'Participant {i+1}',
@@ -395,36 +346,73 @@ with left_col:
                 # Create a placeholder for the chat
                 message_placeholder = st.empty()
                 
-                with st.spinner("Starting discussion..."):
+                with st.spinner("Discussion in progress..."):
                     try:
                         # Clear previous chat history
                         st.session_state.chat_history = []
                         
-                        # Add user's question
-                        st.session_state.chat_history.append({
-                            'role': 'user',
-                            'content': user_input
-                        })
-                        
-                        # Run the chat
-                        messages = run_chat(user_input, active_participants)
+                        # Render turns as they are produced
+                        messages = stream_messages(user_input, active_participants, message_placeholder)
                         
-                        if messages:
-                            # Display messages in streaming fashion
-                            display_messages(
-                                messages,  # Remove the extra user message since it's already in messages
-                                message_placeholder
-                            )
-                            
+                        if len(messages) > 1:
                             # Store final messages in session state
-                            st.session_state.chat_history = messages  # Store all messages directly
+                            st.session_state.chat_history = messages
+                            early_stop = st.session_state.get('early_stop')
+                            if early_stop:
+                                st.info(f"Ended early: {early_stop['message']}. "
+                                        f"Saved {early_stop['turns_saved']} turns (~{early_stop['tokens_saved_estimate']} tokens).")
                         else:
                             st.error("No messages were generated from the chat.")
                         
                     except Exception as e:
                         st.error(f"An error occurred: {str(e)}")
-                        st.write("Debug - Full error:", e)
-                        import traceback
-                        st.write("Debug - Traceback:", traceback.format_exc())
+                        if st.session_state.get('debug'):
+                            import traceback
+                            debug("Traceback", traceback.format_exc())
+        else:
+            st.error("Please enter a topic or question") 
+
+    # Earlier discussions, shown from the transcript store at no model cost
+    st.subheader("Saved Episodes")
+    episode_search = st.text_input("Search topics", key="episode_search")
+    episodes, _ = get_transcript_store().query(search=episode_search, limit=PERSONAS_PER_PAGE)
+    if episodes:
+        chosen = st.selectbox(
+            "Episode",
+            options=[e['id'] for e in episodes],
+            format_func=lambda episode_id: next(
+                f"{e['topic']} ({', '.join(e['personas'])}, {e['created_at'][:16]})" for e in episodes if e['id'] == episode_id
+            ),
+            key="saved_episode"
+        )
+        if st.button("Show Episode"):
+            episode = get_transcript_store().get(chosen)
+            transcript = f"👤 **You asked about:** {episode['topic']}\n\n"
+            for message in episode['messages']:
+                formatted_msg = format_message({'role': message['speaker'], 'content': message['content']}, episode['topic'])
+                if formatted_msg:
+                    transcript += formatted_msg
+            st.markdown(transcript)
+    else:
+        st.caption("Finished discussions appear here.")
+
+if st.session_state.get('show_metrics'):
+    with st.sidebar:
+        st.subheader("Performance")
+        if st.session_state.get('turn_spans'):
+            st.caption("Last discussion, per turn")
+            st.dataframe(st.session_state.turn_spans, hide_index=True)
+        if st.session_state.get('early_stop'):
+            st.caption("Last discussion ended early")
+            st.json(st.session_state.early_stop)
+        if st.session_state.get('usage'):
+            cost = estimate_cost(st.session_state.usage)
+            st.caption("Last discussion, tokens per model" + (f" (about ${cost:.4f})" if cost is not None else ""))
+            st.dataframe([{'model': model, **tokens} for model, tokens in st.session_state.usage.items()], hide_index=True)
+        # Only a discussion loads the engine, so there is nothing to show before one
+        summary = get_engine()[0].metrics.summary() if 'engine' in sys.modules else []
+        if summary:
+            st.caption("All discussions since the server started (seconds, tokens)")
+            st.dataframe(summary, hide_index=True)
         else:
-            st.error("Please enter a topic or question") 
\ No newline at end of file
+            st.caption("Run a discussion to collect timings.")
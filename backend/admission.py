@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Sequence
+import httpx
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from model_clients import DelegatingChatCompletionClient
+
+
+def shared_http_client(max_connections: int, keepalive_expiry: float = 30.0,
+                       timeout: float = 120.0) -> httpx.AsyncClient:
+    """One connection pool for every model client in the process.
+
+    Sized to the completion cap so admitted requests never queue inside
+    httpx, and kept alive so panels reuse TLS connections between turns.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(timeout, connect=10.0),
+    )
+
+
+def key_id(api_key: str | None) -> str:
+    """Stable, non-secret label for an API key"""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
+
+
+class _Waiter:
+    def __init__(self, panel, key: str, model: str | None):
+        self.panel = panel
+        self.key = key
+        self.model = model
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.perf_counter()
+        self.announced = None
+
+
+class CompletionScheduler:
+    """Server-wide admission control for model completions.
+
+    At most `max_concurrent` completions run at once, at most
+    `max_per_key` per API key, and at most `model_limits[model]` per model
+    where one is set. Waiting requests are queued per panel and served
+    round-robin across panels, so one long panel cannot starve the
+    others. Waiting panels are told their queue position.
+    """
+
+    def __init__(self, max_concurrent: int = 16, max_per_key: int = 8,
+                 model_limits: dict[str, int] | None = None):
+        self.max_concurrent = max_concurrent
+        self.max_per_key = max_per_key
+        self.model_limits = model_limits or {}
+        self._active = 0
+        self._active_per_key: Counter = Counter()
+        self._active_per_model: Counter = Counter()
+        self._waiting: OrderedDict[str, deque[_Waiter]] = OrderedDict()
+        self.granted = 0
+        self.queued = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self, panel, key: str, model: str | None = None):
+        """Hold one completion slot for the duration of the block"""
+        if not self._waiting and self._has_capacity(key, model):
+            self._grant(key, model)
+        else:
+            await self._wait(panel, key, model)
+        try:
+            yield
+        finally:
+            self._release(key, model)
+
+    async def _wait(self, panel, key: str, model: str | None):
+        waiter = _Waiter(panel, key, model)
+        panel_id = panel.id if panel is not None else f"anonymous-{id(waiter)}"
+        self._waiting.setdefault(panel_id, deque()).append(waiter)
+        self.queued += 1
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller gave up; hand the slot back
+                self._release(key, model)
+            else:
+                self._remove(panel_id, waiter)
+            raise
+
+        waited = time.perf_counter() - waiter.enqueued_at
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _has_capacity(self, key: str, model: str | None) -> bool:
+        if model in self.model_limits and self._active_per_model[model] >= self.model_limits[model]:
+            return False
+        return self._active < self.max_concurrent and self._active_per_key[key] < self.max_per_key
+
+    def _grant(self, key: str, model: str | None):
+        self._active += 1
+        self._active_per_key[key] += 1
+        self._active_per_model[model] += 1
+        self.granted += 1
+
+    def _release(self, key: str, model: str | None):
+        self._active -= 1
+        self._active_per_key[key] -= 1
+        self._active_per_model[model] -= 1
+        self._dispatch()
+
+    def _remove(self, panel_id: str, waiter: _Waiter):
+        queue = self._waiting.get(panel_id)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._waiting[panel_id]
+        self._announce()
+
+    def _drop_abandoned(self):
+        # A cancelled caller's future is done before its cleanup has run;
+        # it must not be granted a slot nobody will release
+        for panel_id, queue in list(self._waiting.items()):
+            while queue and queue[0].future.done():
+                queue.popleft()
+            if not queue:
+                del self._waiting[panel_id]
+
+    def _dispatch(self):
+        # Serve the first panel in round-robin order whose next request
+        # fits, then move that panel to the back of the line
+        while True:
+            self._drop_abandoned()
+            for panel_id, queue in self._waiting.items():
+                waiter = queue[0]
+                if self._has_capacity(waiter.key, waiter.model):
+                    queue.popleft()
+                    if queue:
+                        self._waiting.move_to_end(panel_id)
+                    else:
+                        del self._waiting[panel_id]
+                    self._grant(waiter.key, waiter.model)
+                    waiter.future.set_result(None)
+                    if waiter.announced and waiter.panel is not None:
+                        waiter.panel.notify({"type": "queue", "position": 0})
+                    break
+            else:
+                break
+        self._announce()
+
+    def _announce(self):
+        for position, queue in enumerate(self._waiting.values(), start=1):
+            waiter = queue[0]
+            if waiter.announced != position and waiter.panel is not None:
+                waiter.panel.notify({"type": "queue", "position": position, "waiting_panels": len(self._waiting)})
+                waiter.announced = position
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "max_concurrent": self.max_concurrent,
+            "max_per_key": self.max_per_key,
+            "active_per_key": {key: count for key, count in self._active_per_key.items() if count},
+            "model_limits": self.model_limits,
+            "active_per_model": {model: count for model, count in self._active_per_model.items() if count and model},
+            "waiting_panels": len(self._waiting),
+            "waiting_requests": sum(len(queue) for queue in self._waiting.values()),
+            "granted": self.granted,
+            "queued": self.queued,
+            "avg_queue_wait_ms": 1000 * self.total_wait_seconds / self.queued if self.queued else 0.0,
+            "max_queue_wait_ms": 1000 * self.max_wait_seconds,
+        }
+
+
+class ThrottledChatCompletionClient(DelegatingChatCompletionClient):
+    """Takes a CompletionScheduler slot around every call to the wrapped client"""
+
+    def __init__(self, inner: ChatCompletionClient, scheduler: CompletionScheduler, key: str,
+                 model: str | None = None):
+        super().__init__(inner)
+        self.scheduler = scheduler
+        self.key = key
+        self.model = model
+        self.panel = None
+
+    def bind_panel(self, panel):
+        self.panel = panel
+        super().bind_panel(panel)
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        async with self.scheduler.slot(self.panel, self.key, self.model):
+            return await self.inner.create(messages, **kwargs)
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        async with self.scheduler.slot(self.panel, self.key, self.model):
+            async for chunk in self.inner.create_stream(messages, **kwargs):
+                yield chunk
@@ -0,0 +1,196 @@
+"""Run many panels from a topics file through the same engine as the API.
+
+    python batch.py topics.jsonl --out runs/2024-06 [--concurrency 4]
+
+Each line of the topics file is either a JSON object
+{"id": ..., "topic": ..., "personas": [...], "model": ..., "routing": ...}
+(everything but "topic" optional) or a plain-text topic for the default roster. Finished
+episodes are appended to <out>/episodes.jsonl and written as Markdown to
+<out>/episodes/<id>.md. Every finished turn is checkpointed, so running
+the same command again resumes an interrupted batch: finished episodes
+are skipped and unfinished ones replay their recorded completions
+instead of calling the model again.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from checkpoint import EpisodeJournal
+from config.agent_configs import AGENT_CONFIGS
+from engine import MODEL_ROUTING, TURN_DEADLINE_SECONDS, run_panel
+from panel import PROTOCOL_DELTAS, Panel
+from team_pool import DEFAULT_MODEL, Roster
+
+
+@dataclass
+class Episode:
+    id: str
+    topic: str
+    personas: list[str] | None = None
+    model: str = DEFAULT_MODEL
+    routing: str = ""
+
+
+def load_topics(path: Path) -> list[Episode]:
+    """Episodes from a topics file; ids default to a hash of topic and roster"""
+    episodes, seen = [], {}
+    for line in path.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        spec = json.loads(line) if line.startswith("{") else {"topic": line}
+        episode = Episode(
+            id=spec.get("id", ""),
+            topic=spec["topic"],
+            personas=spec.get("personas"),
+            model=spec.get("model", DEFAULT_MODEL),
+            routing=spec.get("routing", ""),
+        )
+        if not episode.id:
+            # Routing only joins the hash when set, so earlier runs keep their ids
+            key = [episode.topic, episode.personas, episode.model] + ([episode.routing] if episode.routing else [])
+            digest = hashlib.sha1(json.dumps(key).encode())
+            episode.id = digest.hexdigest()[:12]
+        # The same topic twice is two episodes
+        seen[episode.id] = seen.get(episode.id, 0) + 1
+        if seen[episode.id] > 1:
+            episode.id = f"{episode.id}-{seen[episode.id]}"
+        episodes.append(episode)
+    return episodes
+
+
+def render_markdown(episode: Episode, record: dict) -> str:
+    lines = [f"# {episode.topic}", "", f"*{', '.join(record['personas'])} · {record['model']} · {record['finished_at']}*", ""]
+    for turn in record["turns"]:
+        speaker = AGENT_CONFIGS.get(turn["speaker"], {}).get("display_name", turn["speaker"])
+        lines += [f"**{speaker}**: {turn['content']}", ""]
+    return "\n".join(lines)
+
+
+@dataclass
+class Throughput:
+    started_at: float = field(default_factory=time.perf_counter)
+    episodes: int = 0
+    failed: int = 0
+    skipped: int = 0
+    turns: int = 0
+    calls: int = 0
+    replayed: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    def add(self, journal: EpisodeJournal, turns: int):
+        self.episodes += 1
+        self.turns += turns
+        self.calls += journal.calls
+        self.replayed += journal.replayed
+        self.prompt_tokens += journal.prompt_tokens
+        self.completion_tokens += journal.completion_tokens
+
+    def report(self) -> dict:
+        seconds = time.perf_counter() - self.started_at
+        return {
+            "episodes": self.episodes,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "turns": self.turns,
+            "model_calls": self.calls,
+            "replayed_calls": self.replayed,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "seconds": round(seconds, 2),
+            "episodes_per_hour": round(3600 * self.episodes / seconds, 1) if seconds else 0.0,
+            "completion_tokens_per_second": round(self.completion_tokens / seconds, 1) if seconds else 0.0,
+        }
+
+
+class BatchRun:
+    """Runs episodes with at most `concurrency` panels at once"""
+
+    def __init__(self, out: Path, concurrency: int = 4):
+        self.out = out
+        self.concurrency = concurrency
+        self.results_path = out / "episodes.jsonl"
+        self.throughput = Throughput()
+
+    def finished_ids(self) -> set[str]:
+        if not self.results_path.exists():
+            return set()
+        with open(self.results_path) as f:
+            return {json.loads(line)["id"] for line in f if line.strip()}
+
+    async def run(self, episodes: list[Episode]) -> dict:
+        (self.out / "episodes").mkdir(parents=True, exist_ok=True)
+        done = self.finished_ids()
+        todo = [episode for episode in episodes if episode.id not in done]
+        self.throughput.skipped = len(episodes) - len(todo)
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def worker(episode: Episode):
+            async with slots:
+                try:
+                    await self.run_episode(episode)
+                except Exception as e:
+                    self.throughput.failed += 1
+                    print(f"{episode.id} failed: {e}", file=sys.stderr)
+
+        await asyncio.gather(*(worker(episode) for episode in todo))
+        return self.throughput.report()
+
+    async def run_episode(self, episode: Episode):
+        roster = Roster.create(episode.personas, model=episode.model, routing=episode.routing)
+        journal = EpisodeJournal(self.out / "checkpoints" / f"{episode.id}.json")
+        start = time.perf_counter()
+        turns, stop_reason = [], None
+
+        # Like /chat panels: cancellable, and saved to the transcript store when finished
+        panel = Panel(PROTOCOL_DELTAS, journal=journal, turn_deadline=TURN_DEADLINE_SECONDS)
+        async for event in run_panel(roster, episode.topic, PROTOCOL_DELTAS, panel):
+            if event["type"] == "turn_end":
+                turns.append({"turn": event["turn"], "speaker": event["speaker"], "content": event["content"]})
+                journal.checkpoint(turns)
+            elif event["type"] == "episode_end":
+                stop_reason = event["stop_reason"]
+
+        record = {
+            "id": episode.id,
+            "topic": episode.topic,
+            "personas": list(roster.personas),
+            "model": roster.model,
+            "routing": roster.routing or MODEL_ROUTING,
+            "turns": turns,
+            "stop_reason": stop_reason,
+            "resumed_at_turn": journal.resumed_turns,
+            "model_calls": journal.calls,
+            "replayed_calls": journal.replayed,
+            "prompt_tokens": journal.prompt_tokens,
+            "completion_tokens": journal.completion_tokens,
+            "seconds": round(time.perf_counter() - start, 2),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        (self.out / "episodes" / f"{episode.id}.md").write_text(render_markdown(episode, record))
+        with open(self.results_path, "a") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        journal.discard()
+
+        self.throughput.add(journal, len(turns))
+        resumed = f", resumed at turn {journal.resumed_turns}" if journal.resumed_turns else ""
+        print(f"{episode.id}: {len(turns)} turns in {record['seconds']}s{resumed}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("topics", type=Path, help="JSONL or plain-text topics file")
+    parser.add_argument("--out", type=Path, required=True, help="output folder; reuse it to resume")
+    parser.add_argument("--concurrency", type=int, default=4, help="panels running at once")
+    args = parser.parse_args()
+
+    batch = BatchRun(args.out, args.concurrency)
+    report = asyncio.run(batch.run(load_topics(args.topics)))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failed"] else 0)
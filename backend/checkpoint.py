@@ -0,0 +1,159 @@
+"""Per-episode checkpoints for resumable batch runs and /chat panels.
+
+A checkpoint holds the turns an episode has finished and every completion
+its agents received, keyed by agent and exact prompt. Resuming runs the
+episode again from the start with those completions replayed, so the team
+gets back to where it stopped without calling the model, then carries on.
+"""
+import hashlib
+import json
+import os
+from collections import deque
+from pathlib import Path
+from typing import Any, AsyncGenerator, Sequence
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from model_clients import DelegatingChatCompletionClient
+from speculation import prompt_key
+
+
+def journal_key(agent: str, messages: Sequence[LLMMessage], kwargs: dict) -> str:
+    options = json.dumps(kwargs.get("extra_create_args") or {}, sort_keys=True, default=str)
+    return hashlib.sha256(f"{agent}\x00{options}\x00{prompt_key(messages)}".encode()).hexdigest()
+
+
+class EpisodeJournal:
+    """Completions and finished turns of one episode, saved to a JSON file.
+
+    Completions loaded from an earlier run are handed out again, in order,
+    to calls with the same agent and prompt. `checkpoint` rewrites the file
+    atomically, so a crash leaves either the previous or the new version.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._restore(json.loads(self.path.read_text()) if self.path.exists() else None)
+
+    def _restore(self, saved: dict | None):
+        self.turns: list[dict] = []
+        self._pending: dict[str, deque[str]] = {}
+        self._completions: dict[str, list[str]] = {}
+        if saved:
+            self.turns = saved["turns"]
+            self._pending = {key: deque(values) for key, values in saved["completions"].items()}
+        self.resumed_turns = len(self.turns)
+        self.replayed = 0
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def replay(self, agent: str, messages: Sequence[LLMMessage], kwargs: dict) -> CreateResult | None:
+        """The recorded completion for this call, if the earlier run made it"""
+        key = journal_key(agent, messages, kwargs)
+        pending = self._pending.get(key)
+        if not pending:
+            return None
+        value = pending.popleft()
+        self._completions.setdefault(key, []).append(value)
+        self.replayed += 1
+        return CreateResult.model_validate_json(value)
+
+    def record(self, agent: str, messages: Sequence[LLMMessage], kwargs: dict, result: CreateResult):
+        self.calls += 1
+        self.prompt_tokens += result.usage.prompt_tokens
+        self.completion_tokens += result.usage.completion_tokens
+        # Tool calls are not replayed, same as the completion cache
+        if isinstance(result.content, str) and not kwargs.get("tools"):
+            self._completions.setdefault(journal_key(agent, messages, kwargs), []).append(result.model_dump_json())
+
+    def checkpoint(self, turns: list[dict]):
+        """Save the turns so far plus every completion, replayed or not yet reached"""
+        completions = {key: list(values) for key, values in self._completions.items()}
+        for key, values in self._pending.items():
+            completions.setdefault(key, []).extend(values)
+        self.turns = list(turns)
+        self._save({"turns": self.turns, "completions": completions})
+
+    def _save(self, saved: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_suffix(".tmp")
+        partial.write_text(json.dumps(saved, ensure_ascii=False))
+        os.replace(partial, self.path)
+
+    def discard(self):
+        self.path.unlink(missing_ok=True)
+
+
+class StoredJournal(EpisodeJournal):
+    """An EpisodeJournal kept with its panel in a PanelStore (see panel_store.py).
+
+    Lets whichever worker claims an interrupted /chat panel replay the
+    turns it already ran.
+    """
+
+    def __init__(self, store, panel_id: str):
+        self.store = store
+        self.panel_id = panel_id
+        self._restore(store.load_journal(panel_id))
+
+    def _save(self, saved: dict):
+        self.store.save_journal(self.panel_id, saved)
+
+    def discard(self):
+        self.store.save_journal(self.panel_id, None)
+
+
+class ReplayChatCompletionClient(DelegatingChatCompletionClient):
+    """Serves an agent's calls from the bound panel's journal and records live ones.
+
+    Does nothing for panels without a journal (Streamlit sessions).
+    """
+
+    def __init__(self, inner: ChatCompletionClient, agent: str):
+        super().__init__(inner)
+        self.agent = agent
+        self.journal: EpisodeJournal | None = None
+        self.replayed = 0
+
+    def bind_panel(self, panel):
+        self.journal = getattr(panel, "journal", None)
+        super().bind_panel(panel)
+
+    def _replay(self, messages: Sequence[LLMMessage], kwargs: dict) -> CreateResult | None:
+        if self.journal is None:
+            return None
+        result = self.journal.replay(self.agent, messages, kwargs)
+        if result is not None:
+            self.replayed += 1
+        return result
+
+    def _record(self, messages: Sequence[LLMMessage], kwargs: dict, result: CreateResult):
+        if self.journal is not None:
+            self.journal.record(self.agent, messages, kwargs, result)
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        result = self._replay(messages, kwargs)
+        if result is None:
+            result = await self.inner.create(messages, **kwargs)
+            self._record(messages, kwargs, result)
+        return result
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        result = self._replay(messages, kwargs)
+        if result is not None:
+            yield result.content
+            yield result
+            return
+        async for chunk in self.inner.create_stream(messages, **kwargs):
+            if isinstance(chunk, CreateResult):
+                self._record(messages, kwargs, chunk)
+            yield chunk
+
+    def reset_episode(self):
+        self.replayed = 0
+        super().reset_episode()
+
+    def episode_stats(self) -> dict:
+        stats = super().episode_stats()
+        if self.replayed:
+            stats["replayed"] = self.replayed
+        return stats
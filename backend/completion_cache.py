@@ -0,0 +1,270 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Sequence
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from model_clients import DelegatingChatCompletionClient
+from turn_policies import normalize_text, shingles, similarity
+
+# Prefix the backend puts in front of the listener's concern
+TOPIC_MARKER = "we received a listener's concern:"
+
+
+def _message_record(message: LLMMessage) -> dict:
+    record = message.model_dump(exclude={"thought"})
+    if isinstance(record.get("content"), str):
+        record["content"] = normalize_text(record["content"])
+    return record
+
+
+def _hash(payload: Any) -> str:
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class CacheKey:
+    """Exact key plus the topic-free key used for near-duplicate lookup"""
+
+    def __init__(self, model: str, messages: Sequence[LLMMessage], options: dict):
+        records = [_message_record(message) for message in messages]
+        self.exact = _hash({"model": model, "messages": records, "options": options})
+
+        # Swap the listener's concern for a placeholder so panels on nearly
+        # the same topic share a near key
+        self.near = None
+        self.topic = None
+        for record in records:
+            content = record.get("content")
+            if isinstance(content, str) and TOPIC_MARKER in content:
+                prefix, self.topic = content.split(TOPIC_MARKER, 1)
+                record["content"] = prefix + TOPIC_MARKER + "<topic>"
+                self.near = _hash({"model": model, "messages": records, "options": options})
+                break
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+        }
+
+
+class CompletionCache:
+    """LRU memory tier with an optional SQLite tier that survives restarts.
+
+    Entries expire after `ttl_seconds` (None keeps them until evicted).
+    Near-duplicate lookup is off unless `near_threshold` is set; it then
+    matches completions whose only difference is a listener topic with at
+    least that trigram Jaccard similarity.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float | None = None,
+                 disk_path: str | None = None, max_disk_entries: int = 100_000,
+                 near_threshold: float | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.near_threshold = near_threshold
+        self._memory: OrderedDict[str, tuple[str, float | None]] = OrderedDict()
+        self._near: dict[str, dict[str, frozenset]] = {}
+        self._near_of: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.agent_stats: dict[str, CacheStats] = {}
+        self.evictions = 0
+
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    near_key TEXT,
+                    topic TEXT,
+                    value TEXT NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS completions_near ON completions (near_key)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at)")
+            self._db.commit()
+
+    def get(self, key: CacheKey) -> tuple[str | None, bool]:
+        """Return (value, near) for a key, or (None, False) on a miss"""
+        with self._lock:
+            value = self._get_exact(key.exact)
+            if value is not None:
+                return value, False
+            if self.near_threshold is not None and key.near:
+                similar = self._find_similar(key.near, key.topic)
+                if similar:
+                    value = self._get_exact(similar)
+                    if value is not None:
+                        return value, True
+        return None, False
+
+    def put(self, key: CacheKey, value: str):
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._remember(key.exact, value, expires_at, key.near, key.topic)
+            if self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?)",
+                    (key.exact, key.near, key.topic, value, expires_at, time.time())
+                )
+                overflow = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0] - self.max_disk_entries
+                if overflow > 0:
+                    self._db.execute(
+                        "DELETE FROM completions WHERE key IN "
+                        "(SELECT key FROM completions ORDER BY accessed_at LIMIT ?)",
+                        (overflow,)
+                    )
+                    self.evictions += overflow
+                self._db.commit()
+
+    def record(self, agent: str, outcome: str):
+        stats = self.agent_stats.setdefault(agent, CacheStats())
+        setattr(stats, outcome, getattr(stats, outcome) + 1)
+
+    def stats(self) -> dict:
+        return {
+            "memory_entries": len(self._memory),
+            "evictions": self.evictions,
+            "agents": {agent: stats.to_dict() for agent, stats in self.agent_stats.items()},
+        }
+
+    def _get_exact(self, key: str) -> str | None:
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > time.time():
+                self._memory.move_to_end(key)
+                return value
+            self._forget(key)
+
+        if self._db:
+            row = self._db.execute(
+                "SELECT value, expires_at, near_key, topic FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                value, expires_at, near_key, topic = row
+                if expires_at is not None and expires_at <= time.time():
+                    self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._db.commit()
+                    return None
+                self._db.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+                self._remember(key, value, expires_at, near_key, topic)
+                return value
+        return None
+
+    def _find_similar(self, near_key: str, topic: str) -> str | None:
+        wanted = shingles(topic)
+        candidates = dict(self._near.get(near_key, {}))
+        if self._db:
+            for key, other in self._db.execute(
+                "SELECT key, topic FROM completions WHERE near_key = ?", (near_key,)
+            ):
+                candidates.setdefault(key, shingles(other))
+
+        best, best_score = None, self.near_threshold
+        for key, seen in candidates.items():
+            score = similarity(wanted, seen)
+            if score >= best_score:
+                best, best_score = key, score
+        return best
+
+    def _remember(self, key: str, value: str, expires_at: float | None, near_key: str | None, topic: str | None):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        if near_key and topic is not None:
+            self._near.setdefault(near_key, {})[key] = shingles(topic)
+            self._near_of[key] = near_key
+
+        while len(self._memory) > self.max_entries:
+            oldest = next(iter(self._memory))
+            self._forget(oldest)
+            self.evictions += 1
+
+    def _forget(self, key: str):
+        self._memory.pop(key, None)
+        near_key = self._near_of.pop(key, None)
+        if near_key:
+            siblings = self._near.get(near_key, {})
+            siblings.pop(key, None)
+            if not siblings:
+                self._near.pop(near_key, None)
+
+
+class CachedChatCompletionClient(DelegatingChatCompletionClient):
+    """Serves repeated completions for one agent from a shared CompletionCache"""
+
+    def __init__(self, inner: ChatCompletionClient, cache: CompletionCache, agent: str, model: str):
+        super().__init__(inner)
+        self.cache = cache
+        self.agent = agent
+        self.model = model
+        self.episode = CacheStats()
+
+    def _key(self, messages: Sequence[LLMMessage], kwargs: dict) -> CacheKey | None:
+        # Tool calls and structured output are not worth replaying
+        if kwargs.get("tools") or kwargs.get("json_output"):
+            return None
+        options = dict(kwargs.get("extra_create_args") or {})
+        return CacheKey(self.model, messages, options)
+
+    def _lookup(self, key: CacheKey | None) -> CreateResult | None:
+        if key is None:
+            return None
+        value, near = self.cache.get(key)
+        outcome = "misses" if value is None else "near_hits" if near else "hits"
+        self.cache.record(self.agent, outcome)
+        setattr(self.episode, outcome, getattr(self.episode, outcome) + 1)
+        if value is None:
+            return None
+        return CreateResult.model_validate_json(value).model_copy(update={"cached": True})
+
+    def _store(self, key: CacheKey | None, result: CreateResult):
+        if key is not None and isinstance(result.content, str) and self.is_complete(result):
+            self.cache.put(key, result.model_dump_json())
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        key = self._key(messages, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        result = await self.inner.create(messages, **kwargs)
+        self._store(key, result)
+        return result
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        key = self._key(messages, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            yield cached.content
+            yield cached
+            return
+        async for chunk in self.inner.create_stream(messages, **kwargs):
+            if isinstance(chunk, CreateResult):
+                self._store(key, chunk)
+            yield chunk
+
+    def reset_episode(self):
+        self.episode = CacheStats()
+        super().reset_episode()
+
+    def episode_stats(self) -> dict:
+        return {**super().episode_stats(), "cache": self.episode.to_dict()}
@@ -0,0 +1,36 @@
+# Routing profiles: the model each role of a panel runs on. The host asks
+# one- or two-sentence questions and the selector names the next speaker,
+# so both do well on a fast, cheap model; guests give the in-character
+# answers. A role a profile leaves out runs on the panel's own model, and
+# a persona's own "model" (AGENT_CONFIGS or the persona store) beats both.
+ROUTING_PROFILES = {
+    "single": {},
+    "tiered": {"host": "gpt-4o-mini", "selector": "gpt-4o-mini"},
+    "economy": {"host": "gpt-4o-mini", "selector": "gpt-4o-mini", "guest": "gpt-4o"},
+}
+
+# Concurrent completions allowed per model, on top of the global and
+# per-key caps; models not listed only have those
+MODEL_LIMITS = {
+    "gpt-4": 8,
+    "gpt-4o": 16,
+    "gpt-4o-mini": 32,
+}
+
+# USD per million prompt / completion tokens, for cost estimates
+MODEL_PRICES = {
+    "gpt-4": (30.00, 60.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+
+def estimate_cost(usage: dict[str, dict]) -> float | None:
+    """Cost of per-model token usage, or None if a model has no price"""
+    total = 0.0
+    for model, tokens in usage.items():
+        if model not in MODEL_PRICES:
+            return None
+        prompt_price, completion_price = MODEL_PRICES[model]
+        total += (tokens["prompt_tokens"] * prompt_price + tokens["completion_tokens"] * completion_price) / 1e6
+    return round(total, 6)
@@ -0,0 +1,166 @@
+import re
+from typing import Any, Awaitable, Callable, List, Mapping
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import ChatCompletionClient, LLMMessage, SystemMessage, UserMessage
+from prompts import estimate_tokens
+
+SUMMARY_SOURCE = "summary"
+SUMMARY_HEADER = "Summary of the discussion so far:"
+MAX_SUMMARY_CHARS = 1500
+
+# (previous summary, newly dropped messages) -> updated summary
+Summarizer = Callable[[str, List[LLMMessage]], Awaitable[str]]
+
+
+def _text(message: LLMMessage) -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+
+def _speaker(message: LLMMessage, owner: str) -> str:
+    return getattr(message, "source", None) or owner
+
+
+def first_sentence(text: str, limit: int = 200) -> str:
+    """Leading sentence of a turn, ending on Latin or CJK punctuation"""
+    text = re.sub(r"\s+", " ", text).strip()
+    match = re.match(r".+?[.!?。！？](?=\s|$|[^.!?。！？])", text)
+    sentence = match.group(0) if match else text
+    return sentence if len(sentence) <= limit else sentence[:limit].rstrip() + "…"
+
+
+def extractive_summarizer(owner: str = "you") -> Summarizer:
+    """Free summarizer: one line per dropped turn with the speaker's first sentence"""
+    async def summarize(summary: str, messages: List[LLMMessage]) -> str:
+        lines = summary.splitlines() if summary else []
+        lines.extend(f"- {_speaker(m, owner)}: {first_sentence(_text(m))}" for m in messages)
+        # Oldest lines go first once the summary outgrows its own budget
+        while len("\n".join(lines)) > MAX_SUMMARY_CHARS and len(lines) > 1:
+            lines.pop(0)
+        return "\n".join(lines)
+    return summarize
+
+
+def llm_summarizer(model_client: ChatCompletionClient, owner: str = "you") -> Summarizer:
+    """Summarizer that asks a (cheap) model to fold new turns into the summary"""
+    async def summarize(summary: str, messages: List[LLMMessage]) -> str:
+        transcript = "\n".join(f"{_speaker(m, owner)}: {_text(m)}" for m in messages)
+        result = await model_client.create([
+            SystemMessage(content=(
+                "You maintain a running summary of a radio panel discussion. "
+                "Merge the new turns into the summary. Keep names, years and concrete events. "
+                "Reply with the updated summary only, at most 8 short bullet points."
+            )),
+            UserMessage(content=f"Current summary:\n{summary or '(empty)'}\n\nNew turns:\n{transcript}", source="user"),
+        ])
+        return result.content if isinstance(result.content, str) else summary
+    return summarize
+
+
+class SummarizingChatCompletionContext(ChatCompletionContext):
+    """Model context with a token budget for long panels.
+
+    The first message (the listener's concern) and the last `keep_last`
+    messages are sent verbatim. Everything in between is folded into a
+    rolling summary. If `max_tokens` is set, more of the verbatim window is
+    folded until it fits. Each message is summarized exactly once: the
+    summary covers a prefix that only ever grows.
+    """
+
+    def __init__(self, keep_last: int = 6, max_tokens: int | None = None,
+                 summarizer: Summarizer | None = None,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        super().__init__()
+        self.keep_last = keep_last
+        self.max_tokens = max_tokens
+        self._summarizer = summarizer or extractive_summarizer()
+        self._count_tokens = count_tokens
+        self._reset_summary()
+
+    def _reset_summary(self):
+        self._summary = ""
+        self._summarized = 1  # messages before this index are pinned or summarized
+        self._prefetched = None  # (folded messages, summary) computed by preview()
+        self.prompt_tokens_full = 0
+        self.prompt_tokens_sent = 0
+        self.summaries = 0
+
+    def _tokens(self, messages: List[LLMMessage]) -> int:
+        return sum(self._count_tokens(_text(m)) for m in messages)
+
+    def _cut(self, messages: List[LLMMessage]) -> int:
+        """Index of the first message kept verbatim"""
+        cut = max(self._summarized, len(messages) - self.keep_last)
+        if self.max_tokens is not None:
+            while cut < len(messages) - 1 and self._tokens(messages[cut:]) > self.max_tokens:
+                cut += 1
+        return cut
+
+    async def _window(self, messages: List[LLMMessage]) -> tuple[int, str]:
+        """(first verbatim index, summary) for `messages`, which extend ours"""
+        cut = self._cut(messages)
+        if cut <= self._summarized:
+            return self._summarized, self._summary
+
+        folded = messages[self._summarized:cut]
+        if self._prefetched and self._prefetched[0] == folded:
+            return cut, self._prefetched[1]
+        summary = await self._summarizer(self._summary, folded)
+        self._prefetched = (folded, summary)
+        return cut, summary
+
+    def _render(self, messages: List[LLMMessage], cut: int, summary: str) -> List[LLMMessage]:
+        rendered = messages[:1]
+        if summary:
+            rendered.append(UserMessage(content=f"{SUMMARY_HEADER}\n{summary}", source=SUMMARY_SOURCE))
+        rendered.extend(messages[cut:])
+        return rendered
+
+    async def get_messages(self) -> List[LLMMessage]:
+        if len(self._messages) <= 1:
+            return list(self._messages)
+
+        cut, summary = await self._window(self._messages)
+        if cut > self._summarized:
+            self._summary, self._summarized = summary, cut
+            self._prefetched = None
+            self.summaries += 1
+
+        messages = self._render(self._messages, self._summarized, self._summary)
+        self.prompt_tokens_full += self._tokens(self._messages)
+        self.prompt_tokens_sent += self._tokens(messages)
+        return messages
+
+    async def preview(self, extra: List[LLMMessage]) -> List[LLMMessage]:
+        """What get_messages() would return once `extra` has been added.
+
+        Nothing is committed, but a summary computed here is reused when
+        the same messages are folded for real.
+        """
+        messages = self._messages + list(extra)
+        if len(messages) <= 1:
+            return messages
+        cut, summary = await self._window(messages)
+        return self._render(messages, cut, summary)
+
+    async def clear(self) -> None:
+        await super().clear()
+        self._reset_summary()
+
+    def stats(self) -> dict:
+        return {
+            "summaries": self.summaries,
+            "prompt_tokens_full": self.prompt_tokens_full,
+            "prompt_tokens_sent": self.prompt_tokens_sent,
+            "prompt_tokens_saved": self.prompt_tokens_full - self.prompt_tokens_sent,
+        }
+
+    async def save_state(self) -> Mapping[str, Any]:
+        state = dict(await super().save_state())
+        state.update(summary=self._summary, summarized=self._summarized)
+        return state
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        await super().load_state({"messages": state.get("messages", [])})
+        self._summary = state.get("summary", "")
+        self._summarized = state.get("summarized", 1)
+        self._prefetched = None
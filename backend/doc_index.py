@@ -0,0 +1,325 @@
+"""BM25 retrieval index over the documents/ folder.
+
+    python doc_index.py build            # index new or changed files
+    python doc_index.py search "南开"     # try a query
+
+Each source file gets its own segment in the index directory: a JSON
+header (chunk offsets, vocabulary) and a binary file holding postings and
+passage text, which is memory-mapped on load. Only files whose content
+changed are re-indexed.
+"""
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+INDEX_VERSION = 1
+ROOT = Path(__file__).resolve().parent.parent
+DOCUMENTS_DIR = ROOT / "documents"
+SOURCE_SUFFIXES = (".txt", ".md")
+
+CHUNK_CHARS = 300
+K1, B = 1.5, 0.75
+
+_CJK = r"㐀-鿿豈-﫿"
+_SENTENCE = re.compile(r".+?(?:[。！？!?；;…]+[”’」』]?|\.(?=\s)|>>|\n+|$)", re.DOTALL)
+_TERMS = re.compile(rf"[{_CJK}]+|[a-z0-9]+")
+
+
+def split_sentences(text: str) -> list[str]:
+    """Sentences ending on CJK or Latin punctuation, line breaks or '>>' markers"""
+    return [s.strip() for s in _SENTENCE.findall(text) if s.strip()]
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_CHARS) -> list[str]:
+    """Pack sentences into passages of about max_chars, overlapping by one sentence"""
+    chunks, current = [], []
+    for sentence in split_sentences(text):
+        # Unpunctuated runs longer than a passage are cut where they are
+        while len(sentence) > max_chars:
+            chunks.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and sum(map(len, current)) + len(sentence) > max_chars:
+            chunks.append("".join(current))
+            current = current[-1:] if len(current) > 1 else []
+        current.append(sentence)
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words for Latin scripts, character bigrams for CJK runs"""
+    terms = []
+    for run in _TERMS.findall(text.lower()):
+        if re.match(rf"[{_CJK}]", run):
+            terms.extend(run[i:i + 2] for i in range(max(len(run) - 1, 1)))
+        else:
+            terms.append(run)
+    return terms
+
+
+@dataclass(frozen=True)
+class Passage:
+    source: str
+    text: str
+    score: float
+
+
+def format_passages(passages: list[Passage]) -> str:
+    """Reference block added to an agent's prompt for one turn"""
+    body = "\n\n".join(f"[{p.source}] {p.text}" for p in passages)
+    return ("Reference passages that may help with your next reply. Use specific facts from them "
+            "where relevant, in your own words; ignore them if they do not fit.\n\n" + body)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _segment_name(source: str) -> str:
+    return hashlib.sha1(source.encode()).hexdigest()[:16]
+
+
+def build_segment(source: str, text: str, path: Path) -> dict:
+    """Write one file's segment to path.seg / path.json and return its header"""
+    chunks = chunk_text(text)
+    postings: dict[str, list[tuple[int, int]]] = {}
+    lengths = []
+    for chunk_id, chunk in enumerate(chunks):
+        terms = tokenize(chunk)
+        lengths.append(len(terms))
+        for term, tf in Counter(terms).items():
+            postings.setdefault(term, []).append((chunk_id, tf))
+
+    # Postings are (chunk id, term frequency) uint32 pairs; passage text follows
+    flat = array("I")
+    vocabulary = {}
+    for term in sorted(postings):
+        vocabulary[term] = [len(flat) // 2, len(postings[term])]
+        for chunk_id, tf in postings[term]:
+            flat.extend((chunk_id, tf))
+
+    spans, text_bytes = [], bytearray()
+    for chunk in chunks:
+        encoded = chunk.encode()
+        spans.append([len(text_bytes), len(text_bytes) + len(encoded)])
+        text_bytes.extend(encoded)
+
+    with open(path.with_suffix(".seg"), "wb") as f:
+        flat.tofile(f)
+        f.write(text_bytes)
+
+    header = {
+        "version": INDEX_VERSION,
+        "byteorder": sys.byteorder,
+        "source": source,
+        "digest": _digest(text.encode()),
+        "text_offset": len(flat) * flat.itemsize,
+        "spans": spans,
+        "lengths": lengths,
+        "terms": vocabulary,
+    }
+    # The header is written last, so a half-built segment is never loaded
+    path.with_suffix(".json").write_text(json.dumps(header, ensure_ascii=False))
+    return header
+
+
+class _Segment:
+    def __init__(self, header: dict, path: Path):
+        self.source = header["source"]
+        self.header = header
+        self.spans = header["spans"]
+        self.lengths = header["lengths"]
+        self.terms = header["terms"]
+        self._file = open(path.with_suffix(".seg"), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def postings(self, term: str) -> memoryview | None:
+        entry = self.terms.get(term)
+        if entry is None or self._map is None:
+            return None
+        start, count = entry
+        return memoryview(self._map)[start * 8:(start + count) * 8].cast("I")
+
+    def text(self, chunk_id: int) -> str:
+        start, end = self.spans[chunk_id]
+        offset = self.header["text_offset"]
+        return self._map[offset + start:offset + end].decode()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class DocumentIndex:
+    """Lazily loaded, incrementally rebuilt BM25 index over a documents folder.
+
+    Nothing is read until the first search. After that the source files are
+    re-checked at most every `refresh_seconds`, and changed files are
+    re-indexed on the spot. Safe to share between threads.
+    """
+
+    def __init__(self, documents_dir: Path = DOCUMENTS_DIR, index_dir: Path | None = None,
+                 refresh_seconds: float = 30.0):
+        self.documents_dir = Path(documents_dir)
+        self.index_dir = Path(index_dir) if index_dir else self.documents_dir / ".index"
+        self.refresh_seconds = refresh_seconds
+        self._segments: dict[str, _Segment] = {}
+        self._stamps: dict[str, tuple[int, int]] = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def sources(self) -> list[str]:
+        """Indexable files, relative to the documents folder"""
+        if not self.documents_dir.is_dir():
+            return []
+        return sorted(
+            path.relative_to(self.documents_dir).as_posix()
+            for path in self.documents_dir.rglob("*")
+            if path.is_file() and path.suffix in SOURCE_SUFFIXES and self.index_dir not in path.parents
+        )
+
+    def refresh(self) -> dict:
+        """Index new or changed files and drop removed ones"""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> dict:
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        report = {"indexed": [], "unchanged": [], "removed": []}
+        sources = self.sources()
+
+        for source in sources:
+            path = self.documents_dir / source
+            stat = path.stat()
+            stamp = (stat.st_size, stat.st_mtime_ns)
+            if self._stamps.get(source) == stamp and source in self._segments:
+                report["unchanged"].append(source)
+                continue
+
+            data = path.read_bytes()
+            segment_path = self.index_dir / _segment_name(source)
+            header = self._read_header(segment_path)
+            if not header or header["digest"] != _digest(data):
+                header = build_segment(source, data.decode("utf-8", errors="replace"), segment_path)
+                report["indexed"].append(source)
+            else:
+                report["unchanged"].append(source)
+
+            if source in self._segments:
+                self._segments[source].close()
+            self._segments[source] = _Segment(header, segment_path)
+            self._stamps[source] = stamp
+
+        for source in set(self._segments) - set(sources):
+            self._segments.pop(source).close()
+            self._stamps.pop(source, None)
+            report["removed"].append(source)
+        # Segments of files deleted while nothing was loaded
+        live = {_segment_name(source) for source in sources}
+        for stale in self.index_dir.glob("*.json"):
+            if stale.stem not in live:
+                stale.unlink()
+                stale.with_suffix(".seg").unlink(missing_ok=True)
+
+        self._checked_at = time.monotonic()
+        return report
+
+    def _read_header(self, path: Path) -> dict | None:
+        try:
+            header = json.loads(path.with_suffix(".json").read_text())
+        except (OSError, ValueError):
+            return None
+        if header.get("version") != INDEX_VERSION or header.get("byteorder") != sys.byteorder:
+            return None
+        if not path.with_suffix(".seg").exists():
+            return None
+        return header
+
+    def warm(self) -> threading.Thread:
+        """Load or rebuild the index in the background"""
+        thread = threading.Thread(target=self.refresh, daemon=True)
+        thread.start()
+        return thread
+
+    def search(self, query: str, k: int = 3, sources: list[str] | None = None,
+               timeout: float | None = None) -> list[Passage]:
+        """Top-k passages for a query, optionally limited to some source files.
+
+        With a timeout, a search that would wait longer than that for a
+        load or rebuild in another thread returns no passages instead.
+        """
+        if not self._lock.acquire(timeout=-1 if timeout is None else timeout):
+            return []
+        try:
+            if self._checked_at is None or time.monotonic() - self._checked_at > self.refresh_seconds:
+                self._refresh()
+            segments = [s for name, s in self._segments.items() if sources is None or name in sources]
+            return self._search(query, k, segments)
+        finally:
+            self._lock.release()
+
+    def _search(self, query: str, k: int, segments: list[_Segment]) -> list[Passage]:
+        terms = set(tokenize(query))
+        if not terms or not segments:
+            return []
+
+        # BM25 statistics span every selected segment
+        total_chunks = sum(len(s.lengths) for s in segments)
+        if not total_chunks:
+            return []
+        average_length = sum(sum(s.lengths) for s in segments) / total_chunks
+        postings = {
+            term: [(s, p) for s in segments if (p := s.postings(term)) is not None]
+            for term in terms
+        }
+
+        scores: Counter = Counter()
+        for term, lists in postings.items():
+            df = sum(len(p) // 2 for _, p in lists)
+            if not df:
+                continue
+            idf = math.log(1 + (total_chunks - df + 0.5) / (df + 0.5))
+            for segment, p in lists:
+                for i in range(0, len(p), 2):
+                    chunk_id, tf = p[i], p[i + 1]
+                    norm = K1 * (1 - B + B * segment.lengths[chunk_id] / average_length)
+                    scores[(segment.source, chunk_id)] += idf * tf * (K1 + 1) / (tf + norm)
+
+        by_source = {s.source: s for s in segments}
+        return [
+            Passage(source=source, text=by_source[source].text(chunk_id), score=round(score, 3))
+            for (source, chunk_id), score in scores.most_common(k)
+        ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["build", "search"])
+    parser.add_argument("query", nargs="?", default="")
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--documents", default=str(DOCUMENTS_DIR))
+    args = parser.parse_args()
+
+    index = DocumentIndex(Path(args.documents))
+    start = time.perf_counter()
+    if args.command == "build":
+        report = index.refresh()
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        for passage in index.search(args.query, args.k):
+            print(f"[{passage.source} {passage.score}] {passage.text}\n")
+    print(f"{1000 * (time.perf_counter() - start):.1f} ms", file=sys.stderr)
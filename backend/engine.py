@@ -0,0 +1,466 @@
+"""The panel engine shared by every front end.
+
+One set of model clients, caches, admission limits, pooled teams and
+stores per process. The FastAPI app (main.py), batch runs (batch.py) and
+the Streamlit app all run panels through `run_panel`; synchronous
+callers stream them from an EngineThread. /chat panels go through
+`start_panel`, which saves their events so `resume_panel` can pick the
+stream up again on any worker.
+"""
+import asyncio
+import contextlib
+import dataclasses
+import os
+import queue
+import socket
+import threading
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Iterator
+from dotenv import load_dotenv
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+from team_pool import DEFAULT_MODEL, DIALOGUE_RULES, PANEL_FORMAT, Roster, TeamPool, build_team, check_routing
+from config.model_routing import MODEL_LIMITS
+from completion_cache import CachedChatCompletionClient, CompletionCache
+from stub_model import StubChatCompletionClient
+from panel import PROTOCOL_MESSAGES, Panel, already_sent, panel_events, panel_task
+from admission import CompletionScheduler, ThrottledChatCompletionClient, key_id, shared_http_client
+from speculation import SpeculationBudget
+from retrieval import RetrievalChatCompletionClient
+from doc_index import DOCUMENTS_DIR, DocumentIndex
+from prompts import PrefixCacheTracker, PromptCompiler
+from model_clients import PrefixTrackingChatCompletionClient
+from length_budget import LengthBoundedChatCompletionClient, sentence_limits
+from checkpoint import ReplayChatCompletionClient, StoredJournal
+from transcript_store import STORE_PATH as TRANSCRIPT_STORE_PATH, TranscriptRecorder, TranscriptStore
+from panel_store import FAILED, FINISHED, RUNNING, STORE_PATH as PANEL_STORE_PATH, SQLitePanelStore
+from context_budget import SummarizingChatCompletionContext, extractive_summarizer, llm_summarizer
+from metrics import panel_metrics
+from persona_cards import CARDS_DIR, PersonaCardCache
+from turn_policies import default_policies
+
+# Load environment variables
+load_dotenv()
+
+def model_limits(spec: str | None) -> dict[str, int]:
+    """MODEL_LIMITS from config, updated by "model=limit,..." pairs"""
+    limits = dict(MODEL_LIMITS)
+    for pair in (spec or "").split(","):
+        if pair.strip():
+            model, _, limit = pair.partition("=")
+            limits[model.strip()] = int(limit)
+    return limits
+
+# Admission control: global, per-API-key and per-model caps on in-flight
+# completions; MODEL_CONCURRENCY overrides config/model_routing.py
+completion_scheduler = CompletionScheduler(
+    max_concurrent=int(os.getenv("MAX_CONCURRENT_COMPLETIONS", "16")),
+    max_per_key=int(os.getenv("MAX_CONCURRENT_COMPLETIONS_PER_KEY", "8")),
+    model_limits=model_limits(os.getenv("MODEL_CONCURRENCY"))
+)
+http_client = shared_http_client(max_connections=completion_scheduler.max_concurrent)
+
+# MODEL_BACKEND=stub swaps in the offline scripted model (see stub_model.py)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "openai")
+
+def create_model_client(model: str):
+    if MODEL_BACKEND == "stub":
+        tokens_per_second = os.getenv("STUB_TOKENS_PER_SECOND")
+        return StubChatCompletionClient(
+            model=model,
+            ttft=float(os.getenv("STUB_TTFT", "0")),
+            tokens_per_second=float(tokens_per_second) if tokens_per_second else None
+        )
+    return OpenAIChatCompletionClient(
+        model=model,
+        api_key=os.getenv('OPENAI_API_KEY'),
+        base_url=os.getenv('OPENAI_BASE_URL'),
+        http_client=http_client
+    )
+
+# OpenAI API configuration, one shared client per model
+model_clients = {DEFAULT_MODEL: create_model_client(DEFAULT_MODEL)}
+
+def get_model_client(model: str):
+    """Return the shared client for a model, creating it on first use"""
+    if model not in model_clients:
+        model_clients[model] = create_model_client(model)
+    return model_clients[model]
+
+def optional_float(name: str) -> float | None:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+# Completion cache shared by every agent; set COMPLETION_CACHE=false to disable
+completion_cache = None
+if os.getenv("COMPLETION_CACHE", "true").lower() == "true":
+    completion_cache = CompletionCache(
+        max_entries=int(os.getenv("COMPLETION_CACHE_SIZE", "1024")),
+        ttl_seconds=optional_float("COMPLETION_CACHE_TTL"),
+        disk_path=os.getenv("COMPLETION_CACHE_PATH"),
+        max_disk_entries=int(os.getenv("COMPLETION_CACHE_DISK_SIZE", "100000")),
+        near_threshold=optional_float("COMPLETION_CACHE_NEAR_THRESHOLD")
+    )
+
+# Agents with a "documents" list in their persona config get top-k passages
+# from the documents/ index on every turn (build it ahead with doc_index.py)
+document_index = DocumentIndex(os.getenv("DOCUMENTS_DIR", DOCUMENTS_DIR))
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+RETRIEVAL_TIMEOUT = float(os.getenv("RETRIEVAL_TIMEOUT_MS", "200")) / 1000
+
+# System prompts are compiled once per distinct roster; the tracker
+# estimates per call how much of each prompt the provider can cache
+prompt_compiler = PromptCompiler(PANEL_FORMAT)
+prefix_tracker = PrefixCacheTracker()
+
+# Which model each role runs on: a profile from config/model_routing.py.
+# Requests can pick another; personas with their own "model" keep it
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "single")
+check_routing(MODEL_ROUTING)
+
+# Replies stop at the sentence limits in DIALOGUE_RULES (host, a guest's
+# first speech, later guest turns), with max_tokens set to that many
+# sentences of OUTPUT_TOKENS_PER_SENTENCE; LENGTH_LIMITS=false lets them run
+SENTENCE_LIMITS = sentence_limits(DIALOGUE_RULES) if os.getenv("LENGTH_LIMITS", "true").lower() == "true" else {}
+OUTPUT_TOKENS_PER_SENTENCE = int(os.getenv("OUTPUT_TOKENS_PER_SENTENCE", "60"))
+
+def client_factory(roster: Roster):
+    """Per-agent client stack for a roster's models and personas"""
+    configs = roster.configs
+    def client_for(name: str):
+        model = roster.model_for(name, MODEL_ROUTING)
+        client = ThrottledChatCompletionClient(
+            get_model_client(model),
+            completion_scheduler,
+            key=key_id(os.getenv('OPENAI_API_KEY')),
+            model=model
+        )
+        client = PrefixTrackingChatCompletionClient(client, prefix_tracker, model)
+        # Inside the cache and the journal, so both keep the bounded reply
+        if SENTENCE_LIMITS and name in roster.personas:
+            client = LengthBoundedChatCompletionClient(
+                client, name, host=name not in roster.guests, limits=SENTENCE_LIMITS,
+                tokens_per_sentence=OUTPUT_TOKENS_PER_SENTENCE
+            )
+        if completion_cache:
+            client = CachedChatCompletionClient(client, completion_cache, agent=name, model=model)
+        documents = configs.get(name, {}).get("documents")
+        if documents:
+            client = RetrievalChatCompletionClient(
+                client, document_index, documents, k=RETRIEVAL_K, timeout=RETRIEVAL_TIMEOUT
+            )
+        # Outermost, so replayed batch turns skip retrieval and the cache too
+        return ReplayChatCompletionClient(client, name)
+    return client_for
+
+# Per-agent context budget: the last CONTEXT_KEEP_LAST messages are sent
+# verbatim and older ones are folded into a rolling summary. CONTEXT_SUMMARIZER
+# is "extractive" (free, no model call) or "llm" (uses CONTEXT_SUMMARY_MODEL)
+CONTEXT_KEEP_LAST = int(os.getenv("CONTEXT_KEEP_LAST", "6"))
+CONTEXT_MAX_TOKENS = os.getenv("CONTEXT_MAX_TOKENS")
+CONTEXT_SUMMARIZER = os.getenv("CONTEXT_SUMMARIZER", "extractive")
+
+def context_for(name: str):
+    """Model context for an agent; CONTEXT_KEEP_LAST=0 keeps the full transcript"""
+    if CONTEXT_KEEP_LAST <= 0:
+        return None
+    summarizer = extractive_summarizer(owner=name)
+    if CONTEXT_SUMMARIZER == "llm":
+        summarizer = llm_summarizer(get_model_client(os.getenv("CONTEXT_SUMMARY_MODEL", DEFAULT_MODEL)), owner=name)
+    return SummarizingChatCompletionContext(
+        keep_last=CONTEXT_KEEP_LAST,
+        max_tokens=int(CONTEXT_MAX_TOKENS) if CONTEXT_MAX_TOKENS else None,
+        summarizer=summarizer
+    )
+
+# "rules" schedules speakers from DIALOGUE_RULES; "llm" always asks the selector model
+TURN_SCHEDULER = os.getenv("TURN_SCHEDULER", "rules")
+SELECTOR_LLM_FALLBACK = os.getenv("SELECTOR_LLM_FALLBACK", "false").lower() == "true"
+
+# SPECULATION=true starts a guest's reply as soon as the host's turn names
+# them; the budget bounds concurrent prefetches and tokens wasted per panel
+speculation_budget = None
+if os.getenv("SPECULATION", "false").lower() == "true":
+    speculation_budget = SpeculationBudget(
+        max_inflight=int(os.getenv("SPECULATION_MAX_INFLIGHT", "4")),
+        max_wasted_tokens=int(os.getenv("SPECULATION_MAX_WASTED_TOKENS", "4000"))
+    )
+
+# FAN_OUT=true generates turns the scheduler knows are independent, such
+# as the guests' closing answers, at once instead of one after another;
+# only the rule-based scheduler reports such rounds
+FAN_OUT = os.getenv("FAN_OUT", "true").lower() == "true"
+
+# Per-turn latency and token histograms, scraped from /metrics
+metrics = panel_metrics()
+
+# Early stops: a token budget and a wall-clock deadline per panel (off by
+# default), a turn nearly repeating a recent one, or several turns in a row
+# adding little new. 0 turns a policy off; the reason becomes stop_reason
+TERMINATION_TOKEN_BUDGET = int(os.getenv("TERMINATION_TOKEN_BUDGET", "0"))
+TERMINATION_DEADLINE_SECONDS = float(os.getenv("TERMINATION_DEADLINE_SECONDS", "0"))
+TERMINATION_REPETITION_THRESHOLD = float(os.getenv("TERMINATION_REPETITION_THRESHOLD", "0.9"))
+TERMINATION_STALL_TURNS = int(os.getenv("TERMINATION_STALL_TURNS", "3"))
+TERMINATION_MIN_NOVELTY = float(os.getenv("TERMINATION_MIN_NOVELTY", "0.2"))
+
+def termination_policies():
+    return default_policies(
+        token_budget=TERMINATION_TOKEN_BUDGET,
+        deadline_seconds=TERMINATION_DEADLINE_SECONDS,
+        repetition_threshold=TERMINATION_REPETITION_THRESHOLD,
+        stall_turns=TERMINATION_STALL_TURNS,
+        min_novelty=TERMINATION_MIN_NOVELTY
+    )
+
+# Hard limits that cancel a panel's in-flight completions: PANEL_DEADLINE_SECONDS
+# for a whole /chat panel (a request may ask for less), TURN_DEADLINE_SECONDS
+# for any one turn, speaker selection included. The panel ends with an error
+# event; 0 turns a limit off
+PANEL_DEADLINE_SECONDS = float(os.getenv("PANEL_DEADLINE_SECONDS", "0"))
+TURN_DEADLINE_SECONDS = float(os.getenv("TURN_DEADLINE_SECONDS", "0"))
+
+def panel_deadline(requested: float | None = None) -> float | None:
+    """Deadline for a /chat panel: the one requested, within PANEL_DEADLINE_SECONDS"""
+    limits = [limit for limit in (requested, PANEL_DEADLINE_SECONDS) if limit]
+    return min(limits) if limits else None
+
+team_pool = TeamPool(
+    lambda roster: build_team(
+        roster,
+        client_factory(roster),
+        scheduler=TURN_SCHEDULER,
+        llm_fallback=SELECTOR_LLM_FALLBACK,
+        context_for=context_for,
+        speculation=speculation_budget,
+        fan_out=FAN_OUT,
+        compiler=prompt_compiler,
+        metrics=metrics,
+        policies=termination_policies,
+        routing=MODEL_ROUTING
+    ),
+    max_per_roster=int(os.getenv("TEAM_POOL_SIZE", "8")),
+    # Idle teams kept across every roster; each new persona mix adds its own
+    max_idle=int(os.getenv("TEAM_POOL_MAX_IDLE", "32"))
+)
+
+# Persona descriptions longer than a card are distilled once into one,
+# cached by content hash in PERSONA_CARDS_DIR; pass it to Roster.from_store.
+# PERSONA_CARDS=false sends descriptions verbatim
+persona_cards = None
+if os.getenv("PERSONA_CARDS", "true").lower() == "true":
+    persona_cards = PersonaCardCache(os.getenv("PERSONA_CARDS_DIR", CARDS_DIR))
+
+# Finished panels, replayable through /episodes/{id}/stream
+transcript_store = TranscriptStore(os.getenv("TRANSCRIPT_STORE_PATH", TRANSCRIPT_STORE_PATH))
+
+# /chat panels keep their numbered events and journal in PANEL_STORE_PATH,
+# which every worker behind the load balancer must share. A worker's lease
+# on a running panel lasts PANEL_LEASE_SECONDS past its last renewal; after
+# that a reconnect on any worker claims the panel and runs it on
+panel_store = SQLitePanelStore(
+    os.getenv("PANEL_STORE_PATH", PANEL_STORE_PATH),
+    retention_seconds=float(os.getenv("PANEL_RETENTION_SECONDS", "3600"))
+)
+PANEL_LEASE_SECONDS = float(os.getenv("PANEL_LEASE_SECONDS", "15"))
+PANEL_POLL_SECONDS = float(os.getenv("PANEL_POLL_SECONDS", "0.2"))
+# How often a streaming response checks that its client is still connected
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "1"))
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+async def run_panel(roster: Roster, topic: str, protocol: int = PROTOCOL_MESSAGES,
+                    panel: Panel | None = None) -> AsyncIterator[dict]:
+    """Run one panel on a pooled team and yield its events; panels that finish are saved"""
+    panel = panel or Panel(protocol, turn_deadline=TURN_DEADLINE_SECONDS)
+    recorder = TranscriptRecorder(panel.id, topic, list(roster.personas), roster.model)
+    async with team_pool.checkout(roster) as pooled:
+        pooled.bind(panel)
+        try:
+            events = panel.stream(panel_events(pooled, panel_task(topic), protocol, panel.cancellation))
+            async with contextlib.aclosing(events):
+                async for data in events:
+                    if data["type"] == "episode_end":
+                        data["episode_id"] = panel.id
+                    recorder.add(data)
+                    yield data
+        finally:
+            if panel.cancelled:
+                await pooled.cancel(panel.cancelled)
+    # Only panels that ran to the end are kept
+    transcript_store.append(recorder.transcript())
+
+
+def event_id(panel_id: str, seq: int) -> str:
+    return f"{panel_id}:{seq}"
+
+def parse_event_id(panel_id: str, last_event_id: str | None) -> int:
+    """Sequence number of a Last-Event-ID from this panel; 0 resends everything"""
+    owner, _, seq = (last_event_id or "").rpartition(":")
+    if owner and owner != panel_id:
+        return 0
+    try:
+        return max(int(seq), 0)
+    except ValueError:
+        return 0
+
+def start_panel(roster: Roster, topic: str, protocol: int = PROTOCOL_MESSAGES,
+                deadline: float | None = None) -> tuple[str, AsyncIterator[tuple[str, dict]]]:
+    """Start a resumable panel: its id, and its events paired with their SSE ids"""
+    panel_id = uuid.uuid4().hex
+    panel_store.create(panel_id, topic, dataclasses.asdict(roster), protocol, WORKER_ID, PANEL_LEASE_SECONDS)
+    return panel_id, _owned_events(panel_id, roster, topic, protocol, sent=[], deadline=panel_deadline(deadline))
+
+async def resume_panel(panel_id: str, after: int = 0) -> AsyncIterator[tuple[str, dict]]:
+    """Events of a started panel numbered above `after`, on whichever worker is asked.
+
+    Saved events come first. While the owner's lease holds, its new events
+    are followed from the store. Once the lease lapses this worker claims
+    the panel and runs it on from the last finished turn, replaying the
+    completions of earlier turns instead of calling the model.
+    """
+    while True:
+        record = panel_store.get(panel_id)
+        if record is None:
+            raise KeyError(panel_id)
+        for seq, data in panel_store.events(panel_id, after):
+            after = seq
+            yield event_id(panel_id, seq), data
+        # Read before the events, so a finished panel's events are all in
+        if record["status"] != RUNNING:
+            return
+        if panel_store.claim(panel_id, WORKER_ID, PANEL_LEASE_SECONDS):
+            break
+        await asyncio.sleep(PANEL_POLL_SECONDS)
+
+    sent = panel_store.events(panel_id)
+    for seq, data in sent:
+        if seq > after:
+            yield event_id(panel_id, seq), data
+    # The owner stopped after its last event but before marking the panel done
+    if any(data["type"] == "episode_end" for _, data in sent):
+        panel_store.finish(panel_id, WORKER_ID, FINISHED)
+        return
+    roster = Roster(**{**record["roster"], "personas": tuple(record["roster"]["personas"])})
+    async for item in _owned_events(panel_id, roster, record["topic"], record["protocol"], sent, panel_deadline()):
+        yield item
+
+async def _hold_lease(panel_id: str):
+    while True:
+        await asyncio.sleep(PANEL_LEASE_SECONDS / 3)
+        panel_store.renew(panel_id, WORKER_ID, PANEL_LEASE_SECONDS)
+
+async def _owned_events(panel_id: str, roster: Roster, topic: str, protocol: int,
+                        sent: list[tuple[int, dict]], deadline: float | None = None) -> AsyncIterator[tuple[str, dict]]:
+    """Run a panel this worker holds the lease on, saving each new event before it is yielded"""
+    panel = Panel(protocol, StoredJournal(panel_store, panel_id), panel_id,
+                  deadline=deadline, turn_deadline=TURN_DEADLINE_SECONDS)
+    seen = already_sent([data for _, data in sent], protocol)
+    seq = sent[-1][0] if sent else 0
+    turns = []
+    lease = asyncio.create_task(_hold_lease(panel_id))
+    try:
+        async with contextlib.aclosing(run_panel(roster, topic, protocol, panel)) as events:
+            async for data in events:
+                if data["type"] in ("message", "turn_end"):
+                    turns.append({"speaker": data["speaker"], "content": data["content"]})
+                    panel.journal.checkpoint(turns)
+                if seen(data):
+                    continue
+                seq += 1
+                if not panel_store.append(panel_id, WORKER_ID, seq, data):
+                    raise RuntimeError(f"Panel {panel_id} was claimed by another worker")
+                yield event_id(panel_id, seq), data
+    except Exception as e:
+        # Reconnecting clients get the error too, rather than a rerun
+        if panel_store.append(panel_id, WORKER_ID, seq + 1, {"type": "error", "content": str(e)}):
+            panel_store.finish(panel_id, WORKER_ID, FAILED)
+        raise
+    except BaseException:
+        # The client went away; its reconnect can claim the panel right away
+        panel_store.release(panel_id, WORKER_ID)
+        raise
+    else:
+        panel_store.finish(panel_id, WORKER_ID, FINISHED)
+    finally:
+        lease.cancel()
+
+
+# Cancelled event streams still unwinding, referenced until they finish
+_detached: set[asyncio.Task] = set()
+
+async def until_disconnected(events: AsyncIterator, is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator:
+    """Pass `events` on while the client is connected; cancel them once it goes away.
+
+    Servers notice a closed connection at different times, some only when
+    the next event fails to send, so while no event is ready the client is
+    polled every DISCONNECT_POLL_SECONDS. The events are iterated in a task
+    of their own, so however the response is torn down, cancelling that
+    task stops the panel's team and its in-flight completions, and
+    releases the lease for a reconnect to take over.
+    """
+    received: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for item in events:
+                await received.put(item)
+        except Exception as e:
+            await received.put(e)
+        finally:
+            await received.put(done)
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(received.get(), DISCONNECT_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                continue
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Not awaited: the response's own task may be being cancelled
+        if not task.done():
+            task.cancel()
+            _detached.add(task)
+            task.add_done_callback(_detached.discard)
+
+class EngineThread:
+    """An event loop in a daemon thread, for callers that are not async.
+
+    Each panel streamed from here is a task on the one loop, so any number
+    of synchronous callers (e.g. Streamlit sessions) share the engine's
+    team pool, caches and admission limits without a thread per panel.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="panel-engine", daemon=True)
+        self._thread.start()
+
+    def stream(self, events: AsyncIterator[dict]) -> Iterator[dict]:
+        """Iterate an engine event stream; closing the iterator early cancels the panel"""
+        received = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for data in events:
+                    received.put(data)
+            except Exception as e:
+                received.put(e)
+            finally:
+                received.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while (item := received.get()) is not done:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
@@ -0,0 +1,151 @@
+"""Fan-out rounds: guests answering the same host turn at once.
+
+In the closing phase the host asks a summary question, every guest
+answers it and the host sums up. The answers don't depend on each other,
+yet the group chat asks for them one after another. When the scheduler
+reports such a round (TurnScheduler.fan_out), every guest's completion
+starts as soon as the host's turn finishes, from the thread as it stands
+then. The team still takes the turns in order: each guest's turn is
+served from its round completion, buffered chunks first, so replies
+stream in a fixed order and the host's summary follows the last of them.
+The round costs about one completion of wall time instead of one per guest.
+"""
+import asyncio
+import time
+from typing import Any, AsyncGenerator, Sequence
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from model_clients import DelegatingChatCompletionClient
+from speculation import Prefetch, host_thread, predict_prompt
+from turn_scheduler import HOST, TurnScheduler
+
+
+class FanOut:
+    """Runs a team's fan-out rounds and serves their answers to the guests' turns"""
+
+    def __init__(self, scheduler: TurnScheduler, system_prompts: dict[str, str], stream: bool = False):
+        self.scheduler = scheduler
+        self.system_prompts = system_prompts
+        self.stream = stream
+        self.agents: dict = {}
+        self.clients: dict[str, ChatCompletionClient] = {}
+        self._round: dict[str, Prefetch] = {}
+        self._claimed: list[Prefetch] = []
+        self._round_started = 0.0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.rounds = 0
+        self.fanned_turns = 0
+        self.wasted_tokens = 0
+        self.saved_per_round: list[float] = []
+
+    async def reset(self):
+        """Drop any unanswered round and clear per-episode counters"""
+        await self._close_round()
+        self._reset_stats()
+
+    def claim(self, agent: str) -> Prefetch | None:
+        """This agent's answer from the current round, if it has one"""
+        answer = self._round.pop(agent, None)
+        if answer is not None:
+            self.fanned_turns += 1
+            self._claimed.append(answer)
+        return answer
+
+    async def host_replied(self, content: str):
+        """Called with the host's finished turn; starts a round if the scheduler reports one"""
+        await self._close_round()
+        host = self.agents.get(HOST)
+        if host is None:
+            return
+
+        thread = host_thread(host, content)
+        turns = [(getattr(m, "source", ""), m.content) for m in thread if isinstance(m.content, str)]
+        guests = [guest for guest in self.scheduler.fan_out(turns) if guest in self.agents]
+        if len(guests) < 2:
+            return
+
+        prompts = {}
+        for guest in guests:
+            messages = await predict_prompt(self.agents[guest], self.system_prompts[guest], thread)
+            if messages is None:
+                return
+            prompts[guest] = messages
+
+        for guest, messages in prompts.items():
+            answer = Prefetch(guest, messages)
+            answer.task = asyncio.create_task(answer.run(self.clients[guest], messages, self.stream))
+            self._round[guest] = answer
+        self._round_started = time.perf_counter()
+        self.rounds += 1
+
+    async def _close_round(self):
+        if self._claimed:
+            # What the answers would have taken back to back, less the round's wall time
+            now = time.perf_counter()
+            wall = max(answer.finished_at or now for answer in self._claimed) - self._round_started
+            sequential = sum((answer.finished_at or now) - answer.started_at for answer in self._claimed)
+            self.saved_per_round.append(1000 * max(sequential - wall, 0.0))
+            self._claimed = []
+        # Answers the team never asked for (an early stop, max_turns) are wasted
+        for answer in self._round.values():
+            if answer.task and not answer.task.done():
+                answer.task.cancel()
+                try:
+                    await answer.task
+                except asyncio.CancelledError:
+                    pass
+            self.wasted_tokens += answer.tokens_spent()
+        self._round = {}
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "fanned_turns": self.fanned_turns,
+            "wasted_tokens": self.wasted_tokens,
+            "latency_saved_ms": sum(self.saved_per_round),
+        }
+
+
+class FanOutChatCompletionClient(DelegatingChatCompletionClient):
+    """Serves a guest's turn from the team's current fan-out round; reports the host's turns to it"""
+
+    def __init__(self, inner: ChatCompletionClient, fan_out: FanOut, agent: str):
+        super().__init__(inner)
+        self.fan_out = fan_out
+        self.agent = agent
+        fan_out.clients[agent] = inner
+
+    def _claim(self, kwargs: dict) -> Prefetch | None:
+        # Rounds are run without tools or structured output
+        if kwargs.get("tools") or kwargs.get("json_output"):
+            return None
+        return self.fan_out.claim(self.agent)
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        answer = self._claim(kwargs)
+        result = None
+        if answer is not None:
+            async for chunk in answer.replay():
+                result = chunk
+        # A failed answer is retried as a normal call
+        if not isinstance(result, CreateResult):
+            result = await self.inner.create(messages, **kwargs)
+        await self._finished(result)
+        return result
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        answer = self._claim(kwargs)
+        chunks = self.inner.create_stream(messages, **kwargs)
+        if answer is not None:
+            chunks = answer.replay()
+        async for chunk in chunks:
+            if isinstance(chunk, CreateResult):
+                await self._finished(chunk)
+            yield chunk
+        if answer is not None and answer.error is not None:
+            raise answer.error
+
+    async def _finished(self, result: CreateResult):
+        if self.agent == HOST and isinstance(result.content, str):
+            await self.fan_out.host_replied(result.content)
@@ -0,0 +1,161 @@
+"""Output budgets: agents stop at the sentence limits DIALOGUE_RULES set.
+
+Every persona is told to keep to a couple of sentences, and models often
+write paragraphs anyway. The limits are read from the numbers in the
+rules' dialogue flow, per role: the host, a guest's first speech and a
+guest's later turns. Each call gets a max_tokens cap as a backstop, and a
+streaming sentence counter, which knows CJK punctuation, ends generation
+as soon as the limit is reached. A reply cut short has finish_reason
+"length" and still counts every token generated as a completion token,
+so the tracer can report what was cut (see metrics.TurnTracer). Such a
+reply is still complete, so the completion cache keeps it.
+"""
+import re
+from typing import Any, AsyncGenerator, Sequence
+from autogen_core.models import AssistantMessage, ChatCompletionClient, CreateResult, LLMMessage, RequestUsage
+from context_budget import SUMMARY_SOURCE
+from model_clients import DelegatingChatCompletionClient
+from prompts import estimate_tokens
+
+HOST_TURN = "host"
+GUEST_FIRST_TURN = "guest_first"
+GUEST_TURN = "guest"
+
+_COUNT = re.compile(r"(\d+)(?:\s*-\s*(\d+))?\s+sentences?\b", re.IGNORECASE)
+# CJK full stops end a sentence at once; Latin ones only before whitespace,
+# so "3.5" or "Mr." mid-stream aren't counted
+_SENTENCE_END = re.compile(r"[。！？]+[”’」』）]*|[.!?]+[\"'”’)]*(?=\s)")
+
+
+def _rule_texts(rules: dict):
+    for key, value in rules.items():
+        if isinstance(value, dict):
+            yield from _rule_texts(value)
+        elif isinstance(value, str):
+            yield key, value
+
+
+def sentence_limits(rules: dict) -> dict[str, int]:
+    """Most sentences per turn for each kind of turn, from the counts in the rules' dialogue flow"""
+    limits = {}
+    for who, text in _rule_texts(rules["Dialogue flow"]):
+        counts = [int(high or low) for low, high in _COUNT.findall(text)]
+        if not counts:
+            continue
+        if "host" in who.lower():
+            kind = HOST_TURN
+        elif "first" in text.lower():
+            kind = GUEST_FIRST_TURN
+        else:
+            kind = GUEST_TURN
+        limits[kind] = max(limits.get(kind, 0), *counts)
+    if GUEST_TURN in limits:
+        limits.setdefault(GUEST_FIRST_TURN, limits[GUEST_TURN])
+    return limits
+
+
+def sentence_cut(text: str, limit: int) -> int | None:
+    """Where `text` reaches its `limit`-th sentence end, or None if it hasn't yet"""
+    for count, match in enumerate(_SENTENCE_END.finditer(text), start=1):
+        if count == limit:
+            return match.end()
+    return None
+
+
+def ends_sentence(text: str) -> bool:
+    """Whether `text` stops at the end of a sentence"""
+    ends = list(_SENTENCE_END.finditer(text.rstrip() + " "))
+    return bool(ends) and ends[-1].end() == len(text.rstrip())
+
+
+class LengthBoundedChatCompletionClient(DelegatingChatCompletionClient):
+    """Caps an agent's replies at its turn's sentence limit.
+
+    `limits` maps turn kinds (HOST_TURN, GUEST_FIRST_TURN, GUEST_TURN) to
+    sentences; a guest's turn is its first if its prompt holds none of its
+    own earlier turns. Calls with tools or structured output pass through.
+    """
+
+    def __init__(self, inner: ChatCompletionClient, agent: str, host: bool, limits: dict[str, int],
+                 tokens_per_sentence: int = 60):
+        super().__init__(inner)
+        self.agent = agent
+        self.host = host
+        self.limits = limits
+        self.tokens_per_sentence = tokens_per_sentence
+
+    def _limit(self, messages: Sequence[LLMMessage], kwargs: dict) -> int | None:
+        if kwargs.get("tools") or kwargs.get("json_output"):
+            return None
+        if self.host:
+            return self.limits.get(HOST_TURN)
+        # Own turns folded into a context summary still count
+        spoken = any(isinstance(m, AssistantMessage) for m in messages) or any(
+            getattr(m, "source", None) == SUMMARY_SOURCE and f"- {self.agent}:" in m.content for m in messages
+        )
+        return self.limits.get(GUEST_TURN if spoken else GUEST_FIRST_TURN)
+
+    def _capped(self, limit: int, kwargs: dict) -> dict:
+        options = dict(kwargs.get("extra_create_args") or {})
+        options.setdefault("max_tokens", limit * self.tokens_per_sentence)
+        return {**kwargs, "extra_create_args": options}
+
+    def is_complete(self, result: CreateResult) -> bool:
+        # A reply cut at its sentence limit is whole, only shorter; one the
+        # max_tokens cap ended mid-sentence is not
+        if result.finish_reason == "length" and isinstance(result.content, str):
+            return ends_sentence(result.content)
+        return super().is_complete(result)
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        limit = self._limit(messages, kwargs)
+        if limit is None:
+            return await self.inner.create(messages, **kwargs)
+        result = await self.inner.create(messages, **self._capped(limit, kwargs))
+        if not isinstance(result.content, str):
+            return result
+        cut = sentence_cut(result.content + " ", limit)
+        # A reply the max_tokens cap ended mid-sentence keeps its whole sentences
+        if cut is None and result.finish_reason == "length":
+            ends = list(_SENTENCE_END.finditer(result.content + " "))
+            cut = ends[-1].end() if ends else None
+        if cut is None or not result.content[cut:].strip():
+            return result
+        return result.model_copy(update={"content": result.content[:cut].rstrip(), "finish_reason": "length"})
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        limit = self._limit(messages, kwargs)
+        if limit is None:
+            async for chunk in self.inner.create_stream(messages, **kwargs):
+                yield chunk
+            return
+
+        chunks = self.inner.create_stream(messages, **self._capped(limit, kwargs))
+        text, cut = "", None
+        try:
+            async for chunk in chunks:
+                if isinstance(chunk, CreateResult):
+                    yield chunk
+                    return
+                text += chunk
+                if cut is None:
+                    cut = sentence_cut(text, limit)
+                    # Nothing past the limit is passed on
+                    kept = chunk if cut is None else chunk[:len(chunk) - (len(text) - cut)]
+                    if kept:
+                        yield kept
+                # A reply that ends at its limit isn't cut; one that goes on is
+                if cut is not None and text[cut:].strip():
+                    break
+            else:
+                return
+        finally:
+            await chunks.aclose()
+
+        prompt_tokens = sum(estimate_tokens(m.content) for m in messages if isinstance(m.content, str))
+        yield CreateResult(
+            finish_reason="length",
+            content=text[:cut].rstrip(),
+            usage=RequestUsage(prompt_tokens=prompt_tokens, completion_tokens=estimate_tokens(text)),
+            cached=False,
+        )
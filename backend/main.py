@@ -1,28 +1,18 @@
 import os
-import datetime
-from typing import Sequence
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from dotenv import load_dotenv
-from autogen_agentchat.agents import AssistantAgent
-from autogen_agentchat.teams import SelectorGroupChat
-from autogen_agentchat.messages import AgentEvent, ChatMessage
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from autogen_agentchat.conditions import TextMentionTermination
 from config.agent_configs import AGENT_CONFIGS
-from fastapi.responses import StreamingResponse
-import json
-import asyncio
-
-# Load environment variables
-load_dotenv()
-
-# OpenAI API configuration
-model_client = OpenAIChatCompletionClient(
-    model="gpt-4",
-    api_key=os.getenv('OPENAI_API_KEY')
+from engine import (
+    completion_cache, completion_scheduler, document_index, metrics, panel_store, parse_event_id, resume_panel,
+    speculation_budget, start_panel, team_pool, transcript_store, until_disconnected
 )
+from panel import PROTOCOL_DELTAS, PROTOCOL_MESSAGES, SUPPORTED_PROTOCOLS, replay_events, sse
+from persona_store import STORE_PATH, PersonaStore
+from team_pool import Roster
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+# Panels run on the shared engine (engine.py); this module is the HTTP API
 
 app = FastAPI()
 
@@ -33,106 +23,151 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Panel-Id"],
 )
 
+@app.on_event("startup")
+async def warm_document_index():
+    # Loaded in the background so startup never waits on the index
+    if any(config.get("documents") for config in AGENT_CONFIGS.values()):
+        document_index.warm()
+
 class Message(BaseModel):
     content: str
+    personas: list[str] | None = None
+    # SSE contract version; clients that don't send it get whole messages
+    protocol: int = PROTOCOL_MESSAGES
+    # Routing profile (config/model_routing.py); the server's MODEL_ROUTING if unset
+    routing: str | None = None
+    # Seconds before the panel is cancelled; capped by PANEL_DEADLINE_SECONDS
+    deadline_seconds: float | None = None
 
 @app.post("/chat")
-async def chat(message: Message):
+async def chat(message: Message, request: Request):
+    try:
+        roster = Roster.create(message.personas, stream=message.protocol == PROTOCOL_DELTAS,
+                               routing=message.routing or "")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if message.protocol not in SUPPORTED_PROTOCOLS:
+        raise HTTPException(status_code=400, detail=f"Unsupported protocol: {message.protocol}")
+    if message.deadline_seconds is not None and message.deadline_seconds <= 0:
+        raise HTTPException(status_code=400, detail="deadline_seconds must be positive")
+
+    # Events carry "<panel id>:<seq>" ids; /panels/{id}/events resumes from one
+    panel_id, events = start_panel(roster, message.content, message.protocol, message.deadline_seconds)
+
+    async def generate():
+        # A listener who leaves cancels the panel, in-flight completions included
+        try:
+            async for event_id, data in until_disconnected(events, request.is_disconnected):
+                yield sse(data, event_id)
+
+        except Exception as e:
+            error_data = {
+                "type": "error",
+                "content": str(e)
+            }
+            yield sse(error_data)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"X-Panel-Id": panel_id}
+    )
+
+@app.get("/panels/{panel_id}")
+async def get_panel(panel_id: str):
+    record = panel_store.get(panel_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown panel: {panel_id}")
+    return record
+
+@app.get("/panels/{panel_id}/events")
+async def resume_chat(request: Request, panel_id: str, after: int | None = None,
+                      last_event_id: str | None = Header(None)):
+    """Resume a /chat stream after the Last-Event-ID header (or `after`), on any worker"""
+    if panel_store.get(panel_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown panel: {panel_id}")
+
     async def generate():
         try:
-            # Create host
-            host = AssistantAgent(
-                name="Host",
-                description="Late-night radio show host guiding conversations",
-                system_message=AGENT_CONFIGS["Host"]["persona"],
-                model_client=model_client
-            )
-            
-            # Create guests
-            handel = AssistantAgent(
-                name="Handel",
-                description="Baroque composer specializing in religious music",
-                system_message=AGENT_CONFIGS["Handel"]["persona"],
-                model_client=model_client
-            )
-            
-            sultan = AssistantAgent(
-                name="SultanMehmed",
-                description="Ottoman ruler who conquered Constantinople",
-                system_message=AGENT_CONFIGS["SultanMehmed"]["persona"],
-                model_client=model_client
-            )
-            
-            scott = AssistantAgent(
-                name="Scott",
-                description="Pioneer of Antarctic exploration",
-                system_message=AGENT_CONFIGS["Scott"]["persona"],
-                model_client=model_client
-            )
-
-            def selector_func(messages: Sequence[AgentEvent | ChatMessage]) -> str | None:
-                # If no messages, host starts
-                if not messages:
-                    return "Host"
-                    
-                # Get last message's sender and content
-                last_message = messages[-1]
-                last_speaker = last_message.source
-                last_content = last_message.content if hasattr(last_message, 'content') else ''
-                
-                # After user message, host responds
-                if last_speaker == "user":
-                    return "Host"
-                
-                # If host invites specific guest, they must speak next
-                if last_speaker == "Host":
-                    guests = {
-                        "Handel": ["handel", "composer"],
-                        "SultanMehmed": ["sultan", "mehmed", "mehmet"],
-                        "Scott": ["scott", "explorer"]
-                    }
-                    
-                    for guest, keywords in guests.items():
-                        if any(keyword.lower() in last_content.lower() for keyword in keywords):
-                            return guest
-                    return None  # If no specific invitation, let model choose next speaker
-                
-                # Every 3-4 turns, let host guide conversation
-                if len(messages) % 4 == 0 and last_speaker != "Host":
-                    return "Host"
-                    
-                return None  # Let model choose speaker in other cases
-
-            # Create team chat
-            agent_team = SelectorGroupChat(
-                participants=[host, handel, sultan, scott],
-                selector_func=selector_func,
-                model_client=model_client,
-                termination_condition=TextMentionTermination("Thank you for listening"),
-                max_turns=12
-            )
-
-            initial_message = f"Host: Welcome to our Panel Discussion. Today, we received a listener's concern: {message.content}"
-            
-            async for response in agent_team.run_stream(task=initial_message):
-                if hasattr(response, 'source') and response.content:
-                    data = {
-                        "type": "message",
-                        "speaker": response.source,
-                        "content": response.content,
-                        "timestamp": datetime.datetime.now().isoformat()
-                    }
-                    yield f"data: {json.dumps(data)}\n\n"
-                    await asyncio.sleep(0.1)  # Small delay between messages
-                    
+            start = after if after is not None else parse_event_id(panel_id, last_event_id)
+            events = resume_panel(panel_id, start)
+            async for event_id, data in until_disconnected(events, request.is_disconnected):
+                yield sse(data, event_id)
+
         except Exception as e:
             error_data = {
                 "type": "error",
                 "content": str(e)
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield sse(error_data)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"X-Panel-Id": panel_id}
+    )
+
+@app.get("/pool/stats")
+async def pool_stats():
+    return team_pool.snapshot()
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    return completion_scheduler.stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    if not completion_cache:
+        return {"enabled": False}
+    return {"enabled": True, **completion_cache.stats()}
+
+@app.get("/speculation/stats")
+async def speculation_stats():
+    if not speculation_budget:
+        return {"enabled": False}
+    return {"enabled": True, **speculation_budget.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Same catalog the Streamlit app writes to
+persona_store = PersonaStore(os.getenv("PERSONA_STORE_PATH", STORE_PATH))
+
+@app.get("/personas")
+async def list_personas(q: str = "", tag: str | None = None, page: int = 0, page_size: int = 20):
+    page_size = max(1, min(page_size, 100))
+    personas, total = persona_store.query(search=q, tag=tag, limit=page_size, offset=max(page, 0) * page_size)
+    return {"personas": personas, "total": total, "page": page, "page_size": page_size}
+
+@app.get("/episodes")
+async def list_episodes(q: str = "", persona: str | None = None, page: int = 0, page_size: int = 20):
+    page_size = max(1, min(page_size, 100))
+    episodes, total = transcript_store.query(search=q, persona=persona, limit=page_size, offset=max(page, 0) * page_size)
+    return {"episodes": episodes, "total": total, "page": page, "page_size": page_size}
+
+@app.get("/episodes/{episode_id}")
+async def get_episode(episode_id: str):
+    transcript = transcript_store.get(episode_id)
+    if transcript is None:
+        raise HTTPException(status_code=404, detail=f"Unknown episode: {episode_id}")
+    return transcript
+
+@app.get("/episodes/{episode_id}/stream")
+async def stream_episode(episode_id: str, protocol: int = PROTOCOL_MESSAGES):
+    """Replay a stored panel with the same events /chat sent, without calling the model"""
+    if protocol not in SUPPORTED_PROTOCOLS:
+        raise HTTPException(status_code=400, detail=f"Unsupported protocol: {protocol}")
+    transcript = transcript_store.get(episode_id)
+    if transcript is None:
+        raise HTTPException(status_code=404, detail=f"Unknown episode: {episode_id}")
+
+    async def generate():
+        async for data in replay_events(transcript, protocol):
+            yield sse(data)
 
     return StreamingResponse(
         generate(),
@@ -0,0 +1,228 @@
+"""Per-turn spans and Prometheus metrics for panels.
+
+A turn span covers one speaker turn: how the speaker was chosen and how
+long that took, then the speaker's completion (time to first token,
+total time, tokens). Spans feed histograms and counters in a
+MetricsRegistry, which renders the Prometheus text format for /metrics.
+Stdlib only, so the Streamlit app can use it too.
+"""
+import bisect
+import threading
+
+# Seconds; covers rule decisions (microseconds) up to slow completions
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate from the buckets, interpolating linearly inside one"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """Labelled counters and histograms, safe to update from any thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta: dict[str, tuple[str, str, tuple | None]] = {}
+        self._series: dict[str, dict[tuple, float | Histogram]] = {}
+
+    def counter(self, name: str, help: str):
+        self._meta[name] = ("counter", help, None)
+        self._series.setdefault(name, {})
+
+    def histogram(self, name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self._meta[name] = ("histogram", help, buckets)
+        self._series.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._series[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._series[name]
+            if key not in series:
+                series[key] = Histogram(self._meta[name][2])
+            series[key].observe(value)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, (kind, help, _) in self._meta.items():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._series[name].items()):
+                    if kind == "counter":
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip([*value.buckets, "+Inf"], value.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {value.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> list[dict]:
+        """One row per histogram series with count, mean and estimated p50/p95"""
+        rows = []
+        with self._lock:
+            for name, (kind, _, _) in self._meta.items():
+                if kind != "histogram":
+                    continue
+                for labels, histogram in sorted(self._series[name].items()):
+                    rows.append({
+                        "metric": name,
+                        "labels": ", ".join(f"{key}={value}" for key, value in labels),
+                        "count": histogram.count,
+                        "mean": histogram.sum / histogram.count if histogram.count else None,
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                    })
+        return rows
+
+
+def panel_metrics() -> MetricsRegistry:
+    """Registry with the per-turn panel metrics declared"""
+    metrics = MetricsRegistry()
+    metrics.counter("panel_turns_total", "Finished speaker turns by agent and selector decision source")
+    metrics.histogram("panel_selector_seconds", "Time to choose the next speaker, by decision source")
+    metrics.histogram("panel_ttft_seconds", "Time to first token of an agent's completion")
+    metrics.histogram("panel_completion_seconds", "Total time of an agent's completion")
+    metrics.histogram("panel_prompt_tokens", "Prompt tokens per completion", TOKEN_BUCKETS)
+    metrics.histogram("panel_completion_tokens", "Generated tokens per completion", TOKEN_BUCKETS)
+    metrics.counter("panel_prompt_tokens_total", "Prompt tokens sent, by agent (selector included) and model")
+    metrics.counter("panel_completion_tokens_total", "Tokens generated, by agent (selector included) and model")
+    metrics.counter("panel_truncated_tokens_total", "Generated tokens cut from replies past their sentence limit, by agent")
+    metrics.counter("panel_early_stops_total", "Panels ended early, by the policy that stopped them")
+    metrics.counter("panel_turns_saved_total", "Turns not run because a panel ended early, by policy")
+    metrics.counter("panel_tokens_saved_estimate_total", "Estimated tokens not spent because a panel ended early, by policy")
+    metrics.counter("panel_cancelled_total", "Panels cancelled mid-run, by reason (disconnect, deadline, turn_deadline)")
+    metrics.counter("panel_cancelled_turns_total", "Turns cancelled in flight or never started because a panel was cancelled, by reason")
+    metrics.counter("panel_cancelled_tokens_saved_estimate_total", "Estimated tokens not spent because a panel was cancelled, by reason")
+    return metrics
+
+
+class TurnTracer:
+    """Collects one panel's turn spans and reports them to a registry.
+
+    The speaker selector calls `selected` with its decision source, and
+    `selector_call` for each model call it makes; the chosen speaker's
+    `completion` then closes the span. Tokens are also totalled per model,
+    using `models` (agent, or "selector", to model name).
+    """
+
+    def __init__(self, metrics: MetricsRegistry | None = None, models: dict[str, str] | None = None):
+        self.metrics = metrics
+        self.models = models or {}
+        self.reset()
+
+    def reset(self):
+        self.spans: list[dict] = []
+        self.usage: dict[str, dict] = {}
+        self._selection: dict | None = None
+
+    def selected(self, source: str, seconds: float):
+        self._selection = {"selector": source, "selector_seconds": seconds}
+
+    def selector_call(self, seconds: float, prompt_tokens: int, completion_tokens: int):
+        if self._selection is not None:
+            self._selection["selector_seconds"] += seconds
+        self._count_tokens("selector", prompt_tokens, completion_tokens)
+
+    def completion(self, agent: str, ttft: float | None, seconds: float,
+                   prompt_tokens: int, completion_tokens: int, truncated_tokens: int = 0):
+        selection, self._selection = self._selection or {"selector": None, "selector_seconds": None}, None
+        span = {
+            "turn": len(self.spans) + 1,
+            "speaker": agent,
+            "model": self.models.get(agent),
+            "selector": selection["selector"],
+            "selector_ms": _ms(selection["selector_seconds"]),
+            "ttft_ms": _ms(ttft),
+            "completion_ms": _ms(seconds),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "truncated_tokens": truncated_tokens,
+        }
+        self.spans.append(span)
+
+        if self.metrics is None:
+            return
+        source = selection["selector"] or "none"
+        self.metrics.inc("panel_turns_total", agent=agent, selector=source)
+        if selection["selector_seconds"] is not None:
+            self.metrics.observe("panel_selector_seconds", selection["selector_seconds"], source=source)
+        if ttft is not None:
+            self.metrics.observe("panel_ttft_seconds", ttft, agent=agent)
+        self.metrics.observe("panel_completion_seconds", seconds, agent=agent)
+        self.metrics.observe("panel_prompt_tokens", prompt_tokens, agent=agent)
+        self.metrics.observe("panel_completion_tokens", completion_tokens, agent=agent)
+        if truncated_tokens:
+            self.metrics.inc("panel_truncated_tokens_total", truncated_tokens, agent=agent)
+        self._count_tokens(agent, prompt_tokens, completion_tokens)
+
+    def cancelled(self, reason: str, max_turns: int) -> dict:
+        """Record a panel cancelled mid-run: the turns it won't take and an estimate of their tokens"""
+        turns = len(self.spans)
+        tokens = sum(span["prompt_tokens"] + span["completion_tokens"] for span in self.spans)
+        cancelled = max(0, max_turns - turns)
+        saved = tokens // turns * cancelled if turns else 0
+        if self.metrics is not None:
+            self.metrics.inc("panel_cancelled_total", reason=reason)
+            self.metrics.inc("panel_cancelled_turns_total", cancelled, reason=reason)
+            self.metrics.inc("panel_cancelled_tokens_saved_estimate_total", saved, reason=reason)
+        return {"reason": reason, "turns": turns, "turns_cancelled": cancelled, "tokens_saved_estimate": saved}
+
+    def _count_tokens(self, agent: str, prompt_tokens: int, completion_tokens: int):
+        model = self.models.get(agent, "unknown")
+        usage = self.usage.setdefault(model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        usage["calls"] += 1
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+        if self.metrics is not None:
+            self.metrics.inc("panel_prompt_tokens_total", prompt_tokens, agent=agent, model=model)
+            self.metrics.inc("panel_completion_tokens_total", completion_tokens, agent=agent, model=model)
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(1000 * seconds, 3)
@@ -0,0 +1,165 @@
+import time
+from typing import Any, AsyncGenerator, Sequence
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelInfo, RequestUsage
+from metrics import TurnTracer
+from prompts import PrefixCacheTracker, estimate_tokens, serialize_prompt
+
+
+class DelegatingChatCompletionClient(ChatCompletionClient):
+    """Base for client wrappers that add behaviour around another client.
+
+    Wrappers are stacked per agent. `bind_panel`, `reset_episode` and
+    `episode_stats` walk the whole stack so a team can attach a panel and
+    clear or collect per-panel counters without knowing which layers are
+    present.
+    """
+
+    def __init__(self, inner: ChatCompletionClient):
+        self.inner = inner
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        return await self.inner.create(messages, **kwargs)
+
+    def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        return self.inner.create_stream(messages, **kwargs)
+
+    def is_complete(self, result: CreateResult) -> bool:
+        """Whether a result is a whole reply, fit to keep: one the model finished, or one a layer below ended on purpose"""
+        if isinstance(self.inner, DelegatingChatCompletionClient):
+            return self.inner.is_complete(result)
+        return result.finish_reason == "stop"
+
+    def bind_panel(self, panel):
+        """Attach the panel this client is serving (None when idle)"""
+        if isinstance(self.inner, DelegatingChatCompletionClient):
+            self.inner.bind_panel(panel)
+
+    def reset_episode(self):
+        """Clear per-episode counters in this layer and the ones below it"""
+        if isinstance(self.inner, DelegatingChatCompletionClient):
+            self.inner.reset_episode()
+
+    def episode_stats(self) -> dict:
+        """Per-episode counters from this layer and the ones below it"""
+        if isinstance(self.inner, DelegatingChatCompletionClient):
+            return self.inner.episode_stats()
+        return {}
+
+    async def close(self) -> None:
+        # The wrapped client is shared, so its owner closes it
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self.inner.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self.inner.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+        return self.inner.count_tokens(messages, **kwargs)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+        return self.inner.remaining_tokens(messages, **kwargs)
+
+    @property
+    def capabilities(self):
+        return self.inner.model_info
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self.inner.model_info
+
+
+class PrefixTrackingChatCompletionClient(DelegatingChatCompletionClient):
+    """Reports, per call, how many prompt tokens a provider prefix cache could reuse"""
+
+    def __init__(self, inner: ChatCompletionClient, tracker: PrefixCacheTracker, model: str):
+        super().__init__(inner)
+        self.tracker = tracker
+        self.model = model
+        self.cached_per_call: list[int] = []
+        self.prefix_per_call: list[int] = []
+        self.prompt_tokens = 0
+
+    def _record(self, messages: Sequence[LLMMessage]):
+        prompt = serialize_prompt([
+            (type(m).__name__, m.content if isinstance(m.content, str) else str(m.content)) for m in messages
+        ])
+        call = self.tracker.record(self.model, prompt)
+        self.prompt_tokens += call["prompt_tokens"]
+        self.cached_per_call.append(call["cached_tokens"])
+        self.prefix_per_call.append(call["prefix_tokens"])
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        self._record(messages)
+        return await self.inner.create(messages, **kwargs)
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        self._record(messages)
+        async for chunk in self.inner.create_stream(messages, **kwargs):
+            yield chunk
+
+    def reset_episode(self):
+        self.cached_per_call = []
+        self.prefix_per_call = []
+        self.prompt_tokens = 0
+        super().reset_episode()
+
+    def episode_stats(self) -> dict:
+        stats = super().episode_stats()
+        if self.cached_per_call:
+            stats["prompt_cache"] = {
+                "calls": len(self.cached_per_call),
+                "prompt_tokens": self.prompt_tokens,
+                # Shared with an earlier prompt, and the part of that a provider caches
+                "prefix_tokens": sum(self.prefix_per_call),
+                "cached_tokens": sum(self.cached_per_call),
+                "prefix_tokens_per_call": self.prefix_per_call,
+                "cached_tokens_per_call": self.cached_per_call,
+            }
+        return stats
+
+
+class TracingChatCompletionClient(DelegatingChatCompletionClient):
+    """Times each call the agent makes and reports it to the team's TurnTracer.
+
+    Wraps everything else, so the timings are what the agent waited for,
+    including throttling, cache and speculation hits. Cached replies
+    report no tokens, since none were spent on them.
+    """
+
+    def __init__(self, inner: ChatCompletionClient, tracer: TurnTracer, agent: str, selector: bool = False):
+        super().__init__(inner)
+        self.tracer = tracer
+        self.agent = agent
+        self.selector = selector
+
+    def _report(self, result: CreateResult, start: float, first_token: float | None):
+        now = time.perf_counter()
+        prompt_tokens, completion_tokens = (0, 0) if result.cached else (result.usage.prompt_tokens, result.usage.completion_tokens)
+        if self.selector:
+            self.tracer.selector_call(now - start, prompt_tokens, completion_tokens)
+            return
+        truncated_tokens = 0
+        # Replies cut at their sentence limit (see length_budget.py) count
+        # every generated token; the rest of them never reached the agent
+        if result.finish_reason == "length" and completion_tokens and isinstance(result.content, str):
+            truncated_tokens = max(completion_tokens - estimate_tokens(result.content), 0)
+        ttft = (first_token or now) - start
+        self.tracer.completion(self.agent, ttft, now - start, prompt_tokens, completion_tokens, truncated_tokens)
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        start = time.perf_counter()
+        result = await self.inner.create(messages, **kwargs)
+        self._report(result, start, None)
+        return result
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        start = time.perf_counter()
+        first_token = None
+        async for chunk in self.inner.create_stream(messages, **kwargs):
+            if isinstance(chunk, CreateResult):
+                self._report(chunk, start, first_token)
+            elif first_token is None:
+                first_token = time.perf_counter()
+            yield chunk
@@ -0,0 +1,265 @@
+import asyncio
+import datetime
+import json
+import uuid
+from typing import AsyncIterator, Callable
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent
+from autogen_core import CancellationToken
+from stub_model import split_tokens
+from team_pool import PooledTeam
+
+# SSE contract versions for /chat.
+# 1: one "message" event per finished agent reply (original clients)
+# 2: "turn_start" / "delta" / "turn_end" framing with token deltas,
+#    followed by a closing "episode_end" event
+PROTOCOL_MESSAGES = 1
+PROTOCOL_DELTAS = 2
+SUPPORTED_PROTOCOLS = (PROTOCOL_MESSAGES, PROTOCOL_DELTAS)
+
+# Why a panel was cancelled before its team finished
+DISCONNECTED = "disconnect"
+PANEL_DEADLINE = "deadline"
+TURN_DEADLINE = "turn_deadline"
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """A panel or one of its turns ran past its deadline"""
+
+
+def sse(data: dict, event_id: str | None = None) -> str:
+    """Format one server-sent event; an id lets clients resume after it"""
+    if event_id:
+        return f"id: {event_id}\ndata: {json.dumps(data)}\n\n"
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat()
+
+
+def panel_task(concern: str) -> str:
+    """Opening task handed to the team for a listener's concern"""
+    return f"Host: Welcome to our Panel Discussion. Today, we received a listener's concern: {concern}"
+
+
+class Panel:
+    """One running panel: an id plus a channel for out-of-band events.
+
+    Components serving the panel (e.g. the completion scheduler) call
+    `notify` with events such as queue position; `stream` merges those
+    with the team's own events in arrival order. Batch runs and /chat
+    attach a `journal` (see checkpoint.py) to record and replay completions.
+
+    The team runs with the panel's `cancellation` token, so `cancel`
+    stops its in-flight completions as well as the turns still to come.
+    `stream` cancels the panel when its consumer goes away early, when
+    `deadline` seconds have passed since it started, or when a turn takes
+    longer than `turn_deadline` seconds; `cancelled` holds the reason.
+    """
+
+    def __init__(self, protocol: int = PROTOCOL_MESSAGES, journal=None, panel_id: str | None = None,
+                 deadline: float | None = None, turn_deadline: float | None = None):
+        self.id = panel_id or uuid.uuid4().hex
+        self.protocol = protocol
+        self.journal = journal
+        self.deadline = deadline
+        self.turn_deadline = turn_deadline
+        self.cancellation = CancellationToken()
+        self.cancelled: str | None = None
+        self._events: asyncio.Queue = asyncio.Queue()
+
+    def cancel(self, reason: str = DISCONNECTED):
+        """Stop the team run and its in-flight completions; the first reason given is kept"""
+        self.cancelled = self.cancelled or reason
+        self.cancellation.cancel()
+
+    def _next_deadline(self, started: float, turn_started: float) -> tuple[float | None, str | None]:
+        deadlines = []
+        if self.deadline:
+            deadlines.append((started + self.deadline, PANEL_DEADLINE))
+        if self.turn_deadline:
+            deadlines.append((turn_started + self.turn_deadline, TURN_DEADLINE))
+        return min(deadlines) if deadlines else (None, None)
+
+    def notify(self, event: dict):
+        # Protocol 1 clients render every event as a message, so they only
+        # ever receive the original message events
+        if self.protocol == PROTOCOL_DELTAS:
+            self._events.put_nowait(event)
+
+    async def stream(self, events: AsyncIterator[dict]) -> AsyncIterator[dict]:
+        """Yield team events and notifications until the team finishes"""
+        done = object()
+
+        async def pump():
+            try:
+                async for event in events:
+                    await self._events.put(event)
+            except Exception as e:
+                await self._events.put(e)
+            finally:
+                await self._events.put(done)
+
+        loop = asyncio.get_running_loop()
+        started = turn_started = loop.time()
+        task = asyncio.create_task(pump())
+        try:
+            while True:
+                at, reason = self._next_deadline(started, turn_started)
+                try:
+                    item = await asyncio.wait_for(self._events.get(), None if at is None else max(at - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    self.cancel(reason)
+                    limit = self.deadline if reason == PANEL_DEADLINE else self.turn_deadline
+                    raise DeadlineExceeded(f"{reason.replace('_', ' ').capitalize()} of {limit:g}s passed") from None
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if item.get("type") in ("message", "turn_end"):
+                    turn_started = loop.time()
+                yield item
+        finally:
+            # Stops the team run if the consumer went away early
+            if not task.done():
+                self.cancel()
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+
+async def message_events(pooled: PooledTeam, task: str, cancellation_token: CancellationToken | None = None) -> AsyncIterator[dict]:
+    """Protocol 1: whole-message events, exactly as the original endpoint sent them"""
+    async for response in pooled.team.run_stream(task=task, cancellation_token=cancellation_token):
+        if isinstance(response, (TaskResult, ModelClientStreamingChunkEvent)):
+            continue
+        if hasattr(response, 'source') and response.content:
+            yield {
+                "type": "message",
+                "speaker": response.source,
+                "content": response.content,
+                "timestamp": _now()
+            }
+
+
+async def delta_events(pooled: PooledTeam, task: str, cancellation_token: CancellationToken | None = None) -> AsyncIterator[dict]:
+    """Protocol 2: forward each agent's tokens as they arrive, framed per turn"""
+    turn = 0
+    speaker = None  # speaker whose turn is currently open
+
+    async for response in pooled.team.run_stream(task=task, cancellation_token=cancellation_token):
+        if isinstance(response, TaskResult):
+            yield {
+                "type": "episode_end",
+                "protocol": PROTOCOL_DELTAS,
+                "turns": turn,
+                "stop_reason": response.stop_reason,
+                "stats": pooled.episode_stats(),
+                "timestamp": _now()
+            }
+            continue
+
+        if isinstance(response, ModelClientStreamingChunkEvent):
+            if speaker != response.source:
+                turn += 1
+                speaker = response.source
+                yield {"type": "turn_start", "protocol": PROTOCOL_DELTAS, "turn": turn,
+                       "speaker": speaker, "timestamp": _now()}
+            if response.content:
+                yield {"type": "delta", "turn": turn, "speaker": speaker, "content": response.content}
+            continue
+
+        if not (hasattr(response, 'source') and response.content):
+            continue
+
+        # The listener's task is not an agent turn
+        if response.source == "user":
+            yield {"type": "message", "protocol": PROTOCOL_DELTAS, "speaker": "user",
+                   "content": response.content, "timestamp": _now()}
+            continue
+
+        # A reply that arrived without chunks still gets full framing
+        if speaker != response.source:
+            turn += 1
+            yield {"type": "turn_start", "protocol": PROTOCOL_DELTAS, "turn": turn,
+                   "speaker": response.source, "timestamp": _now()}
+
+        # The final message carries the full text so clients can reconcile deltas
+        yield {"type": "turn_end", "protocol": PROTOCOL_DELTAS, "turn": turn,
+               "speaker": response.source, "content": response.content, "timestamp": _now()}
+        speaker = None
+
+
+def already_sent(sent: list[dict], protocol: int) -> Callable[[dict], bool]:
+    """Tell which events of a rerun panel an earlier run already sent.
+
+    A rerun replays its finished turns in the same order, so protocol 1
+    skips as many messages as were sent, and protocol 2 skips the task
+    message and every finished turn. A turn that was cut off runs again
+    from its turn_start; clients drop the deltas they had for it.
+    """
+    if protocol != PROTOCOL_DELTAS:
+        remaining = sum(1 for event in sent if event["type"] == "message")
+
+        def seen(event: dict) -> bool:
+            nonlocal remaining
+            if event["type"] == "message" and remaining:
+                remaining -= 1
+                return True
+            return False
+        return seen
+
+    task_sent = any(event["type"] == "message" and event["speaker"] == "user" for event in sent)
+    finished = sum(1 for event in sent if event["type"] == "turn_end")
+
+    def seen(event: dict) -> bool:
+        if event["type"] == "message" and event["speaker"] == "user":
+            return task_sent
+        return event["type"] in ("turn_start", "delta", "turn_end") and event["turn"] <= finished
+    return seen
+
+
+def panel_events(pooled: PooledTeam, task: str, protocol: int, cancellation_token: CancellationToken | None = None) -> AsyncIterator[dict]:
+    """Event stream for a panel in the requested protocol version"""
+    if protocol == PROTOCOL_DELTAS:
+        return delta_events(pooled, task, cancellation_token)
+    return message_events(pooled, task, cancellation_token)
+
+
+async def replay_events(transcript: dict, protocol: int) -> AsyncIterator[dict]:
+    """A stored panel (see transcript_store.py) as the events /chat sent, without the model"""
+    turn = 0
+    for message in transcript["messages"]:
+        speaker, content = message["speaker"], message["content"]
+        timestamp = message.get("timestamp") or _now()
+        if protocol != PROTOCOL_DELTAS:
+            yield {"type": "message", "speaker": speaker, "content": content, "timestamp": timestamp}
+            continue
+        if speaker == "user":
+            yield {"type": "message", "protocol": PROTOCOL_DELTAS, "speaker": "user",
+                   "content": content, "timestamp": timestamp}
+            continue
+
+        turn += 1
+        yield {"type": "turn_start", "protocol": PROTOCOL_DELTAS, "turn": turn,
+               "speaker": speaker, "timestamp": timestamp}
+        for chunk in split_tokens(content):
+            yield {"type": "delta", "turn": turn, "speaker": speaker, "content": chunk}
+        yield {"type": "turn_end", "protocol": PROTOCOL_DELTAS, "turn": turn,
+               "speaker": speaker, "content": content, "timestamp": timestamp}
+
+    if protocol == PROTOCOL_DELTAS:
+        # Stats are the original run's; a replay costs nothing
+        yield {
+            "type": "episode_end",
+            "protocol": PROTOCOL_DELTAS,
+            "turns": turn,
+            "stop_reason": transcript.get("stop_reason"),
+            "stats": transcript.get("stats") or {},
+            "episode_id": transcript["id"],
+            "replay": True,
+            "timestamp": _now()
+        }
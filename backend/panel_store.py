@@ -0,0 +1,197 @@
+"""Numbered events and journals of /chat panels, shared by every worker.
+
+Each event is saved before it is sent, so any worker can answer a
+reconnect from its Last-Event-ID. The worker running a panel holds a
+lease on it and renews it while the panel runs. Once the lease lapses,
+because the worker died or its client went away, another worker can
+claim the panel. It then carries on from the last finished turn,
+replaying the journal (see checkpoint.py) instead of calling the model.
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+STORE_PATH = ROOT / "panels.db"
+
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS panels (
+    id TEXT PRIMARY KEY,
+    topic TEXT NOT NULL,
+    roster TEXT NOT NULL,
+    protocol INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    owner TEXT,
+    lease_until REAL NOT NULL,
+    last_seq INTEGER NOT NULL DEFAULT 0,
+    journal BLOB,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS panel_events (
+    panel_id TEXT NOT NULL REFERENCES panels(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (panel_id, seq)
+);
+CREATE INDEX IF NOT EXISTS panels_by_finished ON panels(finished_at);
+"""
+
+
+class PanelStore:
+    """What workers need from the store that running panels are kept in.
+
+    Writes that only the panel's owner may make (`append`, `renew`,
+    `finish`) return False once another worker has claimed the panel.
+    Implementations shared between hosts (Redis, Postgres) provide the
+    same methods.
+    """
+
+    def create(self, panel_id: str, topic: str, roster: dict, protocol: int, owner: str, lease_seconds: float):
+        raise NotImplementedError
+
+    def get(self, panel_id: str) -> dict | None:
+        """Panel record without its journal, or None if unknown"""
+        raise NotImplementedError
+
+    def append(self, panel_id: str, owner: str, seq: int, event: dict) -> bool:
+        raise NotImplementedError
+
+    def events(self, panel_id: str, after: int = 0) -> list[tuple[int, dict]]:
+        """Saved events numbered above `after`, in order"""
+        raise NotImplementedError
+
+    def claim(self, panel_id: str, owner: str, lease_seconds: float) -> bool:
+        """Take over a running panel whose lease has lapsed"""
+        raise NotImplementedError
+
+    def renew(self, panel_id: str, owner: str, lease_seconds: float) -> bool:
+        raise NotImplementedError
+
+    def release(self, panel_id: str, owner: str):
+        """Give up the lease early so the next reconnect can claim the panel at once"""
+        raise NotImplementedError
+
+    def finish(self, panel_id: str, owner: str, status: str) -> bool:
+        raise NotImplementedError
+
+    def save_journal(self, panel_id: str, journal: dict | None):
+        raise NotImplementedError
+
+    def load_journal(self, panel_id: str) -> dict | None:
+        raise NotImplementedError
+
+
+class SQLitePanelStore(PanelStore):
+    """PanelStore in one SQLite file, for workers on the same host.
+
+    Events are one row each; journals are a zlib-compressed JSON blob
+    on the panel row. Panels that ended more than `retention_seconds`
+    ago are pruned whenever another one ends. Each thread gets its own
+    connection.
+    """
+
+    def __init__(self, path: str | Path = STORE_PATH, retention_seconds: float = 3600):
+        self.path = Path(path)
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Every event is a commit; WAL keeps them durable across a crash
+            # of the process, which is what a takeover needs
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def create(self, panel_id: str, topic: str, roster: dict, protocol: int, owner: str, lease_seconds: float):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO panels (id, topic, roster, protocol, status, owner, lease_until, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (panel_id, topic, json.dumps(roster), protocol, RUNNING, owner, now + lease_seconds, now),
+            )
+
+    def get(self, panel_id: str) -> dict | None:
+        row = self._connect().execute(
+            "SELECT id, topic, roster, protocol, status, owner, lease_until, last_seq FROM panels WHERE id = ?",
+            (panel_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {**dict(row), "roster": json.loads(row["roster"])}
+
+    def append(self, panel_id: str, owner: str, seq: int, event: dict) -> bool:
+        with self._connect() as conn:
+            owned = conn.execute(
+                "UPDATE panels SET last_seq = ? WHERE id = ? AND owner = ? AND last_seq < ?",
+                (seq, panel_id, owner, seq),
+            ).rowcount > 0
+            if owned:
+                conn.execute(
+                    "INSERT INTO panel_events (panel_id, seq, body) VALUES (?, ?, ?)",
+                    (panel_id, seq, json.dumps(event, ensure_ascii=False)),
+                )
+        return owned
+
+    def events(self, panel_id: str, after: int = 0) -> list[tuple[int, dict]]:
+        rows = self._connect().execute(
+            "SELECT seq, body FROM panel_events WHERE panel_id = ? AND seq > ? ORDER BY seq", (panel_id, after)
+        ).fetchall()
+        return [(row["seq"], json.loads(row["body"])) for row in rows]
+
+    def claim(self, panel_id: str, owner: str, lease_seconds: float) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE panels SET owner = ?, lease_until = ? "
+                "WHERE id = ? AND status = ? AND lease_until < ?",
+                (owner, now + lease_seconds, panel_id, RUNNING, now),
+            ).rowcount > 0
+
+    def renew(self, panel_id: str, owner: str, lease_seconds: float) -> bool:
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE panels SET lease_until = ? WHERE id = ? AND owner = ? AND status = ?",
+                (time.time() + lease_seconds, panel_id, owner, RUNNING),
+            ).rowcount > 0
+
+    def release(self, panel_id: str, owner: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE panels SET lease_until = 0 WHERE id = ? AND owner = ?", (panel_id, owner))
+
+    def finish(self, panel_id: str, owner: str, status: str) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            finished = conn.execute(
+                "UPDATE panels SET status = ?, finished_at = ?, journal = NULL WHERE id = ? AND owner = ?",
+                (status, now, panel_id, owner),
+            ).rowcount > 0
+            conn.execute("DELETE FROM panels WHERE finished_at < ?", (now - self.retention_seconds,))
+        return finished
+
+    def save_journal(self, panel_id: str, journal: dict | None):
+        body = zlib.compress(json.dumps(journal, ensure_ascii=False).encode()) if journal is not None else None
+        with self._connect() as conn:
+            conn.execute("UPDATE panels SET journal = ? WHERE id = ?", (body, panel_id))
+
+    def load_journal(self, panel_id: str) -> dict | None:
+        row = self._connect().execute("SELECT journal FROM panels WHERE id = ?", (panel_id,)).fetchone()
+        if row is None or row["journal"] is None:
+            return None
+        return json.loads(zlib.decompress(row["journal"]))
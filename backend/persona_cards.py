@@ -0,0 +1,355 @@
+"""Persona cards: long persona descriptions distilled once into a compact card.
+
+A biography pasted into the persona form, or a persona seeded from a file
+in documents/, would otherwise go verbatim into the agent's system prompt,
+the host's guest list and the speaker selector's prompt on every call.
+Descriptions over MIN_SOURCE_TOKENS are distilled into a card with the
+persona's core story, speaking style and key facts, and the card is used
+in their place. Cards are cached on disk under the hash of the source
+text, so a description is distilled once and again only when it changes.
+
+The built-in distiller is extractive: it picks the most central
+sentences, the ones with dates and figures, and quoted sayings, with no
+model call. `build --llm` rewrites cached cards with a model:
+
+    python backend/persona_cards.py seed documents/zym.txt --name ZhangYiming
+    python backend/persona_cards.py build [--llm]
+    python backend/persona_cards.py show ZhangYiming
+
+Stdlib only, so the Streamlit app can use it too.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable
+from doc_index import split_sentences, tokenize
+from prompts import estimate_tokens
+from turn_policies import shingles, similarity
+
+CARD_VERSION = 1
+ROOT = Path(__file__).resolve().parent.parent
+CARDS_DIR = ROOT / "persona_cards"
+
+# Shorter descriptions are already card-sized and are used as written
+MIN_SOURCE_TOKENS = 300
+CARD_TOKENS = 250
+# Longer sentences are left to the excerpts a model distills from
+LINE_TOKENS = 50
+
+SECTIONS = {"core_story": "Core story", "speaking_style": "Speaking style", "key_facts": "Key facts"}
+
+_FACT = re.compile(r"\d{4}|\d+\s*(?:%|[年岁万亿]|years?\b)")
+_QUOTE = re.compile(r"[“\"「]([^”\"」\n]{8,120})[”\"」]")
+# Card lines are whole sentences: not headings, list marks, bylines or citations
+MIN_LINE_CHARS = 15
+_LINE_END = re.compile(r"[。！？!?….][”’」』\"')）]?$")
+_LINE_START = re.compile(r"^[\w“\"「（(]")
+_REFERENCE = re.compile(r"https?://|www\.|\[\d+\]|>>|^《[^》]*》$")
+_BRACKETS = ("（）", "()", "《》", "“”", "「」", "[]")
+
+
+@dataclass
+class PersonaCard:
+    """Distilled persona: a few lines per section, plus what it was made from"""
+    core_story: list[str] = field(default_factory=list)
+    speaking_style: list[str] = field(default_factory=list)
+    key_facts: list[str] = field(default_factory=list)
+    source_tokens: int = 0
+    distiller: str = "extractive"
+
+    def text(self) -> str:
+        """The card as it goes into system prompts"""
+        blocks = []
+        for key, title in SECTIONS.items():
+            lines = getattr(self, key)
+            if lines:
+                blocks.append(f"{title}:\n" + "\n".join(f"- {line}" for line in lines))
+        return "\n".join(blocks)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text())
+
+    @property
+    def introduction(self) -> str:
+        """One line for the host's guest list and the speaker selector"""
+        line = (self.core_story or self.key_facts or [""])[0]
+        return line if len(line) <= 160 else line[:160].rstrip() + "…"
+
+    def reduction(self) -> float:
+        """Share of the description's tokens the card saves"""
+        return 1 - self.tokens / self.source_tokens if self.source_tokens else 0.0
+
+
+def _trim(card: PersonaCard, max_tokens: int) -> PersonaCard:
+    # Drop the last line of the longest section until the card fits
+    while card.tokens > max_tokens:
+        key = max(SECTIONS, key=lambda k: len(getattr(card, k)))
+        lines = getattr(card, key)
+        if len(lines) <= 1 and all(len(getattr(card, k)) <= 1 for k in SECTIONS):
+            break
+        lines.pop()
+    return card
+
+
+def is_statement(line: str) -> bool:
+    """Whether a line reads as a sentence fit for a card, not a fragment, citation or link"""
+    if len(line) < MIN_LINE_CHARS or not _LINE_END.search(line) or not _LINE_START.match(line):
+        return False
+    if _REFERENCE.search(line):
+        return False
+    # A bracket left open means the splitter cut through a citation or aside
+    return all(line.count(left) == line.count(right) for left, right in _BRACKETS)
+
+
+def _rank(text: str) -> tuple[list[str], Callable[[str], float]]:
+    """The source's sentences, most central first, and the score that ranked them"""
+    sentences = [s for s in split_sentences(text) if 15 <= len(s) <= 200]
+    frequency = Counter(term for sentence in sentences for term in tokenize(sentence))
+    spread = Counter(term for sentence in sentences for term in set(tokenize(sentence)))
+
+    def score(sentence: str) -> float:
+        # Terms the source keeps coming back to, but not in every sentence
+        terms = tokenize(sentence)
+        weight = sum(math.log1p(frequency[t]) * math.log(len(sentences) / spread[t])
+                     for t in set(terms) if t in spread)
+        return weight / math.sqrt(len(terms) + 1)
+
+    return sorted(sentences, key=score, reverse=True), score
+
+
+def excerpts(text: str, max_tokens: int) -> str:
+    """The most central sentences that fit in max_tokens, in source order"""
+    picked, total = [], 0
+    for sentence in _rank(text)[0]:
+        tokens = estimate_tokens(sentence)
+        if total + tokens > max_tokens:
+            break
+        picked.append(sentence)
+        total += tokens
+    picked.sort(key=text.find)
+    return "\n".join(picked)
+
+
+def extractive_card(text: str, max_tokens: int = CARD_TOKENS) -> PersonaCard:
+    """Card from the source's own sentences: the most central ones, ones with dates and figures, quoted sayings"""
+    ranked, score = _rank(text)
+    ranked = [sentence for sentence in ranked if is_statement(sentence)]
+    chosen: list[frozenset] = []
+
+    def pick(candidates, limit: int) -> list[str]:
+        picked = []
+        for candidate in candidates:
+            if estimate_tokens(candidate) > LINE_TOKENS:
+                continue
+            candidate_shingles = shingles(candidate)
+            # Sources often repeat themselves; keep one of each
+            if any(similarity(candidate_shingles, seen) > 0.5 for seen in chosen):
+                continue
+            chosen.append(candidate_shingles)
+            picked.append(candidate)
+            if len(picked) == limit:
+                break
+        return picked
+
+    core = pick(ranked, 3)
+    facts = pick((sentence for sentence in ranked if _FACT.search(sentence)), 4)
+    quotes = sorted(set(_QUOTE.findall(text)), key=score, reverse=True)
+    style = pick((f"“{quote}”" for quote in quotes), 3)
+    # Core story in the order the source tells it
+    core.sort(key=text.find)
+    if not core:
+        # No usable sentences, e.g. one long unpunctuated run
+        core = [re.sub(r"\s+", " ", text)[:160].strip() + "…"]
+    card = PersonaCard(core, style, facts, source_tokens=estimate_tokens(text))
+    return _trim(card, max_tokens)
+
+
+DISTILL_PROMPT = """Distill the persona description below into a persona card for a role-play panel.
+Write it in the description's language, in the second person where natural. Use exactly these
+three headings, each followed by 2-4 lines starting with "- ":
+Core story:
+Speaking style:
+Key facts:
+Keep the whole card under {max_tokens} tokens. Key facts need specific dates, names and figures.
+
+Description (the most relevant excerpts if it was long):
+{source}"""
+
+
+def parse_card(reply: str) -> dict[str, list[str]]:
+    """Sections of a model-written card, keyed like PersonaCard's fields"""
+    titles = {title.lower(): key for key, title in SECTIONS.items()}
+    sections, current = {}, None
+    for line in reply.splitlines():
+        line = line.strip()
+        heading = line.strip("#* ").rstrip(":：").lower()
+        if heading in titles:
+            current = titles[heading]
+            sections[current] = []
+        elif current and line.startswith(("-", "•", "*")):
+            sections[current].append(line.lstrip("-•* ").strip())
+    return sections
+
+
+def llm_distiller(client, max_tokens: int = CARD_TOKENS, excerpt_tokens: int = 3000):
+    """Distiller that has a model write the card from the source's best excerpts"""
+    from autogen_core.models import SystemMessage, UserMessage
+
+    async def distill(text: str) -> PersonaCard:
+        # Whole sources that fit are sent as they are; long ones as excerpts
+        source = text if estimate_tokens(text) <= excerpt_tokens else excerpts(text, excerpt_tokens)
+        result = await client.create([
+            SystemMessage(content="You write concise persona cards."),
+            UserMessage(content=DISTILL_PROMPT.format(max_tokens=max_tokens, source=source), source="user"),
+        ])
+        sections = parse_card(result.content if isinstance(result.content, str) else "")
+        if not sections.get("core_story"):
+            # An unusable reply keeps the extractive card
+            return extractive_card(text, max_tokens)
+        card = PersonaCard(**{key: sections.get(key, []) for key in SECTIONS},
+                           source_tokens=estimate_tokens(text), distiller="llm")
+        return _trim(card, max_tokens)
+    return distill
+
+
+class PersonaCardCache:
+    """Cards on disk under the hash of their source text, with an in-memory LRU in front.
+
+    `card(text)` returns None for descriptions short enough to use as
+    they are, and distills (extractively) on a miss. Safe to share
+    between threads and processes; a card file is written whole or not
+    at all.
+    """
+
+    def __init__(self, path: str | Path = CARDS_DIR, min_tokens: int = MIN_SOURCE_TOKENS,
+                 max_tokens: int = CARD_TOKENS, max_entries: int = 256):
+        self.path = Path(path)
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, PersonaCard] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(f"{CARD_VERSION}\x00{text}".encode()).hexdigest()
+
+    def needs_card(self, text: str) -> bool:
+        return estimate_tokens(text) > self.min_tokens
+
+    def get(self, text: str) -> PersonaCard | None:
+        """The cached card for this text, without distilling"""
+        key = self.key(text)
+        with self._lock:
+            card = self._memory.get(key)
+            if card is not None:
+                self._memory.move_to_end(key)
+                return card
+        try:
+            card = PersonaCard(**json.loads((self.path / f"{key}.json").read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError):
+            return None
+        self._remember(key, card)
+        return card
+
+    def put(self, text: str, card: PersonaCard):
+        key = self.key(text)
+        self.path.mkdir(parents=True, exist_ok=True)
+        target = self.path / f"{key}.json"
+        partial = target.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        partial.write_text(json.dumps(asdict(card), ensure_ascii=False), encoding="utf-8")
+        os.replace(partial, target)
+        self._remember(key, card)
+
+    def card(self, text: str) -> PersonaCard | None:
+        """Card to use instead of `text`, or None if the text is short enough as it is"""
+        if not self.needs_card(text):
+            return None
+        card = self.get(text)
+        if card is None:
+            card = extractive_card(text, self.max_tokens)
+            self.put(text, card)
+        return card
+
+    async def distill(self, text: str, distiller) -> PersonaCard | None:
+        """Rewrite this text's card with `distiller`, replacing any cached one"""
+        if not self.needs_card(text):
+            return None
+        card = await distiller(text)
+        self.put(text, card)
+        return card
+
+    def _remember(self, key: str, card: PersonaCard):
+        with self._lock:
+            self._memory[key] = card
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+
+def _report(name: str, card: PersonaCard | None):
+    if card is None:
+        print(f"{name}: short enough to use as written")
+    else:
+        print(f"{name}: {card.source_tokens} -> {card.tokens} tokens ({card.reduction():.0%} smaller, {card.distiller})")
+
+
+async def _main(args):
+    from persona_store import STORE_PATH, PersonaStore
+
+    store = PersonaStore(os.getenv("PERSONA_STORE_PATH", STORE_PATH))
+    cards = PersonaCardCache(os.getenv("PERSONA_CARDS_DIR", CARDS_DIR))
+    distiller = None
+    if getattr(args, "llm", False):
+        import engine
+        distiller = llm_distiller(engine.get_model_client(args.model or engine.DEFAULT_MODEL))
+
+    if args.command == "seed":
+        path = Path(args.source).resolve()
+        description = path.read_text(encoding="utf-8")
+        persona = {"name": args.name, "description": description, "tags": args.tags}
+        # A source under documents/ also grounds the persona's turns
+        documents_dir = ROOT / "documents"
+        if documents_dir in path.parents:
+            persona["documents"] = [path.relative_to(documents_dir).as_posix()]
+        # Seeding again refreshes the persona from its source
+        if not store.update(persona):
+            store.add(persona)
+        records = [store.get(args.name)]
+    elif args.command == "build":
+        records = [store.get(name) for name in store.names(include_host=True)]
+    else:
+        records = [store.get(args.name)]
+        if records[0] is None:
+            raise SystemExit(f"No persona named {args.name}")
+
+    for record in records:
+        card = await cards.distill(record["description"], distiller) if distiller else cards.card(record["description"])
+        _report(record["name"], card)
+        if args.command == "show" and card is not None:
+            print(card.text())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill long persona descriptions into cached persona cards")
+    commands = parser.add_subparsers(dest="command", required=True)
+    seed = commands.add_parser("seed", help="add a persona whose description is a source file")
+    seed.add_argument("source")
+    seed.add_argument("--name", required=True)
+    seed.add_argument("--tags", default="")
+    build = commands.add_parser("build", help="make cards for every persona in the store that needs one")
+    show = commands.add_parser("show", help="print a persona's card")
+    show.add_argument("name")
+    for command in (seed, build):
+        command.add_argument("--llm", action="store_true", help="have a model write the cards")
+        command.add_argument("--model", help="model for --llm (default: the panel model)")
+    asyncio.run(_main(parser.parse_args()))
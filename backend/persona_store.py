@@ -0,0 +1,189 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+STORE_PATH = ROOT / "personas.db"
+LEGACY_JSON = ROOT / "personas.json"
+
+DEFAULT_HOST = {
+    "name": "Host",
+    "description": "A warm and professional radio show host who guides conversations, asks insightful questions, and ensures balanced participation.",
+    "is_host": True,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS personas (
+    name TEXT PRIMARY KEY,
+    description TEXT NOT NULL,
+    is_host INTEGER NOT NULL DEFAULT 0,
+    documents TEXT NOT NULL DEFAULT '[]',
+    model TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS persona_tags (
+    name TEXT NOT NULL REFERENCES personas(name) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (name, tag)
+);
+CREATE INDEX IF NOT EXISTS persona_tags_by_tag ON persona_tags(tag, name);
+CREATE INDEX IF NOT EXISTS personas_by_host ON personas(is_host, name);
+"""
+
+
+def normalize_tags(tags) -> list[str]:
+    """Lowercase, de-duplicated tags from a list or a comma-separated string"""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return sorted({tag.strip().lower() for tag in tags or [] if tag.strip()})
+
+
+class PersonaStore:
+    """SQLite-backed persona catalog shared by the Streamlit app and the backend.
+
+    Every add, update or delete is a single-row transaction, so concurrent
+    sessions never overwrite each other; adding a name that is taken fails
+    rather than replacing it. WAL mode lets readers run while a write is
+    in progress. Each thread gets its own connection. On first use the store
+    imports personas.json and seeds the default host.
+    """
+
+    def __init__(self, path: str | Path = STORE_PATH, legacy_json: str | Path | None = LEGACY_JSON):
+        self.path = Path(path)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # Catalogs created before personas could pick their own model
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(personas)")}
+            if "model" not in columns:
+                conn.execute("ALTER TABLE personas ADD COLUMN model TEXT")
+            if conn.execute("SELECT COUNT(*) FROM personas").fetchone()[0] == 0:
+                self._seed(conn, legacy_json)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _seed(self, conn: sqlite3.Connection, legacy_json: str | Path | None):
+        personas = [DEFAULT_HOST]
+        if legacy_json and os.path.exists(legacy_json):
+            with open(legacy_json, "r") as f:
+                personas += json.load(f)
+        for persona in personas:
+            self._insert(conn, persona)
+
+    def _insert(self, conn: sqlite3.Connection, persona: dict) -> bool:
+        now = datetime.now().isoformat()
+        inserted = conn.execute(
+            "INSERT INTO personas (name, description, is_host, documents, model, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(name) DO NOTHING",
+            (persona["name"], persona["description"], int(bool(persona.get("is_host"))),
+             json.dumps(persona.get("documents", [])), persona.get("model") or None, now, now),
+        ).rowcount > 0
+        if inserted:
+            self._set_tags(conn, persona)
+        return inserted
+
+    def _set_tags(self, conn: sqlite3.Connection, persona: dict):
+        conn.execute("DELETE FROM persona_tags WHERE name = ?", (persona["name"],))
+        conn.executemany(
+            "INSERT INTO persona_tags (name, tag) VALUES (?, ?)",
+            [(persona["name"], tag) for tag in normalize_tags(persona.get("tags"))],
+        )
+
+    def add(self, persona: dict) -> bool:
+        """Insert a new guest persona (and its tags) atomically; False if the name is taken"""
+        if persona["name"] == DEFAULT_HOST["name"] and not persona.get("is_host"):
+            raise ValueError(f"{DEFAULT_HOST['name']} is reserved for the show's host")
+        with self._connect() as conn:
+            return self._insert(conn, persona)
+
+    def update(self, persona: dict) -> bool:
+        """Replace an existing persona's description, documents, model and tags; False if there is none.
+
+        Whether it is the host stays as it was.
+        """
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE personas SET description = ?, documents = ?, model = ?, updated_at = ? WHERE name = ?",
+                (persona["description"], json.dumps(persona.get("documents", [])), persona.get("model") or None,
+                 datetime.now().isoformat(), persona["name"]),
+            ).rowcount > 0
+            if updated:
+                self._set_tags(conn, persona)
+        return updated
+
+    def delete(self, name: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM personas WHERE name = ?", (name,)).rowcount > 0
+
+    def get(self, name: str) -> dict | None:
+        row = self._connect().execute("SELECT * FROM personas WHERE name = ?", (name,)).fetchone()
+        return self._with_tags([row])[0] if row else None
+
+    def host(self) -> dict:
+        row = self._connect().execute("SELECT * FROM personas WHERE is_host = 1 ORDER BY name LIMIT 1").fetchone()
+        return self._with_tags([row])[0] if row else dict(DEFAULT_HOST, documents=[], tags=[])
+
+    def names(self, include_host: bool = False) -> list[str]:
+        """All persona names in order, read from the primary key index only"""
+        sql = "SELECT name FROM personas" + ("" if include_host else " WHERE is_host = 0") + " ORDER BY name"
+        return [row[0] for row in self._connect().execute(sql)]
+
+    def tags(self) -> list[str]:
+        return [row[0] for row in self._connect().execute("SELECT DISTINCT tag FROM persona_tags ORDER BY tag")]
+
+    def query(self, search: str = "", tag: str | None = None, limit: int = 20, offset: int = 0,
+              include_host: bool = False) -> tuple[list[dict], int]:
+        """One page of personas matching a name/description search and a tag, plus the total count"""
+        where, params = [], []
+        if not include_host:
+            where.append("p.is_host = 0")
+        if search:
+            where.append("(p.name LIKE ? ESCAPE '\\' OR p.description LIKE ? ESCAPE '\\')")
+            pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            params += [pattern, pattern]
+        if tag:
+            where.append("p.name IN (SELECT name FROM persona_tags WHERE tag = ?)")
+            params.append(tag.strip().lower())
+        clause = (" WHERE " + " AND ".join(where)) if where else ""
+
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM personas p{clause}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT p.* FROM personas p{clause} ORDER BY p.name LIMIT ? OFFSET ?", [*params, limit, offset]
+        ).fetchall()
+        return self._with_tags(rows), total
+
+    def _with_tags(self, rows: list[sqlite3.Row]) -> list[dict]:
+        if not rows:
+            return []
+        names = [row["name"] for row in rows]
+        tags: dict[str, list[str]] = {name: [] for name in names}
+        placeholders = ",".join("?" * len(names))
+        for name, tag in self._connect().execute(
+            f"SELECT name, tag FROM persona_tags WHERE name IN ({placeholders}) ORDER BY tag", names
+        ):
+            tags[name].append(tag)
+        return [
+            {
+                "name": row["name"],
+                "description": row["description"],
+                "is_host": bool(row["is_host"]),
+                "documents": json.loads(row["documents"]),
+                "model": row["model"],
+                "tags": tags[row["name"]],
+                "created_at": row["created_at"],
+            }
+            for row in rows
+        ]
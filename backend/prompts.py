@@ -0,0 +1,157 @@
+"""System prompt compilation with stable, cache-friendly prefixes.
+
+Provider prompt caches (e.g. OpenAI's, from 1024 tokens in 128-token
+steps) only reuse an exact prefix. Compiled prompts therefore put text
+shared by every agent first, then the agent's own static text, and only
+then anything that changes per episode, such as tonight's guest list.
+Stdlib only, so the Streamlit app can use it too.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: ~4 characters per token, CJK characters count as one"""
+    cjk = len(re.findall(r"[㐀-鿿]", text))
+    return max(1, cjk + (len(text) - cjk) // 4)
+
+
+def render_rules(rules: dict, indent: int = 0) -> str:
+    """DIALOGUE_RULES as indented plain text, in the order they are written"""
+    lines = []
+    pad = "  " * indent
+    for key, value in rules.items():
+        if isinstance(value, dict):
+            lines.append(f"{pad}{key}:")
+            lines.append(render_rules(value, indent + 1))
+        elif isinstance(value, list):
+            lines.append(f"{pad}{key}:")
+            lines.extend(f"{pad}  * {item}" for item in value)
+        else:
+            lines.append(f"{pad}{key}: {value}")
+    return "\n".join(lines)
+
+
+def _dedent(text: str) -> str:
+    # AGENT_CONFIGS personas are indented triple-quoted strings
+    return "\n".join(line.strip() for line in text.strip().splitlines())
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    text: str
+    static_chars: int  # leading characters that never change between episodes
+    key: str
+
+    @property
+    def static_tokens(self) -> int:
+        return estimate_tokens(self.text[:self.static_chars])
+
+
+class PromptCompiler:
+    """Builds system prompts from ordered sections, memoized by content hash.
+
+    `compile(static, dynamic)` joins the static sections, then the
+    per-episode ones. The same inputs always return the same object, so
+    repeated panels send byte-identical prefixes.
+    """
+
+    def __init__(self, shared: str = ""):
+        self.shared = shared.strip()
+        self._compiled: dict[str, CompiledPrompt] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, static: list[str], dynamic: list[str] | None = None) -> CompiledPrompt:
+        static = [part for part in ([self.shared] + [_dedent(s) for s in static]) if part]
+        dynamic = [_dedent(d) for d in dynamic or [] if d]
+        key = hashlib.sha256("\x00".join(static + ["\x01"] + dynamic).encode()).hexdigest()
+        with self._lock:
+            prompt = self._compiled.get(key)
+            if prompt is not None:
+                self.hits += 1
+                return prompt
+            self.misses += 1
+            head = "\n\n".join(static)
+            text = "\n\n".join([head, *dynamic]) if dynamic else head
+            prompt = CompiledPrompt(text=text, static_chars=len(head), key=key)
+            self._compiled[key] = prompt
+            return prompt
+
+    def stats(self) -> dict:
+        return {"compiled": len(self._compiled), "hits": self.hits, "misses": self.misses}
+
+
+class PrefixCacheTracker:
+    """Estimates how much of each prompt a provider prefix cache could serve.
+
+    Remembers the last `max_prompts` prompts per model and reports, for each
+    new one, the longest prefix it shares with any of them. Only prefixes of
+    at least `min_tokens` count, rounded down to `block_tokens`, matching
+    how providers cache.
+    """
+
+    def __init__(self, min_tokens: int = 1024, block_tokens: int = 128, max_prompts: int = 64):
+        self.min_tokens = min_tokens
+        self.block_tokens = block_tokens
+        self.max_prompts = max_prompts
+        self._recent: dict[str, OrderedDict[str, None]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, prompt: str) -> dict:
+        """Per-call prompt tokens, shared-prefix tokens and the cacheable part of them"""
+        with self._lock:
+            recent = self._recent.setdefault(model, OrderedDict())
+            shared = max((self._common_prefix(prompt, seen) for seen in recent), default=0)
+            recent[prompt] = None
+            recent.move_to_end(prompt)
+            while len(recent) > self.max_prompts:
+                recent.popitem(last=False)
+
+        prefix_tokens = estimate_tokens(prompt[:shared]) if shared else 0
+        cached = 0
+        if prefix_tokens >= self.min_tokens:
+            cached = self.min_tokens + (prefix_tokens - self.min_tokens) // self.block_tokens * self.block_tokens
+        return {
+            "prompt_tokens": estimate_tokens(prompt),
+            "prefix_tokens": prefix_tokens,
+            "cached_tokens": cached,
+        }
+
+    @staticmethod
+    def _common_prefix(a: str, b: str) -> int:
+        limit = min(len(a), len(b))
+        index = 0
+        # Compare in blocks first, then narrow down within the first differing block
+        step = 256
+        while index + step <= limit and a[index:index + step] == b[index:index + step]:
+            index += step
+        while index < limit and a[index] == b[index]:
+            index += 1
+        return index
+
+
+def panel_prompts(compiler: PromptCompiler, configs: dict[str, dict]) -> dict[str, CompiledPrompt]:
+    """System prompts for a roster's persona configs (host listed first).
+
+    A persona's "background", if any, goes after its static text so
+    personas built from the same template share a cacheable prefix.
+    """
+    host, *guests = configs
+    lineup = "\n".join(
+        f"- {configs[name].get('display_name', name)}: {configs[name].get('introduction', configs[name]['description'])}"
+        for name in guests
+    )
+    prompts = {host: compiler.compile([configs[host]["persona"]], [f"Tonight's guests:\n{lineup}"])}
+    for name in guests:
+        prompts[name] = compiler.compile([configs[name]["persona"]], [configs[name].get("background")])
+    return prompts
+
+
+def serialize_prompt(messages: list[tuple[str, str]]) -> str:
+    """(role, content) pairs as one string, in the order the provider sees them"""
+    return "".join(f"<{role}>{content}\n" for role, content in messages)
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import Any, AsyncGenerator, Sequence
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, SystemMessage
+from doc_index import DocumentIndex, Passage, format_passages
+from model_clients import DelegatingChatCompletionClient
+
+
+class RetrievalChatCompletionClient(DelegatingChatCompletionClient):
+    """Grounds an agent's turns in passages from the document index.
+
+    Before each call the latest message is used as the query and the top-k
+    passages are added as a system message for that call only, so they
+    never pile up in the agent's context. A search that misses the latency
+    budget is abandoned and the turn goes ahead ungrounded; it keeps running
+    in its thread, so the index is warm for the next turn.
+    """
+
+    def __init__(self, inner: ChatCompletionClient, index: DocumentIndex, sources: list[str],
+                 k: int = 3, timeout: float = 0.2):
+        super().__init__(inner)
+        self.index = index
+        self.sources = sources
+        self.k = k
+        self.timeout = timeout
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.queries = 0
+        self.timeouts = 0
+        self.passages = 0
+        self.search_seconds = 0.0
+
+    async def _retrieve(self, messages: Sequence[LLMMessage]) -> list[Passage]:
+        query = next((m.content for m in reversed(messages)
+                      if not isinstance(m, SystemMessage) and isinstance(m.content, str)), "")
+        if not query:
+            return []
+
+        self.queries += 1
+        start = time.perf_counter()
+        try:
+            passages = await asyncio.wait_for(
+                asyncio.to_thread(self.index.search, query, self.k, self.sources), self.timeout
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            passages = []
+        self.search_seconds += time.perf_counter() - start
+        self.passages += len(passages)
+        return passages
+
+    async def _grounded(self, messages: Sequence[LLMMessage]) -> list[LLMMessage]:
+        passages = await self._retrieve(messages)
+        if not passages:
+            return list(messages)
+        # After the persona's system message, before the conversation
+        position = next((i for i, m in enumerate(messages) if not isinstance(m, SystemMessage)), len(messages))
+        return [*messages[:position], SystemMessage(content=format_passages(passages)), *messages[position:]]
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        return await self.inner.create(await self._grounded(messages), **kwargs)
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        async for chunk in self.inner.create_stream(await self._grounded(messages), **kwargs):
+            yield chunk
+
+    def reset_episode(self):
+        self._reset_stats()
+        super().reset_episode()
+
+    def episode_stats(self) -> dict:
+        stats = super().episode_stats()
+        if self.queries:
+            stats["retrieval"] = {
+                "queries": self.queries,
+                "timeouts": self.timeouts,
+                "passages": self.passages,
+                "avg_search_ms": 1000 * self.search_seconds / self.queries,
+            }
+        return stats
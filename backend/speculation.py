@@ -0,0 +1,300 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncGenerator, Sequence
+from autogen_core.model_context import UnboundedChatCompletionContext
+from autogen_core.models import AssistantMessage, ChatCompletionClient, CreateResult, LLMMessage, SystemMessage, UserMessage
+from model_clients import DelegatingChatCompletionClient
+from prompts import estimate_tokens
+from turn_scheduler import HOST, TurnScheduler
+
+
+def prompt_key(messages: Sequence[LLMMessage]) -> str:
+    """Exact identity of a prompt, used to match a speculation to the real call"""
+    return json.dumps([
+        (type(m).__name__, getattr(m, "source", None), m.content if isinstance(m.content, str) else str(m.content))
+        for m in messages
+    ])
+
+
+def host_thread(host, content: str) -> list[LLMMessage]:
+    """The thread as every agent will see it once the host's finished reply is added"""
+    # The host's context holds the whole thread so far, minus this reply
+    return [
+        UserMessage(content=m.content, source=m.source) if isinstance(m, AssistantMessage) else m
+        for m in host.model_context._messages
+    ] + [UserMessage(content=content, source=HOST)]
+
+
+async def predict_prompt(agent, system_prompt: str, thread: list[LLMMessage]) -> list[LLMMessage] | None:
+    """The prompt an agent will send once it has seen `thread`, or None if its context can't tell"""
+    context = agent.model_context
+    # Every context mirrors the same thread, so the agent is missing
+    # exactly the messages past its own length
+    unseen = thread[len(context._messages):]
+    if hasattr(context, "preview"):
+        history = await context.preview(unseen)
+    elif isinstance(context, UnboundedChatCompletionContext):
+        history = context._messages + unseen
+    else:
+        return None
+    return [SystemMessage(content=system_prompt), *history]
+
+
+class SpeculationBudget:
+    """Server-wide cap and totals for speculative completions.
+
+    At most `max_inflight` speculations run at once across all panels, and
+    a panel stops speculating once its discarded speculations have cost
+    `max_wasted_tokens` in one episode.
+    """
+
+    def __init__(self, max_inflight: int = 4, max_wasted_tokens: int = 4000):
+        self.max_inflight = max_inflight
+        self.max_wasted_tokens = max_wasted_tokens
+        self.inflight = 0
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.wasted_tokens = 0
+        self.latency_saved_seconds = 0.0
+
+    def stats(self) -> dict:
+        decided = self.hits + self.misses
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": self.hits / decided if decided else 0.0,
+            "wasted_tokens": self.wasted_tokens,
+            "latency_saved_ms": 1000 * self.latency_saved_seconds,
+        }
+
+
+class Prefetch:
+    """A completion started before its call; chunks are buffered so the call can replay them"""
+
+    def __init__(self, agent: str, messages: list[LLMMessage]):
+        self.agent = agent
+        self.key = prompt_key(messages)
+        self.prompt_tokens = sum(estimate_tokens(m.content) for m in messages if isinstance(m.content, str))
+        self.chunks: list[str | CreateResult] = []
+        self.error: Exception | None = None
+        self.done = False
+        self.started_at = time.perf_counter()
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        self._changed = asyncio.Event()
+
+    async def run(self, client: ChatCompletionClient, messages: list[LLMMessage], stream: bool):
+        try:
+            if stream:
+                async for chunk in client.create_stream(messages):
+                    self._push(chunk)
+            else:
+                self._push(await client.create(messages))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self.finished_at = time.perf_counter()
+            self._changed.set()
+
+    def _push(self, chunk: str | CreateResult):
+        self.chunks.append(chunk)
+        self._changed.set()
+
+    async def replay(self) -> AsyncGenerator[str | CreateResult, None]:
+        """Buffered chunks, then live ones until the completion finishes"""
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    def tokens_spent(self) -> int:
+        """Prompt plus generated tokens, whether or not the completion finished"""
+        result = self.chunks[-1] if self.chunks and isinstance(self.chunks[-1], CreateResult) else None
+        if result is not None and result.usage.prompt_tokens:
+            return result.usage.prompt_tokens + result.usage.completion_tokens
+        generated = "".join(chunk for chunk in self.chunks if isinstance(chunk, str))
+        return self.prompt_tokens + (estimate_tokens(generated) if generated else 0)
+
+
+class Speculator:
+    """Starts the next guest's reply as soon as the host's turn names them.
+
+    When the host finishes a turn, the speaker the team will pick next is
+    predicted (exactly, with the rule-based scheduler; from the host's
+    invitation otherwise) and that guest's prompt is rebuilt from its model
+    context. The completion starts right away. If the guest then asks for
+    exactly that prompt, it gets the prefetched reply; any other call
+    cancels the speculation and counts its tokens as wasted.
+    """
+
+    def __init__(self, budget: SpeculationBudget, scheduler: TurnScheduler, system_prompts: dict[str, str],
+                 stream: bool = False):
+        self.budget = budget
+        self.scheduler = scheduler
+        self.system_prompts = system_prompts
+        self.stream = stream
+        self.agents: dict = {}
+        self.clients: dict[str, ChatCompletionClient] = {}
+        self._pending: Prefetch | None = None
+        # Set by build_team when fan-out rounds (see fanout.py) serve some turns
+        self.fan_out = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.wasted_tokens = 0
+        self.saved_per_turn: list[float] = []
+
+    async def reset(self):
+        """Drop any outstanding speculation and clear per-episode counters"""
+        await self._discard()
+        self._reset_stats()
+
+    async def claim(self, agent: str, messages: Sequence[LLMMessage]) -> Prefetch | None:
+        """The speculation for this exact call, if one was started"""
+        pending = self._pending
+        if pending is None:
+            return None
+        if pending.agent != agent or pending.key != prompt_key(messages):
+            await self._discard()
+            return None
+
+        self._pending = None
+        now = time.perf_counter()
+        saved = min(now, pending.finished_at or now) - pending.started_at
+        self.hits += 1
+        self.budget.hits += 1
+        self.budget.latency_saved_seconds += saved
+        self.saved_per_turn.append(1000 * saved)
+        return pending
+
+    async def _discard(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        if pending.task and not pending.task.done():
+            pending.task.cancel()
+            try:
+                await pending.task
+            except asyncio.CancelledError:
+                pass
+        wasted = pending.tokens_spent()
+        self.misses += 1
+        self.wasted_tokens += wasted
+        self.budget.misses += 1
+        self.budget.wasted_tokens += wasted
+
+    async def host_replied(self, content: str):
+        """Called with the host's finished turn, before the team picks a speaker"""
+        await self._discard()
+        host = self.agents.get(HOST)
+        if host is None:
+            return
+
+        thread = host_thread(host, content)
+        turns = [(getattr(m, "source", ""), m.content) for m in thread if isinstance(m.content, str)]
+        if sum(1 for speaker, _ in turns if speaker in self.scheduler.participants) >= self.scheduler.max_turns:
+            return
+        # The round's own completions already cover the next turns
+        if self.fan_out is not None and self.scheduler.fan_out(turns):
+            return
+
+        guest = self.scheduler.select(turns) or self.scheduler.invited(content)
+        if guest is None or guest == HOST or guest not in self.agents:
+            return
+
+        if self.budget.inflight >= self.budget.max_inflight or self.wasted_tokens >= self.budget.max_wasted_tokens:
+            self.skipped += 1
+            self.budget.skipped += 1
+            return
+
+        messages = await predict_prompt(self.agents[guest], self.system_prompts[guest], thread)
+        if messages is None:
+            return
+
+        speculation = Prefetch(guest, messages)
+        speculation.task = asyncio.create_task(self._run(speculation, messages))
+        self._pending = speculation
+        self.started += 1
+        self.budget.started += 1
+
+    async def _run(self, speculation: Prefetch, messages: list[LLMMessage]):
+        self.budget.inflight += 1
+        try:
+            await speculation.run(self.clients[speculation.agent], messages, self.stream)
+        finally:
+            self.budget.inflight -= 1
+
+    def stats(self) -> dict:
+        decided = self.hits + self.misses
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": self.hits / decided if decided else 0.0,
+            "wasted_tokens": self.wasted_tokens,
+            "latency_saved_ms": sum(self.saved_per_turn),
+            "latency_saved_per_turn_ms": [round(ms, 1) for ms in self.saved_per_turn],
+        }
+
+
+class SpeculativeChatCompletionClient(DelegatingChatCompletionClient):
+    """Serves an agent's calls from the team's Speculator when it guessed right"""
+
+    def __init__(self, inner: ChatCompletionClient, speculator: Speculator, agent: str):
+        super().__init__(inner)
+        self.speculator = speculator
+        self.agent = agent
+        speculator.clients[agent] = inner
+
+    async def _claim(self, messages: Sequence[LLMMessage], kwargs: dict) -> Prefetch | None:
+        # Speculations are made without tools or structured output
+        agent = None if kwargs.get("tools") or kwargs.get("json_output") else self.agent
+        return await self.speculator.claim(agent, messages)
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        speculation = await self._claim(messages, kwargs)
+        result = None
+        if speculation is not None:
+            async for chunk in speculation.replay():
+                result = chunk
+        # A failed prefetch is retried as a normal call
+        if not isinstance(result, CreateResult):
+            result = await self.inner.create(messages, **kwargs)
+        await self._finished(result)
+        return result
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        speculation = await self._claim(messages, kwargs)
+        chunks = self.inner.create_stream(messages, **kwargs)
+        if speculation is not None:
+            chunks = speculation.replay()
+        async for chunk in chunks:
+            if isinstance(chunk, CreateResult):
+                await self._finished(chunk)
+            yield chunk
+        if speculation is not None and speculation.error is not None:
+            raise speculation.error
+
+    async def _finished(self, result: CreateResult):
+        if self.agent == HOST and isinstance(result.content, str):
+            await self.speculator.host_replied(result.content)
@@ -0,0 +1,169 @@
+import asyncio
+import itertools
+import re
+from typing import Any, AsyncGenerator, Sequence
+from autogen_core.models import (
+    ChatCompletionClient,
+    CreateResult,
+    LLMMessage,
+    ModelFamily,
+    ModelInfo,
+    RequestUsage,
+)
+from prompts import estimate_tokens
+
+# Used by SelectorGroupChat's default speaker-selection prompt
+SELECTOR_MARKER = "select the next role from"
+CLOSING_LINE = "Thank you for listening"
+
+
+def split_tokens(text: str) -> list[str]:
+    """Split a reply into streaming chunks of roughly one token each"""
+    return re.findall(r"\S+\s*|\s+", text) or [text]
+
+
+class StubScript:
+    """Scripted, persona-aware replies for offline panels.
+
+    Works on plain (role, source, content) dicts so the same script backs
+    both the in-process client and the OpenAI-compatible HTTP stub.
+    """
+
+    def __init__(self, closing_after: int = 6):
+        self.closing_after = closing_after
+        self._selector_turn = itertools.count()
+
+    def reply(self, messages: list[dict]) -> str:
+        text = "\n".join(m.get("content") or "" for m in messages)
+        if SELECTOR_MARKER in text:
+            return self._select(text)
+
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        topic = self._topic(text)
+        own_turns = sum(1 for m in messages if m.get("role") == "assistant")
+
+        if "You are the host" in system:
+            return self._host(system, messages, topic, own_turns)
+
+        match = re.search(r"You are ([^.,\n]+?)(?: in | at | after |[.,\n])", system)
+        name = match.group(1).strip() if match else "a guest"
+        if own_turns == 0:
+            return (f"As {name}, the concern about {topic} reminds me of my own darkest year. "
+                    f"I kept going by focusing on one concrete step each day.")
+        return f"Speaking as {name}, I would add that specific plans beat vague hopes every time."
+
+    def _topic(self, text: str) -> str:
+        match = re.search(r"(?:listener's concern:|discussion about:)\s*([^\n]+)", text)
+        return match.group(1).strip()[:80] if match else "tonight's question"
+
+    def _host(self, system: str, messages: list[dict], topic: str, own_turns: int) -> str:
+        # Host turns that were folded into a context summary still count
+        summaries = "\n".join(m["content"] for m in messages if m.get("source") == "summary")
+        own_turns += len(re.findall(r"^- Host:", summaries, re.MULTILINE))
+        if own_turns >= self.closing_after:
+            return f"Those are the insights for tonight. {CLOSING_LINE}."
+
+        guests = self._guests(system, messages)
+        guest = guests[own_turns % len(guests)] if guests else "our guest"
+        if own_turns == 0:
+            return f"Tonight's concern is {topic}. {guest}, would you start us off?"
+        return f"That is a vivid example. {guest}, how did you handle a similar moment?"
+
+    def _guests(self, system: str, messages: list[dict]) -> list[str]:
+        listed = re.search(r"Available participants:\s*([^\n]+)", system)
+        if listed:
+            return [name.strip() for name in listed.group(1).split(",") if name.strip()]
+        bullets = re.findall(r"^\s*-\s*([A-Z][\w]+)[^:\n]*:", system, re.MULTILINE)
+        if bullets:
+            return bullets
+        sources = [m.get("source") for m in messages if m.get("source") not in (None, "user", "Host")]
+        return list(dict.fromkeys(sources))
+
+    def _select(self, text: str) -> str:
+        match = re.search(re.escape(SELECTOR_MARKER) + r"\s*\[([^\]]*)\]", text)
+        names = re.findall(r"'([^']+)'", match.group(1)) if match else []
+        if not names:
+            return "Host"
+        return names[next(self._selector_turn) % len(names)]
+
+
+def _as_dicts(messages: Sequence[LLMMessage]) -> list[dict]:
+    roles = {"SystemMessage": "system", "UserMessage": "user", "AssistantMessage": "assistant"}
+    return [
+        {
+            "role": roles.get(type(message).__name__, "user"),
+            "source": getattr(message, "source", None),
+            "content": message.content if isinstance(message.content, str) else str(message.content),
+        }
+        for message in messages
+    ]
+
+
+class StubChatCompletionClient(ChatCompletionClient):
+    """Offline stand-in for OpenAIChatCompletionClient.
+
+    `ttft` is the delay before the first token and `tokens_per_second`
+    paces the rest (None streams instantly), so benchmarks can separate
+    our overhead from provider latency.
+    """
+
+    def __init__(self, model: str = "stub", ttft: float = 0.0, tokens_per_second: float | None = None,
+                 script: StubScript | None = None):
+        self.model = model
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.script = script or StubScript()
+        self._total = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._last = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def _usage(self, messages: Sequence[LLMMessage], reply: str) -> RequestUsage:
+        usage = RequestUsage(prompt_tokens=self.count_tokens(messages), completion_tokens=estimate_tokens(reply))
+        self._last = usage
+        self._total = RequestUsage(
+            prompt_tokens=self._total.prompt_tokens + usage.prompt_tokens,
+            completion_tokens=self._total.completion_tokens + usage.completion_tokens,
+        )
+        return usage
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        reply = self.script.reply(_as_dicts(messages))
+        delay = self.ttft
+        if self.tokens_per_second:
+            delay += len(split_tokens(reply)) / self.tokens_per_second
+        if delay:
+            await asyncio.sleep(delay)
+        return CreateResult(finish_reason="stop", content=reply, usage=self._usage(messages, reply), cached=False)
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        reply = self.script.reply(_as_dicts(messages))
+        if self.ttft:
+            await asyncio.sleep(self.ttft)
+        for token in split_tokens(reply):
+            if self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield token
+        yield CreateResult(finish_reason="stop", content=reply, usage=self._usage(messages, reply), cached=False)
+
+    async def close(self) -> None:
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._last
+
+    def total_usage(self) -> RequestUsage:
+        return self._total
+
+    def count_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+        return sum(estimate_tokens(m["content"]) + 4 for m in _as_dicts(messages))
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+        return 8192 - self.count_tokens(messages)
+
+    @property
+    def capabilities(self):
+        return self.model_info
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return ModelInfo(vision=False, function_calling=False, json_output=False,
+                         family=ModelFamily.UNKNOWN, structured_output=False)
@@ -0,0 +1,118 @@
+"""OpenAI-compatible HTTP stub for running the panel apps without an API key.
+
+    python stub_server.py --port 8100 --ttft 0.3 --tokens-per-second 40
+
+Point a client at it with OPENAI_BASE_URL=http://localhost:8100/v1.
+"""
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from prompts import estimate_tokens
+from stub_model import StubScript, split_tokens
+
+
+def make_handler(script: StubScript, ttft: float, tokens_per_second: float | None):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            messages = [
+                {"role": m.get("role"), "source": m.get("name"), "content": m.get("content") or ""}
+                for m in body.get("messages", [])
+            ]
+            reply = script.reply(messages)
+            usage = {
+                "prompt_tokens": sum(estimate_tokens(m["content"]) for m in messages),
+                "completion_tokens": estimate_tokens(reply),
+            }
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            model = body.get("model", "stub")
+
+            if ttft:
+                time.sleep(ttft)
+
+            if not body.get("stream"):
+                if tokens_per_second:
+                    time.sleep(len(split_tokens(reply)) / tokens_per_second)
+                self._send_json({
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": reply},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": usage,
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            def chunk(delta: dict, finish_reason=None, **extra):
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    **extra,
+                }
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+                self.wfile.flush()
+
+            chunk({"role": "assistant", "content": ""})
+            for token in split_tokens(reply):
+                if tokens_per_second:
+                    time.sleep(1 / tokens_per_second)
+                chunk({"content": token})
+            chunk({}, finish_reason="stop", usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def _send_json(self, payload: dict):
+            encoded = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+    return StubHandler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8100, ttft: float = 0.0,
+          tokens_per_second: float | None = None) -> ThreadingHTTPServer:
+    """Create the stub server; call serve_forever() on the result"""
+    handler = make_handler(StubScript(), ttft, tokens_per_second)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--ttft", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.ttft, args.tokens_per_second)
+    print(f"Stub model listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,472 @@
+import asyncio
+import functools
+import json
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Callable, Sequence
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.teams import SelectorGroupChat
+from autogen_agentchat.conditions import TextMentionTermination
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import ChatCompletionClient
+from config.agent_configs import AGENT_CONFIGS, DIALOGUE_RULES, STORE_GUEST_PERSONA, STORE_HOST_PERSONA
+from config.model_routing import ROUTING_PROFILES
+from fanout import FanOut, FanOutChatCompletionClient
+from metrics import MetricsRegistry, TurnTracer
+from persona_cards import PersonaCardCache
+from model_clients import DelegatingChatCompletionClient, TracingChatCompletionClient
+from prompts import PromptCompiler, panel_prompts, render_rules
+from speculation import SpeculationBudget, SpeculativeChatCompletionClient, Speculator
+from termination import PolicyTermination
+from turn_policies import EarlyStop, TurnPolicy
+from turn_scheduler import SCHEDULERS, TurnScheduler, persona_aliases
+
+HOST = "Host"
+SELECTOR = "selector"  # client name used for the team's speaker-selection calls
+DEFAULT_MODEL = "gpt-4"
+MAX_TURNS = 12
+
+# Shared by every agent and placed first in each system prompt, so all
+# agents' prompts start with the same cacheable prefix
+PANEL_FORMAT = "Panel format for everyone on the show:\n" + render_rules(DIALOGUE_RULES)
+
+
+def agent_name(name: str) -> str:
+    """A persona name as an agent name, which must be a Python identifier"""
+    cleaned = re.sub(r"\W", "", name)
+    return cleaned if cleaned.isidentifier() else f"Guest{cleaned}"
+
+
+def store_configs(host: dict, guests: Sequence[dict], cards: PersonaCardCache | None = None) -> dict[str, dict]:
+    """AGENT_CONFIGS-style entries for persona store records, host first.
+
+    With `cards`, long descriptions are replaced by their persona cards
+    (see persona_cards.py) everywhere they would reach a prompt.
+    """
+    def card_for(record: dict):
+        return cards.card(record["description"]) if cards else None
+
+    host_card = card_for(host)
+    configs = {HOST: {
+        "description": host_card.introduction if host_card else host["description"],
+        "persona": STORE_HOST_PERSONA,
+        "documents": list(host.get("documents") or []),
+    }}
+    if host.get("model"):
+        configs[HOST]["model"] = host["model"]
+    for guest in guests:
+        name = agent_name(guest["name"])
+        if name in configs:
+            raise ValueError(f"Duplicate persona: {guest['name']}")
+        configs[name] = {
+            "description": guest["description"],
+            "display_name": guest["name"],
+            "persona": STORE_GUEST_PERSONA,
+            "background": f"You are {guest['name']}.\nBackground and expertise:\n{guest['description']}",
+            "documents": list(guest.get("documents") or []),
+        }
+        card = card_for(guest)
+        if card:
+            configs[name]["description"] = configs[name]["introduction"] = card.introduction
+            configs[name]["background"] = f"You are {guest['name']}.\nPersona card:\n{card.text()}"
+        if guest.get("model"):
+            configs[name]["model"] = guest["model"]
+    return configs
+
+
+# Rosters are rebuilt for every request, so parsed casts are shared
+_parse_cast = functools.lru_cache(maxsize=256)(json.loads)
+
+
+@dataclass(frozen=True)
+class Roster:
+    """Persona set and model config that make two teams interchangeable"""
+    personas: tuple[str, ...]
+    model: str = DEFAULT_MODEL
+    stream: bool = False  # agents emit token chunks while generating
+    # Persona configs as canonical JSON when they don't come from AGENT_CONFIGS,
+    # so two rosters with the same definitions share pooled teams
+    cast: str = ""
+    # ROUTING_PROFILES entry; empty means the engine's default profile
+    routing: str = ""
+
+    @classmethod
+    def create(cls, guests: Sequence[str] | None = None, model: str = DEFAULT_MODEL,
+               stream: bool = False, routing: str = "") -> "Roster":
+        """Build a roster with the host first and guests in AGENT_CONFIGS order"""
+        check_routing(routing)
+        if not guests:
+            guests = [name for name in AGENT_CONFIGS if name != HOST]
+
+        unknown = [name for name in guests if name not in AGENT_CONFIGS]
+        if unknown:
+            raise ValueError(f"Unknown personas: {', '.join(unknown)}")
+
+        # Order is fixed so the same persona set always maps to the same key
+        chosen = set(guests)
+        ordered = [name for name in AGENT_CONFIGS if name in chosen and name != HOST]
+        return cls(personas=(HOST, *ordered), model=model, stream=stream, routing=routing)
+
+    @classmethod
+    def from_store(cls, host: dict, guests: Sequence[dict], model: str = DEFAULT_MODEL,
+                   stream: bool = False, routing: str = "", cards: PersonaCardCache | None = None) -> "Roster":
+        """Build a roster from persona store records, in the order given; `cards` distills long descriptions"""
+        check_routing(routing)
+        if not guests:
+            raise ValueError("A panel needs at least one guest")
+        configs = store_configs(host, guests, cards)
+        cast = json.dumps(configs, sort_keys=True, ensure_ascii=False)
+        return cls(personas=tuple(configs), model=model, stream=stream, cast=cast, routing=routing)
+
+    @property
+    def guests(self) -> tuple[str, ...]:
+        return self.personas[1:]
+
+    @property
+    def configs(self) -> dict[str, dict]:
+        """Persona config per agent, host first"""
+        configs = _parse_cast(self.cast) if self.cast else AGENT_CONFIGS
+        return {name: configs[name] for name in self.personas}
+
+    def model_for(self, name: str, default_routing: str = "") -> str:
+        """Model for an agent or the selector: its persona's own, else its role's in the routing profile, else the roster's"""
+        own = self.configs.get(name, {}).get("model")
+        if own:
+            return own
+        role = "selector" if name == SELECTOR else "host" if name == HOST else "guest"
+        return ROUTING_PROFILES[self.routing or default_routing or "single"].get(role, self.model)
+
+
+def check_routing(routing: str):
+    if routing and routing not in ROUTING_PROFILES:
+        raise ValueError(f"Unknown routing profile: {routing} (choose from {', '.join(ROUTING_PROFILES)})")
+
+
+class PooledTeam:
+    """A team plus its agents, reusable across requests after a reset"""
+
+    def __init__(self, roster: Roster, team: SelectorGroupChat, agents: dict[str, AssistantAgent],
+                 scheduler: TurnScheduler, clients: dict[str, ChatCompletionClient],
+                 contexts: dict[str, ChatCompletionContext] | None = None,
+                 speculator: Speculator | None = None, tracer: TurnTracer | None = None,
+                 early_stop: EarlyStop | None = None, fan_out: FanOut | None = None):
+        self.roster = roster
+        self.team = team
+        self.agents = agents
+        self.scheduler = scheduler
+        self.clients = clients
+        self.contexts = contexts or {}
+        self.speculator = speculator
+        self.tracer = tracer
+        self.early_stop = early_stop
+        self.fan_out = fan_out
+
+    def bind(self, panel):
+        """Attach the panel this team is about to serve"""
+        for client in self.clients.values():
+            if isinstance(client, DelegatingChatCompletionClient):
+                client.bind_panel(panel)
+
+    async def reset(self):
+        """Clear agent contexts, termination state and counters for the next request"""
+        if self.speculator:
+            await self.speculator.reset()
+        if self.fan_out:
+            await self.fan_out.reset()
+        await self.team.reset()
+        self.scheduler.reset()
+        if self.tracer:
+            self.tracer.reset()
+        if self.early_stop:
+            self.early_stop.start()
+        self.bind(None)
+        for client in self.clients.values():
+            if isinstance(client, DelegatingChatCompletionClient):
+                client.reset_episode()
+
+    async def cancel(self, reason: str) -> dict | None:
+        """Stop the prefetches of a cancelled run and count what cancelling it saved"""
+        if self.speculator:
+            await self.speculator.reset()
+        if self.fan_out:
+            await self.fan_out.reset()
+        if self.tracer:
+            return self.tracer.cancelled(reason, self.scheduler.max_turns)
+        return None
+
+    def episode_stats(self) -> dict:
+        """Per-episode counters reported when a panel finishes"""
+        clients = {
+            name: client.episode_stats()
+            for name, client in self.clients.items()
+            if isinstance(client, DelegatingChatCompletionClient)
+        }
+        stats = {
+            "scheduler": self.scheduler.stats(),
+            "clients": {name: stats for name, stats in clients.items() if stats},
+        }
+        contexts = {name: context.stats() for name, context in self.contexts.items() if hasattr(context, "stats")}
+        if contexts:
+            stats["context"] = contexts
+        if self.speculator:
+            stats["speculation"] = self.speculator.stats()
+        if self.fan_out:
+            stats["fan_out"] = self.fan_out.stats()
+        if self.tracer and self.tracer.spans:
+            stats["turn_spans"] = self.tracer.spans
+        if self.tracer and self.tracer.usage:
+            stats["usage"] = self.tracer.usage
+        if self.early_stop and self.early_stop.stop:
+            stats["termination"] = self.early_stop.stop
+        return stats
+
+
+def build_team(roster: Roster, client_for: Callable[[str], ChatCompletionClient],
+               scheduler: str = "rules", llm_fallback: bool = False,
+               max_turns: int = MAX_TURNS,
+               context_for: Callable[[str], ChatCompletionContext] | None = None,
+               speculation: SpeculationBudget | None = None,
+               compiler: PromptCompiler | None = None,
+               metrics: MetricsRegistry | None = None,
+               policies: Callable[[], list[TurnPolicy]] | None = None,
+               routing: str = "",
+               fan_out: bool = False) -> PooledTeam:
+    """Create the agents and group chat for a roster.
+
+    `client_for(name)` returns the model client for an agent, or for the
+    speaker selector when called with SELECTOR. `context_for(name)`, if
+    given, returns the agent's model context; otherwise agents keep the
+    full transcript. With a `speculation` budget, guests' replies are
+    prefetched while the team is still picking them (see speculation.py).
+    With `fan_out`, turns the scheduler knows to be independent, such as
+    the closing answers, are generated at once (see fanout.py).
+    System prompts come from `compiler`, which should be shared between
+    teams so identical prompts are compiled once. Every turn is traced
+    (see metrics.py) and reported to `metrics` if given. `policies()`, if
+    given, returns fresh early-stop policies for this team; the panel ends
+    as soon as one fires (see turn_policies.py). `routing` is the default
+    routing profile; the tracer uses it to attribute tokens to models, so
+    it should match what `client_for` routes to.
+    """
+    compiler = compiler or PromptCompiler(PANEL_FORMAT)
+    configs = roster.configs
+    system_prompts = {name: prompt.text for name, prompt in panel_prompts(compiler, configs).items()}
+    clients = {name: client_for(name) for name in (*roster.personas, SELECTOR)}
+    contexts = {name: context_for(name) for name in roster.personas} if context_for else {}
+    aliases = {name: persona_aliases(name, configs[name]) for name in roster.guests}
+    turn_scheduler = SCHEDULERS[scheduler](roster.personas, max_turns, llm_fallback=llm_fallback, aliases=aliases)
+
+    speculator = None
+    if speculation:
+        speculator = Speculator(speculation, turn_scheduler, system_prompts, stream=roster.stream)
+        for name in roster.personas:
+            clients[name] = SpeculativeChatCompletionClient(clients[name], speculator, name)
+
+    rounds = None
+    if fan_out:
+        rounds = FanOut(turn_scheduler, system_prompts, stream=roster.stream)
+        for name in roster.personas:
+            clients[name] = FanOutChatCompletionClient(clients[name], rounds, name)
+        if speculator:
+            speculator.fan_out = rounds
+
+    tracer = TurnTracer(metrics, models={name: roster.model_for(name, routing) for name in clients})
+    turn_scheduler.tracer = tracer
+    clients = {
+        name: TracingChatCompletionClient(client, tracer, name, selector=name == SELECTOR)
+        for name, client in clients.items()
+    }
+
+    agents = {
+        name: AssistantAgent(
+            name=name,
+            description=configs[name]["description"],
+            system_message=system_prompts[name],
+            model_client=clients[name],
+            model_client_stream=roster.stream,
+            model_context=contexts.get(name)
+        )
+        for name in roster.personas
+    }
+    if speculator:
+        speculator.agents = agents
+    if rounds:
+        rounds.agents = agents
+
+    termination = TextMentionTermination("Thank you for listening")
+    early_stop = None
+    if policies:
+        early_stop = EarlyStop(policies(), max_turns, metrics)
+        termination = termination | PolicyTermination(early_stop)
+
+    team = SelectorGroupChat(
+        participants=list(agents.values()),
+        selector_func=turn_scheduler,
+        model_client=clients[SELECTOR],
+        termination_condition=termination,
+        max_turns=max_turns
+    )
+    return PooledTeam(roster, team, agents, turn_scheduler, clients, contexts, speculator, tracer, early_stop, rounds)
+
+
+class PoolStats:
+    """Hit/miss and checkout-wait counters for a TeamPool"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.discarded = 0
+        self.evicted = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float):
+        self.total_wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def to_dict(self) -> dict:
+        checkouts = self.hits + self.misses
+        return {
+            "checkouts": checkouts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / checkouts if checkouts else 0.0,
+            "waits": self.waits,
+            "discarded": self.discarded,
+            "evicted": self.evicted,
+            "avg_wait_ms": 1000 * self.total_wait_seconds / checkouts if checkouts else 0.0,
+            "max_wait_ms": 1000 * self.max_wait_seconds,
+        }
+
+
+class TeamPool:
+    """Hands out reset, ready-to-run teams keyed by roster.
+
+    At most `max_per_roster` teams exist per roster; further checkouts wait
+    until one is returned. Any mix of personas makes a roster, so at most
+    `max_idle` idle teams are kept across all of them; past that, the
+    least recently returned ones are dropped.
+    """
+
+    def __init__(self, factory: Callable[[Roster], PooledTeam], max_per_roster: int = 8,
+                 max_idle: int | None = None):
+        self._factory = factory
+        self._max_per_roster = max_per_roster
+        self._max_idle = max_idle
+        self._idle: dict[Roster, list[PooledTeam]] = {}
+        # Every idle team, least recently returned first
+        self._idle_order: OrderedDict[PooledTeam, None] = OrderedDict()
+        self._created: dict[Roster, int] = {}
+        self._available = asyncio.Condition()
+        self._releasing: set[asyncio.Task] = set()
+        self.stats = PoolStats()
+
+    @asynccontextmanager
+    async def checkout(self, roster: Roster):
+        """Borrow a team for one panel; it is reset and returned on exit"""
+        pooled = await self._acquire(roster)
+        healthy = False
+        try:
+            yield pooled
+            healthy = True
+        finally:
+            if not healthy:
+                # Counted out before any await, so a cancel can't shrink the pool
+                self._discard(pooled)
+            # A panel cancelled mid-release still gets its team reset and returned
+            release = asyncio.ensure_future(self._release(pooled, healthy))
+            self._releasing.add(release)
+            release.add_done_callback(self._releasing.discard)
+            await asyncio.shield(release)
+
+    async def _acquire(self, roster: Roster) -> PooledTeam:
+        start = time.perf_counter()
+        pooled = None
+        waited = False
+        async with self._available:
+            while True:
+                idle = self._idle.get(roster)
+                if idle:
+                    pooled = idle.pop()
+                    if not idle:
+                        del self._idle[roster]
+                    del self._idle_order[pooled]
+                    self.stats.hits += 1
+                    break
+                if self._created.get(roster, 0) < self._max_per_roster:
+                    self._created[roster] = self._created.get(roster, 0) + 1
+                    self.stats.misses += 1
+                    break
+                if not waited:
+                    self.stats.waits += 1
+                    waited = True
+                await self._available.wait()
+        self.stats.record_wait(time.perf_counter() - start)
+
+        if pooled is None:
+            try:
+                pooled = self._factory(roster)
+            except Exception:
+                await self._forget(roster)
+                raise
+        return pooled
+
+    async def _release(self, pooled: PooledTeam, healthy: bool):
+        # A run that was interrupted may leave the team mid-turn, so only
+        # teams that finished cleanly and reset without error go back
+        if healthy:
+            try:
+                await pooled.reset()
+            except Exception:
+                healthy = False
+                self._discard(pooled)
+
+        async with self._available:
+            if healthy:
+                self._idle.setdefault(pooled.roster, []).append(pooled)
+                self._idle_order[pooled] = None
+                self._evict()
+            self._available.notify()
+
+    def _evict(self):
+        while self._max_idle is not None and len(self._idle_order) > self._max_idle:
+            pooled, _ = self._idle_order.popitem(last=False)
+            idle = self._idle[pooled.roster]
+            idle.remove(pooled)
+            if not idle:
+                del self._idle[pooled.roster]
+            self.stats.evicted += 1
+            self._uncount(pooled.roster)
+
+    def _discard(self, pooled: PooledTeam):
+        self.stats.discarded += 1
+        self._uncount(pooled.roster)
+
+    def _uncount(self, roster: Roster):
+        # Rosters with no teams left are dropped, not kept at zero
+        self._created[roster] -= 1
+        if not self._created[roster]:
+            del self._created[roster]
+
+    async def _forget(self, roster: Roster):
+        self._uncount(roster)
+        async with self._available:
+            self._available.notify()
+
+    def snapshot(self) -> dict:
+        """Current stats plus per-roster occupancy"""
+        rosters = [
+            {
+                "personas": list(roster.personas),
+                "model": roster.model,
+                "stream": roster.stream,
+                "created": created,
+                "idle": len(self._idle.get(roster, [])),
+            }
+            for roster, created in self._created.items()
+        ]
+        return {**self.stats.to_dict(), "rosters": rosters}
@@ -0,0 +1,47 @@
+from typing import Sequence
+from autogen_agentchat.base import TerminatedException, TerminationCondition
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, StopMessage
+from turn_policies import EarlyStop
+
+TASK_SOURCE = "user"  # source of the task message that opens a panel
+
+
+class PolicyTermination(TerminationCondition):
+    """Ends a team's run when one of an EarlyStop's policies fires.
+
+    Policy clocks start when the task message arrives rather than at
+    reset, since pooled teams are reset long before their next panel.
+    The stop message carries the policy's reason, which becomes the run's
+    stop_reason.
+    """
+
+    def __init__(self, early_stop: EarlyStop):
+        self.early_stop = early_stop
+        self._terminated = False
+
+    @property
+    def terminated(self) -> bool:
+        return self._terminated
+
+    async def __call__(self, messages: Sequence[BaseAgentEvent | BaseChatMessage]) -> StopMessage | None:
+        if self._terminated:
+            raise TerminatedException("Termination condition has already been reached")
+
+        for message in messages:
+            if not isinstance(message, BaseChatMessage):
+                continue
+            if message.source == TASK_SOURCE:
+                self.early_stop.start()
+                continue
+            usage = message.models_usage
+            tokens = usage.prompt_tokens + usage.completion_tokens if usage else 0
+            reason = self.early_stop.observe(message.source, message.to_model_text(), tokens)
+            if reason:
+                self._terminated = True
+                return StopMessage(content=reason, source="PolicyTermination")
+        return None
+
+    async def reset(self) -> None:
+        # The team resets its condition as soon as a run stops; the stop is
+        # kept for the episode stats until the next task message
+        self._terminated = False
@@ -0,0 +1,151 @@
+import json
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+STORE_PATH = ROOT / "transcripts.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    id TEXT PRIMARY KEY,
+    topic TEXT NOT NULL,
+    personas TEXT NOT NULL,
+    model TEXT,
+    turns INTEGER NOT NULL,
+    stop_reason TEXT,
+    created_at TEXT NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS episode_personas (
+    persona TEXT NOT NULL,
+    id TEXT NOT NULL REFERENCES episodes(id),
+    PRIMARY KEY (persona, id)
+);
+CREATE INDEX IF NOT EXISTS episodes_by_topic ON episodes(topic);
+CREATE INDEX IF NOT EXISTS episodes_by_created ON episodes(created_at);
+"""
+
+
+class TranscriptRecorder:
+    """Builds a transcript from a panel's events, in either /chat protocol.
+
+    Keeps whole messages only (the listener's task and each finished
+    turn); token deltas are not needed to replay a panel.
+    """
+
+    def __init__(self, episode_id: str, topic: str, personas: list[str], model: str | None = None):
+        self.episode_id = episode_id
+        self.topic = topic
+        self.personas = personas
+        self.model = model
+        self.messages: list[dict] = []
+        self.stop_reason = None
+        self.stats = None
+
+    def add(self, event: dict):
+        if event["type"] in ("message", "turn_end"):
+            self.messages.append({
+                "speaker": event["speaker"],
+                "content": event["content"],
+                "timestamp": event.get("timestamp"),
+            })
+        elif event["type"] == "episode_end":
+            self.stop_reason = event.get("stop_reason")
+            self.stats = event.get("stats")
+
+    def transcript(self) -> dict:
+        return {
+            "id": self.episode_id,
+            "topic": self.topic,
+            "personas": self.personas,
+            "model": self.model,
+            "messages": self.messages,
+            "stop_reason": self.stop_reason,
+            "stats": self.stats,
+        }
+
+
+class TranscriptStore:
+    """Append-only SQLite store of finished panels, shared by the backend and the Streamlit app.
+
+    Messages and stats are kept as one zlib-compressed JSON blob per
+    episode; id, topic and personas are indexed columns so episodes can
+    be listed and searched without decompressing anything. Each thread
+    gets its own connection.
+    """
+
+    def __init__(self, path: str | Path = STORE_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, transcript: dict) -> bool:
+        """Store a finished panel; an id that is already stored is left as it was"""
+        body = zlib.compress(json.dumps(
+            {"messages": transcript["messages"], "stats": transcript.get("stats")}, ensure_ascii=False
+        ).encode())
+        turns = sum(1 for message in transcript["messages"] if message["speaker"] != "user")
+        with self._connect() as conn:
+            inserted = conn.execute(
+                "INSERT INTO episodes (id, topic, personas, model, turns, stop_reason, created_at, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO NOTHING",
+                (transcript["id"], transcript["topic"], json.dumps(transcript["personas"]), transcript.get("model"),
+                 turns, transcript.get("stop_reason"), datetime.now().isoformat(), body),
+            ).rowcount > 0
+            if inserted:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO episode_personas (persona, id) VALUES (?, ?)",
+                    [(persona, transcript["id"]) for persona in transcript["personas"]],
+                )
+        return inserted
+
+    def get(self, episode_id: str) -> dict | None:
+        row = self._connect().execute("SELECT * FROM episodes WHERE id = ?", (episode_id,)).fetchone()
+        if row is None:
+            return None
+        return {**self._summary(row), **json.loads(zlib.decompress(row["body"]))}
+
+    def query(self, search: str = "", persona: str | None = None, limit: int = 20,
+              offset: int = 0) -> tuple[list[dict], int]:
+        """One page of episode summaries (newest first) matching a topic search and a persona"""
+        where, params = [], []
+        if search:
+            where.append("e.topic LIKE ? ESCAPE '\\'")
+            params.append("%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if persona:
+            where.append("e.id IN (SELECT id FROM episode_personas WHERE persona = ?)")
+            params.append(persona)
+        clause = (" WHERE " + " AND ".join(where)) if where else ""
+
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM episodes e{clause}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT e.id, e.topic, e.personas, e.model, e.turns, e.stop_reason, e.created_at "
+            f"FROM episodes e{clause} ORDER BY e.created_at DESC LIMIT ? OFFSET ?", [*params, limit, offset]
+        ).fetchall()
+        return [self._summary(row) for row in rows], total
+
+    @staticmethod
+    def _summary(row: sqlite3.Row) -> dict:
+        return {
+            "id": row["id"],
+            "topic": row["topic"],
+            "personas": json.loads(row["personas"]),
+            "model": row["model"],
+            "turns": row["turns"],
+            "stop_reason": row["stop_reason"],
+            "created_at": row["created_at"],
+        }
@@ -0,0 +1,199 @@
+"""Policies that end a panel early once more turns would be wasted.
+
+Each policy watches the finished turns and returns a stop reason when it
+fires: a token budget, a near-duplicate of a recent turn, several turns
+in a row that add almost nothing new, or a wall-clock deadline. EarlyStop
+combines them and counts the turns the stop saved. Stdlib only, so the
+Streamlit app can use the same policies as the backend.
+"""
+import re
+import time
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def shingles(text: str, size: int = 3) -> frozenset:
+    """Character n-grams; they work the same for English and CJK text"""
+    text = normalize_text(text).lower()
+    if len(text) <= size:
+        return frozenset([text])
+    return frozenset(text[i:i + size] for i in range(len(text) - size + 1))
+
+
+def similarity(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two shingle sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class TurnPolicy:
+    """Base policy: sees every finished turn and may return a stop reason"""
+
+    name = "policy"
+
+    def start(self):
+        """A new panel is starting"""
+
+    def observe(self, speaker: str, text: str, tokens: int) -> str | None:
+        raise NotImplementedError
+
+
+class TokenBudget(TurnPolicy):
+    """Stops once the panel's completions have used `max_tokens` (prompt plus generated)"""
+
+    name = "token_budget"
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self.start()
+
+    def start(self):
+        self.used = 0
+
+    def observe(self, speaker: str, text: str, tokens: int) -> str | None:
+        self.used += tokens
+        if self.used >= self.max_tokens:
+            return f"Token budget of {self.max_tokens} reached ({self.used} used)"
+        return None
+
+
+class Deadline(TurnPolicy):
+    """Stops at the first turn that ends after `seconds` of wall-clock time"""
+
+    name = "deadline"
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.start()
+
+    def start(self):
+        # Pooled teams are reset long before their next run, so the clock
+        # starts with the panel, not with the reset
+        self.started_at = time.monotonic()
+
+    def observe(self, speaker: str, text: str, tokens: int) -> str | None:
+        elapsed = time.monotonic() - self.started_at
+        if elapsed >= self.seconds:
+            return f"Deadline of {self.seconds:g}s reached after {elapsed:.1f}s"
+        return None
+
+
+class Repetition(TurnPolicy):
+    """Stops when a turn nearly repeats one of the last `window` turns.
+
+    Catches repeated greetings, agents echoing each other and the same
+    speaker answering twice.
+    """
+
+    name = "repetition"
+
+    def __init__(self, threshold: float = 0.9, window: int = 4):
+        self.threshold = threshold
+        self.window = window
+        self.start()
+
+    def start(self):
+        self.recent: list[tuple[str, frozenset]] = []
+
+    def observe(self, speaker: str, text: str, tokens: int) -> str | None:
+        current = shingles(text)
+        for other, seen in reversed(self.recent):
+            score = similarity(current, seen)
+            if score >= self.threshold:
+                return f"{speaker} repeated a recent turn by {other} (similarity {score:.2f})"
+        self.recent = [*self.recent, (speaker, current)][-self.window:]
+        return None
+
+
+class Stall(TurnPolicy):
+    """Stops after `patience` turns in a row that are mostly made of things already said"""
+
+    name = "stall"
+
+    def __init__(self, patience: int = 3, min_novelty: float = 0.2):
+        self.patience = patience
+        self.min_novelty = min_novelty
+        self.start()
+
+    def start(self):
+        self.seen: set = set()
+        self.stalled = 0
+
+    def observe(self, speaker: str, text: str, tokens: int) -> str | None:
+        current = shingles(text)
+        novelty = len(current - self.seen) / len(current)
+        self.seen |= current
+        self.stalled = self.stalled + 1 if novelty < self.min_novelty else 0
+        if self.stalled >= self.patience:
+            return f"Stalled: {self.stalled} turns in a row added under {self.min_novelty:.0%} new content"
+        return None
+
+
+class EarlyStop:
+    """Runs a set of policies over a panel and records which one stopped it.
+
+    Turns the stop cut off (up to `max_turns`) are counted as saved, along
+    with an estimate of the tokens they would have used, and reported to
+    `metrics` if given.
+    """
+
+    def __init__(self, policies: list[TurnPolicy], max_turns: int, metrics=None):
+        self.policies = policies
+        self.max_turns = max_turns
+        self.metrics = metrics
+        self.start()
+
+    def start(self):
+        for policy in self.policies:
+            policy.start()
+        self.turns = 0
+        self.tokens = 0
+        self.stop: dict | None = None
+
+    def observe(self, speaker: str, text: str, tokens: int = 0) -> str | None:
+        """Feed one finished agent turn; returns the stop reason if a policy fired"""
+        if self.stop:
+            return self.stop["message"]
+        self.turns += 1
+        self.tokens += tokens
+        for policy in self.policies:
+            reason = policy.observe(speaker, text, tokens)
+            if reason:
+                self._stopped(policy, reason)
+                return reason
+        return None
+
+    def _stopped(self, policy: TurnPolicy, reason: str):
+        saved = max(0, self.max_turns - self.turns)
+        self.stop = {
+            "policy": policy.name,
+            "message": reason,
+            "turns": self.turns,
+            "turns_saved": saved,
+            "tokens_saved_estimate": self.tokens // self.turns * saved if self.turns else 0,
+        }
+        if self.metrics is not None:
+            self.metrics.inc("panel_early_stops_total", policy=policy.name)
+            self.metrics.inc("panel_turns_saved_total", saved, policy=policy.name)
+            self.metrics.inc("panel_tokens_saved_estimate_total", self.stop["tokens_saved_estimate"], policy=policy.name)
+
+
+def default_policies(token_budget: int | None = None, deadline_seconds: float | None = None,
+                     repetition_threshold: float | None = 0.9, stall_turns: int | None = 3,
+                     min_novelty: float = 0.2) -> list[TurnPolicy]:
+    """Policies for the given settings; None or 0 leaves one out"""
+    policies: list[TurnPolicy] = []
+    if token_budget:
+        policies.append(TokenBudget(token_budget))
+    if deadline_seconds:
+        policies.append(Deadline(deadline_seconds))
+    if repetition_threshold:
+        policies.append(Repetition(repetition_threshold))
+    if stall_turns:
+        policies.append(Stall(stall_turns, min_novelty))
+    return policies
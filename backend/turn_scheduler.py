@@ -0,0 +1,217 @@
+import re
+import time
+from typing import Sequence
+from autogen_agentchat.messages import AgentEvent, ChatMessage, ModelClientStreamingChunkEvent
+from config.agent_configs import AGENT_CONFIGS, DIALOGUE_RULES
+
+HOST = "Host"
+
+# Phase names as written in DIALOGUE_RULES
+OPENING, INTERACTION, CLOSING = DIALOGUE_RULES["Dialogue flow"]
+
+
+def persona_aliases(name: str, config: dict | None = None) -> list[str]:
+    """Names a host might use to address a persona"""
+    config = config or {}
+    aliases = [name, *config.get("aliases", [])]
+    if config.get("display_name"):
+        aliases.append(config["display_name"])
+
+    # "SultanMehmed" is also addressed as "Sultan" or "Mehmed"
+    parts = re.findall(r"[A-Z][a-z]+|[a-z]+", name)
+    if len(parts) > 1:
+        aliases.extend(part for part in parts if len(part) > 2)
+
+    return list(dict.fromkeys(alias.lower() for alias in aliases))
+
+
+def _alias_pattern(alias: str) -> re.Pattern:
+    # Word boundaries mean nothing in CJK text, so match those anywhere
+    if re.search(r"[぀-ヿ㐀-鿿]", alias):
+        return re.compile(re.escape(alias))
+    return re.compile(rf"(?<!\w){re.escape(alias)}(?!\w)", re.IGNORECASE)
+
+
+def _turns(messages: Sequence[AgentEvent | ChatMessage]) -> list[tuple[str, str]]:
+    """(speaker, text) for every finished chat message in the thread"""
+    turns = []
+    for message in messages:
+        if isinstance(message, ModelClientStreamingChunkEvent):
+            continue
+        content = getattr(message, "content", None)
+        if isinstance(content, str):
+            turns.append((message.source, content))
+    return turns
+
+
+class TurnScheduler:
+    """Base scheduler: always defers to the SelectorGroupChat LLM selector.
+
+    Instances are used as `selector_func`. Returning None asks the team's
+    model to pick the next speaker, which costs one extra completion.
+    """
+
+    def __init__(self, participants: Sequence[str], max_turns: int, llm_fallback: bool = True,
+                 aliases: dict[str, list[str]] | None = None):
+        self.participants = list(participants)
+        self.guests = [name for name in self.participants if name != HOST]
+        self.max_turns = max_turns
+        self.llm_fallback = llm_fallback
+        aliases = aliases or {
+            name: persona_aliases(name, AGENT_CONFIGS.get(name)) for name in self.guests
+        }
+        self._patterns = {
+            name: [_alias_pattern(alias) for alias in aliases.get(name, [name.lower()])]
+            for name in self.guests
+        }
+        # Set by build_team to time each decision (see metrics.TurnTracer)
+        self.tracer = None
+        self.reset()
+
+    def reset(self):
+        """Clear per-episode counters"""
+        self.rule_decisions = 0
+        self.llm_decisions = 0
+
+    def __call__(self, messages: Sequence[AgentEvent | ChatMessage]) -> str | None:
+        start = time.perf_counter()
+        speaker = self.select(_turns(messages))
+        if speaker is None:
+            self.llm_decisions += 1
+        else:
+            self.rule_decisions += 1
+        if self.tracer:
+            # An LLM decision's model call is added by the selector's client
+            self.tracer.selected("llm" if speaker is None else "rules", time.perf_counter() - start)
+        return speaker
+
+    def select(self, turns: list[tuple[str, str]]) -> str | None:
+        return None
+
+    def fan_out(self, turns: list[tuple[str, str]]) -> list[str]:
+        """Guests who answer the last turn independently, in speaking order.
+
+        Their replies can all be generated at once (see fanout.py). The LLM
+        selector's picks aren't known ahead, so nothing fans out here.
+        """
+        return []
+
+    def invited(self, text: str) -> str | None:
+        """Guest addressed in a message; the mention closest to the end wins"""
+        best, best_pos = None, -1
+        for name, patterns in self._patterns.items():
+            for pattern in patterns:
+                for match in pattern.finditer(text):
+                    if match.start() > best_pos:
+                        best, best_pos = name, match.start()
+        return best
+
+    def stats(self) -> dict:
+        # Without a selector_func every turn would be an LLM selection
+        return {
+            "rule_decisions": self.rule_decisions,
+            "llm_decisions": self.llm_decisions,
+            "selector_calls_avoided": self.rule_decisions,
+        }
+
+
+class RuleBasedScheduler(TurnScheduler):
+    """Picks speakers from the phases in DIALOGUE_RULES without an LLM call.
+
+    Opening: the host introduces the topic and every guest gives a first
+    speech. Interaction: the host's question goes to whoever it addresses;
+    a guest who names another guest gets one interactive comment back.
+    Closing: the host asks a summary question, each guest answers, and the
+    host summarizes. The last turns of `max_turns` are reserved for it.
+    """
+
+    def __init__(self, participants: Sequence[str], max_turns: int, llm_fallback: bool = False,
+                 aliases: dict[str, list[str]] | None = None):
+        super().__init__(participants, max_turns, llm_fallback, aliases)
+
+    @property
+    def closing_start(self) -> int:
+        """Agent turn index where the closing phase begins"""
+        # Summary question, one answer per guest, closing summary; never
+        # before every guest has had a first speech, each after a host turn
+        closing_length = len(self.guests) + 2
+        return max(self.max_turns - closing_length, 2 * len(self.guests))
+
+    def phase(self, turns: list[tuple[str, str]]) -> str:
+        spoken = self._agent_turns(turns)
+        if len(spoken) >= self.closing_start:
+            return CLOSING
+        if any(guest not in {speaker for speaker, _ in spoken} for guest in self.guests):
+            return OPENING
+        return INTERACTION
+
+    def select(self, turns: list[tuple[str, str]]) -> str | None:
+        spoken = self._agent_turns(turns)
+        if not spoken:
+            return HOST
+
+        last_speaker, last_content = spoken[-1]
+        phase = self.phase(turns)
+
+        if phase == CLOSING:
+            return self._closing_speaker(spoken)
+
+        if last_speaker == HOST:
+            invited = self.invited(last_content)
+            if invited:
+                return invited
+            if phase == OPENING:
+                return self._next_first_speaker(spoken)
+            # An uninvited question after the opening is the one ambiguous case
+            if self.llm_fallback:
+                return None
+            return self._least_recent_guest(spoken)
+
+        mentioned = self.invited(last_content)
+        if mentioned == last_speaker:
+            mentioned = None
+
+        # Guests resonate once with a guest they mention, then the host steps in
+        if phase == INTERACTION and mentioned and spoken[-2][0] == HOST:
+            return mentioned
+
+        # The closing summary question has to follow a guest turn
+        if len(spoken) == self.closing_start - 1:
+            return mentioned or self._least_recent_guest(spoken, exclude=last_speaker)
+        return HOST
+
+    def fan_out(self, turns: list[tuple[str, str]]) -> list[str]:
+        # Closing answers respond to the summary question, not to each other
+        spoken = self._agent_turns(turns)
+        if len(spoken) != self.closing_start + 1 or spoken[-1][0] != HOST:
+            return []
+        # Answers past max_turns are never asked for
+        return [guest for position, guest in enumerate(self.guests, start=1)
+                if self.closing_start + position < self.max_turns]
+
+    def _agent_turns(self, turns: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        return [(speaker, text) for speaker, text in turns if speaker in self.participants]
+
+    def _closing_speaker(self, spoken: list[tuple[str, str]]) -> str:
+        position = len(spoken) - self.closing_start
+        if 1 <= position <= len(self.guests):
+            return self.guests[position - 1]
+        return HOST
+
+    def _next_first_speaker(self, spoken: list[tuple[str, str]]) -> str:
+        have_spoken = {speaker for speaker, _ in spoken}
+        return next(guest for guest in self.guests if guest not in have_spoken)
+
+    def _least_recent_guest(self, spoken: list[tuple[str, str]], exclude: str | None = None) -> str:
+        # A lone guest follows themselves rather than leaving no one
+        last_seen = {guest: -1 for guest in self.guests if guest != exclude} or {guest: -1 for guest in self.guests}
+        for index, (speaker, _) in enumerate(spoken):
+            if speaker in last_seen:
+                last_seen[speaker] = index
+        return min(last_seen, key=lambda guest: last_seen[guest])
+
+
+SCHEDULERS = {
+    "llm": TurnScheduler,
+    "rules": RuleBasedScheduler,
+}
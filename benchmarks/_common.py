@@ -0,0 +1,87 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Backend modules import each other as top-level modules
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summarize(samples: list[float]) -> dict:
+    """Millisecond summary of a list of durations in seconds"""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": 1000 * statistics.fmean(ordered),
+        "p50_ms": 1000 * ordered[len(ordered) // 2],
+        "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "min_ms": 1000 * ordered[0],
+    }
+
+
+def timed(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+async def timed_async(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def save_results(suite: str, results: dict, path: str | None = None) -> str:
+    """Write results to benchmarks/results/<suite>-<commit>.json (or `path`)"""
+    commit = git_commit()
+    path = path or os.path.join(RESULTS_DIR, f"{suite}-{commit}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "suite": suite,
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "results": results,
+        }, f, indent=2)
+    return path
+
+
+def print_results(results: dict, baseline_path: str | None = None):
+    """Print mean timings, with the change against a saved run if given"""
+    baseline = {}
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)["results"]
+
+    for name, stats in results.items():
+        if "mean_ms" not in stats:
+            print(f"{name:<28} {stats}")
+            continue
+        line = f"{name:<28} mean {stats['mean_ms']:9.3f} ms   p95 {stats['p95_ms']:9.3f} ms"
+        before = baseline.get(name, {}).get("mean_ms")
+        if before:
+            line += f"   {100 * (stats['mean_ms'] - before) / before:+6.1f}% vs baseline"
+        print(line)
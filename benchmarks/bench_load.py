@@ -0,0 +1,245 @@
+"""Load test for /chat: many concurrent SSE streams against one backend worker.
+
+    python benchmarks/bench_load.py [--streams 1,2,4,8,16,32,64] [--ttft 0.05] [--tokens-per-second 200]
+    python benchmarks/bench_load.py --url http://localhost:8000 --pid <server pid>
+
+By default a uvicorn worker running backend/main.py is started on a free
+port with the offline stub model, scratch stores and the content-based
+early stops off, so every panel runs its full 12 turns. Other settings
+(TEAM_POOL_SIZE, MAX_CONCURRENT_COMPLETIONS, ...) are passed on from the
+environment. With --url the streams go to a server that is already
+running instead; give its --pid to sample its memory.
+
+Each level opens that many protocol 2 /chat streams at once and reports
+time to first event, time to the first token delta, gaps between events,
+full-panel latency and the error rate. Errors are failed requests, error
+events and streams that end without episode_end. The server's RSS is
+sampled while the level runs, for its peak and the growth per active
+panel. The capacity is the largest level with no more errors than
+--max-error-rate whose p95 panel latency stays within `--slowdown` times
+that of a single stream; the ramp stops at the first level past it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import BACKEND, print_results, save_results, summarize
+
+import httpx
+
+TOPIC = "I feel lost at work"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid: int | None) -> float | None:
+    """Resident memory of a process from /proc, or None where that isn't available"""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def start_server(port: int, ttft: float, tokens_per_second: float) -> subprocess.Popen:
+    """One uvicorn worker on the stub model, with its stores in a scratch directory"""
+    scratch = tempfile.mkdtemp()
+    env = {
+        "MODEL_BACKEND": "stub",
+        "COMPLETION_CACHE": "false",
+        # Full panels at every level, as in bench_pipeline.py
+        "TERMINATION_REPETITION_THRESHOLD": "0",
+        "TERMINATION_STALL_TURNS": "0",
+        "OPENAI_API_KEY": "stub",
+        "PERSONA_STORE_PATH": os.path.join(scratch, "personas.db"),
+        "TRANSCRIPT_STORE_PATH": os.path.join(scratch, "transcripts.db"),
+        "PANEL_STORE_PATH": os.path.join(scratch, "panels.db"),
+        **os.environ,
+        "STUB_TTFT": str(ttft),
+        "STUB_TOKENS_PER_SECOND": str(tokens_per_second),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env
+    )
+
+
+async def wait_until_up(http: httpx.AsyncClient, server: subprocess.Popen | None, timeout: float = 60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server is not None and server.poll() is not None:
+            raise SystemExit(f"Server exited with code {server.returncode}")
+        try:
+            if (await http.get("/pool/stats")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit(f"Server not up after {timeout:g}s")
+
+
+async def chat_stream(http: httpx.AsyncClient, index: int) -> dict:
+    """One /chat panel from request to the end of its stream, timed event by event"""
+    start = time.perf_counter()
+    sample = {"first_event": None, "first_delta": None, "gaps": [], "latency": None, "error": None}
+    last = None
+    finished = False
+    try:
+        body = {"content": f"Listener {index}: {TOPIC}", "protocol": 2}
+        async with http.stream("POST", "/chat", json=body) as response:
+            if response.status_code != 200:
+                sample["error"] = f"HTTP {response.status_code}"
+                return sample
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                now = time.perf_counter()
+                if last is None:
+                    sample["first_event"] = now - start
+                else:
+                    sample["gaps"].append(now - last)
+                last = now
+                data = json.loads(line[len("data:"):])
+                if data["type"] == "delta" and sample["first_delta"] is None:
+                    sample["first_delta"] = now - start
+                elif data["type"] == "error":
+                    sample["error"] = data["content"]
+                elif data["type"] == "episode_end":
+                    finished = True
+    except httpx.HTTPError as e:
+        sample["error"] = f"{type(e).__name__}: {e}"
+        return sample
+    if not (finished or sample["error"]):
+        sample["error"] = "stream ended without episode_end"
+    if not sample["error"]:
+        sample["latency"] = time.perf_counter() - start
+    return sample
+
+
+def _summary(samples: list[float]) -> dict | None:
+    return summarize(samples) if samples else None
+
+
+async def run_level(http: httpx.AsyncClient, streams: int, pid: int | None) -> dict:
+    """`streams` panels at once; latencies, errors and the server's memory while they run"""
+    rss_before = rss_mb(pid)
+    peak = rss_before
+    running = asyncio.gather(*(chat_stream(http, index) for index in range(streams)))
+    started = time.perf_counter()
+    while not running.done():
+        rss = rss_mb(pid)
+        if rss is not None:
+            peak = rss if peak is None else max(peak, rss)
+        await asyncio.wait([running], timeout=0.1)
+    elapsed = time.perf_counter() - started
+    samples = running.result()
+
+    errors = [sample["error"] for sample in samples if sample["error"]]
+    latencies = [sample["latency"] for sample in samples if sample["latency"] is not None]
+    gaps = [gap for sample in samples for gap in sample["gaps"]]
+    level = {
+        # Panel latency first, so print_results shows it
+        **(_summary(latencies) or {"n": 0}),
+        "streams": streams,
+        "errors": len(errors),
+        "error_rate": round(len(errors) / streams, 4),
+        "first_errors": sorted(set(errors))[:3],
+        "panels_per_second": round(len(latencies) / elapsed, 3),
+        "first_event": _summary([s["first_event"] for s in samples if s["first_event"] is not None]),
+        "first_delta": _summary([s["first_delta"] for s in samples if s["first_delta"] is not None]),
+        "event_gap": {**_summary(gaps), "max_ms": 1000 * max(gaps)} if gaps else None,
+        "rss_before_mb": rss_before,
+        "rss_peak_mb": peak,
+    }
+    if rss_before is not None:
+        level["rss_per_panel_mb"] = round((peak - rss_before) / streams, 3)
+    return level
+
+
+async def run_benchmarks(url: str, levels: list[int], pid: int | None, server: subprocess.Popen | None,
+                         slowdown: float, max_error_rate: float) -> dict:
+    limits = httpx.Limits(max_connections=max(levels) + 4, max_keepalive_connections=max(levels) + 4)
+    timeout = httpx.Timeout(30.0, read=None)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as http:
+        await wait_until_up(http, server)
+        # The first panel builds a team and warms the imports; keep it out of the levels
+        warmup = await chat_stream(http, -1)
+        if warmup["error"]:
+            raise SystemExit(f"Warm-up panel failed: {warmup['error']}")
+
+        results = {"server": {"url": url, "pid": pid, "idle_rss_mb": rss_mb(pid)}}
+        capacity = None
+        single_p95 = None
+        for streams in levels:
+            level = await run_level(http, streams, pid)
+            results[f"streams_{streams}"] = level
+            if level["error_rate"] > max_error_rate or "p95_ms" not in level:
+                break
+            single_p95 = single_p95 or level["p95_ms"]
+            if level["p95_ms"] > slowdown * single_p95:
+                break
+            capacity = streams
+
+        pool = (await http.get("/pool/stats")).json()
+        results["capacity"] = {
+            "streams": capacity,
+            "slowdown": slowdown,
+            "max_error_rate": max_error_rate,
+            "pool_waits": pool["waits"],
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", default="1,2,4,8,16,32,64", help="comma-separated concurrency levels, smallest first")
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="process id of the --url server, for its memory")
+    parser.add_argument("--ttft", type=float, default=0.05, help="stub time to first token, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="stub generation speed")
+    parser.add_argument("--slowdown", type=float, default=1.5, help="allowed p95 growth over one stream")
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="errors allowed within capacity")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--output", help="where to save results")
+    args = parser.parse_args()
+
+    server = None
+    url, pid = args.url, args.pid
+    if url is None:
+        port = free_port()
+        server = start_server(port, args.ttft, args.tokens_per_second)
+        url, pid = f"http://127.0.0.1:{port}", server.pid
+    try:
+        results = asyncio.run(run_benchmarks(url, [int(n) for n in args.streams.split(",")], pid, server,
+                                             args.slowdown, args.max_error_rate))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_results({name: level for name, level in results.items() if name.startswith("streams_")}, args.compare)
+    for name, level in results.items():
+        if not name.startswith("streams_"):
+            continue
+        first = level["first_delta"]["p95_ms"] if level["first_delta"] else None
+        gap = level["event_gap"]["p95_ms"] if level["event_gap"] else None
+        rss = level.get("rss_per_panel_mb")
+        print(f"{name:<28} errors {level['error_rate']:.1%}, first delta p95 {first and round(first)} ms, "
+              f"event gap p95 {gap and round(gap, 1)} ms, {rss} MB RSS/panel")
+    print(f"Capacity: {results['capacity']['streams']} concurrent panels")
+    print(f"Saved {save_results('load', results, args.output)}")
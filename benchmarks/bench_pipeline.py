@@ -0,0 +1,89 @@
+"""End-to-end pipeline microbenchmarks against the offline stub model.
+
+    python benchmarks/bench_pipeline.py [--repeat 20] [--ttft 0] [--compare results/pipeline-<sha>.json]
+
+Results are saved to benchmarks/results/pipeline-<commit>.json so runs
+from different commits can be compared.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+# Must be set before the backend modules are imported
+os.environ.setdefault("MODEL_BACKEND", "stub")
+# Importing main opens the stores and /chat saves its panels; keep them
+# out of the real ones
+_scratch = tempfile.mkdtemp()
+os.environ.setdefault("PERSONA_STORE_PATH", os.path.join(_scratch, "personas.db"))
+os.environ.setdefault("TRANSCRIPT_STORE_PATH", os.path.join(_scratch, "transcripts.db"))
+os.environ.setdefault("PANEL_STORE_PATH", os.path.join(_scratch, "panels.db"))
+os.environ.setdefault("COMPLETION_CACHE", "false")
+# The stub's canned turns repeat, so early stops would cut the /chat panel short
+os.environ.setdefault("TERMINATION_REPETITION_THRESHOLD", "0")
+os.environ.setdefault("TERMINATION_STALL_TURNS", "0")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from _common import print_results, save_results, timed, timed_async  # noqa: E402
+
+import httpx  # noqa: E402
+from panel import PROTOCOL_DELTAS, panel_events, sse  # noqa: E402
+from stub_model import StubChatCompletionClient  # noqa: E402
+from team_pool import Roster, build_team  # noqa: E402
+
+TASK = "Host: Welcome to our Panel Discussion. Today, we received a listener's concern: I feel lost at work"
+
+
+async def run_benchmarks(repeat: int, ttft: float, tokens_per_second: float | None) -> dict:
+    client = StubChatCompletionClient(ttft=ttft, tokens_per_second=tokens_per_second)
+    roster = Roster.create(stream=True)
+    results = {}
+
+    results["agent_construction"] = timed(lambda: build_team(roster, lambda name: client), repeat)
+
+    async def one_turn():
+        pooled = build_team(roster, lambda name: client, max_turns=1)
+        async for _ in panel_events(pooled, TASK, PROTOCOL_DELTAS):
+            pass
+    results["panel_turn"] = await timed_async(one_turn, repeat)
+
+    pooled = build_team(roster, lambda name: client)
+
+    async def full_panel():
+        async for _ in panel_events(pooled, TASK, PROTOCOL_DELTAS):
+            pass
+        await pooled.reset()
+    results["full_panel_12_turns"] = await timed_async(full_panel, repeat)
+
+    # The same panel with the closing answers generated at once (fanout.py)
+    pooled = build_team(roster, lambda name: client, fan_out=True)
+    results["full_panel_fan_out"] = await timed_async(full_panel, repeat)
+
+    event = {"type": "delta", "turn": 3, "speaker": "Handel", "content": "Messiah "}
+    results["sse_serialization_x1000"] = timed(lambda: [sse(event) for _ in range(1000)], repeat)
+
+    import engine
+    import main
+    engine.model_clients[engine.DEFAULT_MODEL] = client
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def chat_endpoint():
+            response = await http.post("/chat", json={"content": "I feel lost at work", "protocol": PROTOCOL_DELTAS})
+            response.raise_for_status()
+        results["chat_endpoint"] = await timed_async(chat_endpoint, repeat)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--ttft", type=float, default=0.0, help="stub seconds before first token")
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--output", help="where to save results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmarks(args.repeat, args.ttft, args.tokens_per_second))
+    print_results(results, args.compare)
+    print(f"Saved {save_results('pipeline', results, args.output)}")
@@ -0,0 +1,108 @@
+"""Panel latency and token cost per model routing profile, against the offline stub.
+
+    python benchmarks/bench_routing.py [--profiles single,tiered,economy] [--panels 5] [--scheduler llm]
+
+Each model gets its own stub client, paced like that tier of hosted model
+(STUB_SPEEDS, scaled by --time-scale so a run takes seconds). Every
+profile in config/model_routing.py runs the same panels end to end
+through the engine; the report gives panel latency, tokens per model and
+the cost those tokens would have at MODEL_PRICES. The LLM scheduler is
+the default here, so the selector's calls are part of the comparison.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# Must be set before the backend modules are imported
+os.environ.setdefault("MODEL_BACKEND", "stub")
+os.environ.setdefault("COMPLETION_CACHE", "false")
+# Full panels for every profile, as in bench_pipeline.py
+os.environ.setdefault("TERMINATION_REPETITION_THRESHOLD", "0")
+os.environ.setdefault("TERMINATION_STALL_TURNS", "0")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+_scratch = tempfile.mkdtemp()
+os.environ.setdefault("TRANSCRIPT_STORE_PATH", os.path.join(_scratch, "transcripts.db"))
+os.environ.setdefault("PANEL_STORE_PATH", os.path.join(_scratch, "panels.db"))
+
+from _common import print_results, save_results, summarize  # noqa: E402
+
+# Seconds to first token and tokens per second, roughly what each tier
+# of hosted model does; only the ratios matter for the comparison
+STUB_SPEEDS = {
+    "gpt-4": (0.8, 25),
+    "gpt-4o": (0.45, 80),
+    "gpt-4o-mini": (0.3, 120),
+}
+TOPICS = ["I feel lost at work", "Too many meetings", "I can't decide whether to move abroad"]
+
+
+async def run_profile(engine, profile: str, panels: int, time_scale: float) -> dict:
+    from config.model_routing import estimate_cost
+    from panel import PROTOCOL_DELTAS
+    from stub_model import StubChatCompletionClient, StubScript
+
+    # Fresh clients sharing one script, so every profile runs the same panels
+    script = StubScript()
+    for model, (ttft, tokens_per_second) in STUB_SPEEDS.items():
+        engine.model_clients[model] = StubChatCompletionClient(
+            model=model, ttft=ttft * time_scale, tokens_per_second=tokens_per_second / time_scale, script=script
+        )
+
+    latencies, turns, usage = [], 0, {}
+    for index in range(panels):
+        roster = engine.Roster.create(stream=True, routing=profile)
+        start = time.perf_counter()
+        async for event in engine.run_panel(roster, TOPICS[index % len(TOPICS)], PROTOCOL_DELTAS):
+            if event["type"] == "episode_end":
+                turns += event["turns"]
+                for model, tokens in event["stats"].get("usage", {}).items():
+                    total = usage.setdefault(model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+                    for key in total:
+                        total[key] += tokens[key]
+        latencies.append(time.perf_counter() - start)
+
+    cost = estimate_cost(usage)
+    return {
+        **summarize(latencies),
+        "turns_per_panel": turns / panels,
+        "usage": usage,
+        "cost_per_panel_usd": round(cost / panels, 5) if cost is not None else None,
+    }
+
+
+async def run_benchmarks(profiles: list[str], panels: int, time_scale: float) -> dict:
+    import engine
+
+    results = {profile: await run_profile(engine, profile, panels, time_scale) for profile in profiles}
+    baseline = results[profiles[0]]
+    for profile in profiles[1:]:
+        result = results[profile]
+        result["latency_vs_" + profiles[0]] = round(result["mean_ms"] / baseline["mean_ms"], 3)
+        if result["cost_per_panel_usd"] is not None and baseline["cost_per_panel_usd"]:
+            result["cost_vs_" + profiles[0]] = round(result["cost_per_panel_usd"] / baseline["cost_per_panel_usd"], 3)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", default="single,tiered,economy", help="comma-separated; the first is the baseline")
+    parser.add_argument("--panels", type=int, default=5, help="panels per profile")
+    parser.add_argument("--scheduler", default="llm", choices=["rules", "llm"], help="how speakers are picked")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="multiplier on the stub delays")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--output", help="where to save results")
+    args = parser.parse_args()
+
+    # Read by the engine when it is imported
+    os.environ["TURN_SCHEDULER"] = args.scheduler
+    results = asyncio.run(run_benchmarks(args.profiles.split(","), args.panels, args.time_scale))
+    print_results({profile: {key: value for key, value in result.items() if key != "usage"}
+                   for profile, result in results.items()}, args.compare)
+    for profile, result in results.items():
+        models = ", ".join(f"{model} {tokens['prompt_tokens']}+{tokens['completion_tokens']}"
+                           for model, tokens in result["usage"].items())
+        ratios = "".join(f", {key.split('_vs_')[0]} x{value}" for key, value in result.items() if "_vs_" in key)
+        print(f"{profile:<28} ${result['cost_per_panel_usd']}/panel{ratios}; tokens (prompt+completion): {models}")
+    print(f"Saved {save_results('routing', results, args.output)}")
@@ -0,0 +1,121 @@
+"""Concurrent Streamlit sessions on the shared panel engine.
+
+    python benchmarks/bench_sessions.py [--sessions 1,2,4,8,16,32] [--ttft 0.05] [--tokens-per-second 200]
+
+Each session is a thread that streams one panel from an EngineThread,
+the way app.py does, against the offline stub model. Every level reports
+panel latency, panels per second and how many threads the process used
+beyond the sessions themselves. The concurrency ceiling is the largest
+level whose p95 latency stays within `--slowdown` times the p95 of a
+single session; past it, the engine's limits (TEAM_POOL_SIZE,
+MAX_CONCURRENT_COMPLETIONS) queue panels.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+# Must be set before the backend modules are imported
+os.environ.setdefault("MODEL_BACKEND", "stub")
+os.environ.setdefault("COMPLETION_CACHE", "false")
+# Full panels at every level, as in bench_pipeline.py
+os.environ.setdefault("TERMINATION_REPETITION_THRESHOLD", "0")
+os.environ.setdefault("TERMINATION_STALL_TURNS", "0")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from _common import print_results, save_results, summarize  # noqa: E402
+
+HOST = {"name": "Host", "description": "A warm late-night radio host"}
+GUESTS = [
+    {"name": "Ada", "description": "A mathematician who wrote the first published algorithm"},
+    {"name": "Brunel", "description": "An engineer who rebuilt after the Thames Tunnel flooded"},
+    {"name": "Curie", "description": "A physicist who kept working through years of setbacks"},
+]
+
+
+def run_level(engine, runner, sessions: int) -> dict:
+    """`sessions` threads each stream one panel at once; latency and thread use"""
+    from panel import PROTOCOL_DELTAS
+
+    latencies = []
+    errors = []
+    baseline_threads = threading.active_count()
+    peak_threads = baseline_threads
+    start_barrier = threading.Barrier(sessions)
+
+    def session(index: int):
+        start_barrier.wait()
+        start = time.perf_counter()
+        try:
+            roster = engine.Roster.from_store(HOST, GUESTS, stream=True)
+            for _ in runner.stream(engine.run_panel(roster, f"Session {index}: I feel lost at work", PROTOCOL_DELTAS)):
+                pass
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        peak_threads = max(peak_threads, threading.active_count())
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise SystemExit(f"{len(errors)} of {sessions} sessions failed: {errors[0]}")
+
+    return {
+        **summarize(latencies),
+        "panels_per_second": round(sessions / elapsed, 3),
+        # Session threads stand in for Streamlit script threads
+        "extra_threads": peak_threads - baseline_threads - sessions,
+    }
+
+
+def run_benchmarks(levels: list[int], ttft: float, tokens_per_second: float, slowdown: float) -> dict:
+    os.environ["STUB_TTFT"] = str(ttft)
+    os.environ["STUB_TOKENS_PER_SECOND"] = str(tokens_per_second)
+    # Finished panels are saved; keep them out of the real stores
+    scratch = tempfile.mkdtemp()
+    os.environ.setdefault("TRANSCRIPT_STORE_PATH", os.path.join(scratch, "transcripts.db"))
+    os.environ.setdefault("PANEL_STORE_PATH", os.path.join(scratch, "panels.db"))
+    import engine
+
+    runner = engine.EngineThread()
+    results = {}
+    ceiling = None
+    single_p95 = None
+    for sessions in levels:
+        level = run_level(engine, runner, sessions)
+        results[f"sessions_{sessions}"] = level
+        single_p95 = single_p95 or level["p95_ms"]
+        if level["p95_ms"] > slowdown * single_p95:
+            break
+        ceiling = sessions
+    results["ceiling"] = {
+        "sessions": ceiling,
+        "slowdown": slowdown,
+        "pool_waits": engine.team_pool.snapshot()["waits"],
+        "max_concurrent_completions": engine.completion_scheduler.max_concurrent,
+    }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="1,2,4,8,16,32", help="comma-separated concurrency levels, smallest first")
+    parser.add_argument("--ttft", type=float, default=0.05, help="stub time to first token, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="stub generation speed")
+    parser.add_argument("--slowdown", type=float, default=1.5, help="allowed p95 growth over one session")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--output", help="where to save results")
+    args = parser.parse_args()
+
+    results = run_benchmarks([int(n) for n in args.sessions.split(",")], args.ttft, args.tokens_per_second, args.slowdown)
+    print_results(results, args.compare)
+    for name, level in results.items():
+        if name.startswith("sessions_"):
+            print(f"{name:<28} {level['panels_per_second']} panels/s, {level['extra_threads']} extra threads")
+    print(f"Saved {save_results('sessions', results, args.output)}")
@@ -0,0 +1,114 @@
+"""Startup and rerun timings for the Streamlit app (app.py).
+
+    python benchmarks/bench_streamlit.py [--cold 5] [--repeat 20] [--compare results/streamlit-<sha>.json]
+
+Cold starts run the app's first render in a fresh interpreter, as a new
+server process would. Reruns repeat the script in one process, the way
+every widget interaction does. The panel engine and what it pulls in
+(autogen, openai) should only be imported once a discussion starts; the
+run fails loudly if a change brings them back into the first render.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import ROOT, print_results, save_results, summarize
+
+APP = os.path.join(ROOT, "app.py")
+HEAVY_MODULES = ("engine", "autogen_agentchat", "autogen_core", "openai")
+
+# Runs in a fresh interpreter and prints one JSON line
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=60).run()
+rendered = time.perf_counter()
+print(json.dumps({{
+    "import_streamlit": imported - start,
+    "first_render": rendered - imported,
+    "exceptions": [str(e.value) for e in at.exception],
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def cold_starts(runs: int, env: dict) -> list[dict]:
+    script = COLD_START.format(app=APP, heavy=HEAVY_MODULES)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.check_output([sys.executable, "-c", script], cwd=ROOT, env=env, text=True)
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample["process"] = time.perf_counter() - start
+        samples.append(sample)
+    return samples
+
+
+def reruns(repeat: int) -> list[float]:
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP, default_timeout=60).run()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def deferred_import(runs: int, env: dict) -> list[float]:
+    """What the first discussion pays to import the panel engine"""
+    script = (
+        "import sys, time; sys.path.insert(0, 'backend'); start = time.perf_counter(); "
+        "import engine; print(time.perf_counter() - start)"
+    )
+    return [
+        float(subprocess.check_output([sys.executable, "-c", script], cwd=ROOT, env=env, text=True))
+        for _ in range(runs)
+    ]
+
+
+def run_benchmarks(cold: int, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep benchmark runs from touching the real persona catalog
+        os.environ["PERSONA_STORE_PATH"] = os.path.join(tmp, "personas.db")
+        os.environ["TRANSCRIPT_STORE_PATH"] = os.path.join(tmp, "transcripts.db")
+        os.environ["PANEL_STORE_PATH"] = os.path.join(tmp, "panels.db")
+        # The engine is imported, not run, so the offline model is enough
+        os.environ.setdefault("MODEL_BACKEND", "stub")
+        env = dict(os.environ)
+
+        samples = cold_starts(cold, env)
+        errors = [e for sample in samples for e in sample["exceptions"]]
+        if errors:
+            raise SystemExit(f"app.py raised on first render: {errors[0]}")
+        loaded = sorted({m for sample in samples for m in sample["heavy_modules"]})
+        if loaded:
+            raise SystemExit(f"first render imported {', '.join(loaded)}; import it inside a cached resource")
+
+        os.chdir(ROOT)
+        return {
+            "cold_process": summarize([s["process"] for s in samples]),
+            "cold_import_streamlit": summarize([s["import_streamlit"] for s in samples]),
+            "cold_first_render": summarize([s["first_render"] for s in samples]),
+            "rerun": summarize(reruns(repeat)),
+            "deferred_engine_import": summarize(deferred_import(cold, env)),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cold", type=int, default=5, help="fresh-process first renders")
+    parser.add_argument("--repeat", type=int, default=20, help="reruns in one process")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--output", help="where to save results")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.cold, args.repeat)
+    print_results(results, args.compare)
+    print(f"Saved {save_results('streamlit', results, args.output)}")
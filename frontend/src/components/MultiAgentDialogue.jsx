@@ -24,17 +24,25 @@ const AGENTS = {
   }
 };
 
+// SSE contract version requested from /chat. Version 1 sends one event per
+// finished reply; version 2 streams turn_start / delta / turn_end events.
+const PROTOCOL_VERSION = 2;
+
 // Add display name mapping if needed
 const DISPLAY_NAMES = {
   "SultanMehmed": "Sultan Mehmed II"
 };
 
-const LoadingIndicator = () => (
+const LoadingIndicator = ({ queuePosition }) => (
   <div className="flex items-center space-x-2 text-blue-500">
     <div className="w-2 h-2 bg-current rounded-full animate-ping"></div>
     <div className="w-2 h-2 bg-current rounded-full animate-ping [animation-delay:0.2s]"></div>
     <div className="w-2 h-2 bg-current rounded-full animate-ping [animation-delay:0.4s]"></div>
-    <span className="text-sm font-medium">Agents are thinking...</span>
+    <span className="text-sm font-medium">
+      {queuePosition > 0
+        ? `Server is busy, you are #${queuePosition} in line...`
+        : 'Agents are thinking...'}
+    </span>
   </div>
 );
 
@@ -114,6 +122,7 @@ const MultiAgentDialogue = () => {
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
   const [uploadedFiles, setUploadedFiles] = useState({});
+  const [queuePosition, setQueuePosition] = useState(0);
 
   const handleAgentSelect = (agent) => {
     setSelectedAgents(prev => 
@@ -124,6 +133,42 @@ const MultiAgentDialogue = () => {
     setError(null);
   };
 
+  // Apply one protocol v2 event to the transcript
+  const handleEvent = (data, panel) => {
+    switch (data.type) {
+      case 'turn_start':
+        setResponses(prev => [...prev, {
+          type: 'message',
+          panel,
+          turn: data.turn,
+          speaker: data.speaker,
+          content: '',
+          streaming: true
+        }]);
+        break;
+      case 'delta':
+      case 'turn_end':
+        setResponses(prev => prev.map(r =>
+          r.panel === panel && r.turn === data.turn
+            ? {
+                ...r,
+                content: data.type === 'delta' ? r.content + data.content : data.content,
+                streaming: data.type === 'delta'
+              }
+            : r
+        ));
+        break;
+      case 'queue':
+        setQueuePosition(data.position);
+        break;
+      case 'episode_end':
+        break;
+      default:
+        // 'message' and 'error' events are rendered as they arrive
+        setResponses(prev => [...prev, data]);
+    }
+  };
+
   const handleSubmit = async () => {
     if (!message.trim()) return;
     
@@ -138,6 +183,7 @@ const MultiAgentDialogue = () => {
         },
         body: JSON.stringify({
           content: message,
+          protocol: PROTOCOL_VERSION,
         }),
       });
 
@@ -145,6 +191,8 @@ const MultiAgentDialogue = () => {
       
       const reader = response.body.getReader();
       const decoder = new TextDecoder();
+      let buffer = '';
+      const panel = Date.now();
 
       // Add user message immediately
       setResponses(prev => [...prev, { 
@@ -157,13 +205,14 @@ const MultiAgentDialogue = () => {
         const { done, value } = await reader.read();
         if (done) break;
         
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n').filter(line => line.trim());
+        // Events can be split across chunks, so keep the unfinished tail
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
         
         for (const line of lines) {
           if (line.startsWith('data: ')) {
-            const data = JSON.parse(line.slice(5));
-            setResponses(prev => [...prev, data]);
+            handleEvent(JSON.parse(line.slice(5)), panel);
           }
         }
       }
@@ -173,6 +222,7 @@ const MultiAgentDialogue = () => {
       setError(err.message);
     } finally {
       setIsLoading(false);
+      setQueuePosition(0);
     }
   };
 
@@ -231,7 +281,7 @@ const MultiAgentDialogue = () => {
           ))}
           {isLoading && (
             <div className="flex justify-center py-4">
-              <LoadingIndicator />
+              <LoadingIndicator queuePosition={queuePosition} />
             </div>
           )}
         </div>
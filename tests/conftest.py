@@ -0,0 +1,22 @@
+import os
+import sys
+import pytest
+
+# Backend modules import each other as top-level modules
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
+
+
+@pytest.fixture(scope="session")
+def engine(tmp_path_factory):
+    """The engine on the stub model, with its stores in a scratch directory"""
+    scratch = tmp_path_factory.mktemp("engine")
+    with pytest.MonkeyPatch.context() as env:
+        env.setenv("MODEL_BACKEND", "stub")
+        env.setenv("OPENAI_API_KEY", "stub")
+        env.setenv("COMPLETION_CACHE", "false")
+        env.setenv("TRANSCRIPT_STORE_PATH", str(scratch / "transcripts.db"))
+        env.setenv("PANEL_STORE_PATH", str(scratch / "panels.db"))
+        import engine
+        yield engine
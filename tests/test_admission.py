@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from admission import CompletionScheduler
+
+
+class FakePanel:
+    def __init__(self, panel_id: str):
+        self.id = panel_id
+        self.events = []
+
+    def notify(self, event: dict):
+        self.events.append(event)
+
+
+def test_waiting_panels_are_served_round_robin():
+    async def run():
+        scheduler = CompletionScheduler(max_concurrent=1)
+        busy, long, short = FakePanel("busy"), FakePanel("long"), FakePanel("short")
+        order = []
+
+        async def request(panel, name):
+            async with scheduler.slot(panel, "key"):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        holder = scheduler.slot(busy, "key")
+        await holder.__aenter__()
+        tasks = [asyncio.create_task(request(long, f"long-{i}")) for i in range(3)]
+        tasks.append(asyncio.create_task(request(short, "short-0")))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["waiting_panels"] == 2
+        await holder.__aexit__(None, None, None)
+        await asyncio.gather(*tasks)
+        return order, short.events
+
+    order, notices = asyncio.run(run())
+    # One long panel cannot hold the line against a shorter one
+    assert order == ["long-0", "short-0", "long-1", "long-2"]
+    assert notices[0] == {"type": "queue", "position": 2, "waiting_panels": 2}
+
+
+def test_limits_per_key_and_model():
+    async def run():
+        scheduler = CompletionScheduler(max_concurrent=4, max_per_key=1, model_limits={"big": 1})
+        first = scheduler.slot(None, "a", "big")
+        await first.__aenter__()
+        other_key = asyncio.create_task(scheduler.slot(None, "b", "small").__aenter__())
+        same_key = asyncio.create_task(scheduler.slot(None, "a", "small").__aenter__())
+        same_model = asyncio.create_task(scheduler.slot(None, "b", "big").__aenter__())
+        await asyncio.sleep(0.01)
+        return other_key.done(), same_key.done(), same_model.done()
+
+    assert asyncio.run(run()) == (True, False, False)
+
+
+def test_cancelled_waiter_is_not_granted_a_slot():
+    async def run():
+        scheduler = CompletionScheduler(max_concurrent=1)
+        holder = scheduler.slot(FakePanel("a"), "key")
+        await holder.__aenter__()
+
+        async def wait():
+            async with scheduler.slot(FakePanel("b"), "key"):
+                pass
+
+        waiting = asyncio.create_task(wait())
+        await asyncio.sleep(0)
+        # The waiter's future is cancelled at once, its cleanup only runs later
+        waiting.cancel()
+        await holder.__aexit__(None, None, None)
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert scheduler.stats()["active"] == 0
+        assert scheduler.stats()["waiting_requests"] == 0
+
+        # The slot was not lost
+        async with scheduler.slot(FakePanel("c"), "key"):
+            assert scheduler.stats()["active"] == 1
+
+    asyncio.run(run())
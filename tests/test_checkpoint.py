@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+from types import SimpleNamespace
+import pytest
+from autogen_core.models import CreateResult, SystemMessage, UserMessage
+from checkpoint import EpisodeJournal, ReplayChatCompletionClient, StoredJournal
+from panel_store import SQLitePanelStore
+from stub_model import StubChatCompletionClient
+
+
+class CountingScript:
+    def __init__(self):
+        self.calls = 0
+
+    def reply(self, messages: list[dict]) -> str:
+        self.calls += 1
+        return f"Live reply {self.calls}."
+
+
+def prompt(text: str) -> list:
+    return [SystemMessage(content="You are the host."), UserMessage(content=text, source="user")]
+
+
+def replaying(journal: EpisodeJournal, agent: str = "Host"):
+    script = CountingScript()
+    client = ReplayChatCompletionClient(StubChatCompletionClient(script=script), agent)
+    client.bind_panel(SimpleNamespace(journal=journal))
+    return client, script
+
+
+async def streamed(client, messages) -> str:
+    chunks = [chunk async for chunk in client.create_stream(messages)]
+    assert isinstance(chunks[-1], CreateResult)
+    return chunks[-1].content
+
+
+def first_run(path) -> list[str]:
+    async def run():
+        journal = EpisodeJournal(path)
+        client, _ = replaying(journal)
+        replies = [
+            (await client.create(prompt("Open the show"))).content,
+            await streamed(client, prompt("Ask the first guest")),
+            # The same prompt twice gets its replies back in order
+            (await client.create(prompt("Open the show"))).content,
+        ]
+        journal.checkpoint([{"speaker": "Host", "content": reply} for reply in replies])
+        return replies
+
+    return asyncio.run(run())
+
+
+def test_resume_replays_without_calling_the_model(tmp_path):
+    path = tmp_path / "episode.json"
+    recorded = first_run(path)
+
+    async def run():
+        journal = EpisodeJournal(path)
+        client, script = replaying(journal)
+        replies = [
+            (await client.create(prompt("Open the show"))).content,
+            await streamed(client, prompt("Ask the first guest")),
+            (await client.create(prompt("Open the show"))).content,
+        ]
+        return journal, client, script, replies
+
+    journal, client, script, replies = asyncio.run(run())
+    assert replies == recorded
+    assert script.calls == 0
+    assert journal.resumed_turns == 3 and journal.replayed == 3
+    assert client.episode_stats()["replayed"] == 3
+
+
+def test_changed_prompt_falls_through_to_the_model(tmp_path):
+    path = tmp_path / "episode.json"
+    first_run(path)
+
+    async def run():
+        journal = EpisodeJournal(path)
+        client, script = replaying(journal)
+        await client.create(prompt("Open the show"))
+        changed = await client.create(prompt("Open the show, but differently"))
+        # Another agent's identical prompt is its own call
+        other, other_script = replaying(journal, agent="Ada")
+        await other.create(prompt("Ask the first guest"))
+        return journal, script, other_script, changed
+
+    journal, script, other_script, changed = asyncio.run(run())
+    assert script.calls == 1 and other_script.calls == 1
+    assert changed.content == "Live reply 1."
+    assert journal.calls == 2 and journal.replayed == 1
+
+
+def test_checkpoint_keeps_completions_not_reached_yet(tmp_path):
+    path = tmp_path / "episode.json"
+    recorded = first_run(path)
+
+    async def run():
+        # A resume that stops again after one replayed turn
+        journal = EpisodeJournal(path)
+        client, _ = replaying(journal)
+        await client.create(prompt("Open the show"))
+        journal.checkpoint(journal.turns[:1])
+
+        journal = EpisodeJournal(path)
+        client, script = replaying(journal)
+        replies = [(await client.create(prompt("Open the show"))).content,
+                   await streamed(client, prompt("Ask the first guest"))]
+        return journal, script, replies
+
+    journal, script, replies = asyncio.run(run())
+    assert replies == recorded[:2] and script.calls == 0
+    assert journal.resumed_turns == 1
+
+
+def test_stored_journal_moves_with_its_panel(tmp_path):
+    store = SQLitePanelStore(tmp_path / "panels.db")
+    store.create("p1", "topic", {}, 2, owner="w1", lease_seconds=30)
+
+    async def run():
+        journal = StoredJournal(store, "p1")
+        client, _ = replaying(journal)
+        recorded = (await client.create(prompt("Open the show"))).content
+        journal.checkpoint([{"speaker": "Host", "content": recorded}])
+
+        # Another worker picks the panel up
+        client, script = replaying(StoredJournal(store, "p1"))
+        return recorded, (await client.create(prompt("Open the show"))).content, script
+
+    recorded, replayed, script = asyncio.run(run())
+    assert replayed == recorded and script.calls == 0
+    StoredJournal(store, "p1").discard()
+    assert store.load_journal("p1") is None
+
+
+@pytest.fixture
+def batch(engine):
+    import batch
+    return batch
+
+
+def test_topic_ids_are_stable_and_duplicates_numbered(batch, tmp_path):
+    topics = tmp_path / "topics.jsonl"
+    topics.write_text("\n".join([
+        "# Listener mail, week 12",
+        "I feel lost at work",
+        "",
+        "I feel lost at work",
+        json.dumps({"topic": "I feel lost at work", "routing": "tiered"}),
+        json.dumps({"id": "rome", "topic": "Should I move to Rome?"}),
+    ]))
+    episodes = batch.load_topics(topics)
+    ids = [episode.id for episode in episodes]
+
+    digest = hashlib.sha1(json.dumps(["I feel lost at work", None, batch.DEFAULT_MODEL]).encode()).hexdigest()[:12]
+    assert ids[0] == digest
+    assert ids[1] == f"{digest}-2"
+    # Routing changes the id only when it is set
+    assert ids[2] not in (ids[0], ids[1]) and episodes[2].routing == "tiered"
+    assert ids[3] == "rome"
+    assert [episode.id for episode in batch.load_topics(topics)] == ids
@@ -0,0 +1,72 @@
+import completion_cache
+from autogen_core.models import SystemMessage, UserMessage
+from completion_cache import TOPIC_MARKER, CacheKey, CompletionCache
+
+
+def key(text: str, topic: str | None = None) -> CacheKey:
+    messages = [SystemMessage(content="You are the host.")]
+    if topic is not None:
+        messages.append(UserMessage(content=f"Hello, {TOPIC_MARKER} {topic}", source="user"))
+    messages.append(UserMessage(content=text, source="user"))
+    return CacheKey("stub", messages, {})
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_keys_ignore_whitespace_but_not_options():
+    assert key("Hello  there\n").exact == key("Hello there").exact
+    other = CacheKey("stub", [SystemMessage(content="You are the host."), UserMessage(content="Hello there", source="user")],
+                     {"temperature": 0})
+    assert other.exact != key("Hello there").exact
+
+
+def test_entries_expire_after_ttl(monkeypatch, tmp_path):
+    clock = Clock()
+    monkeypatch.setattr(completion_cache.time, "time", clock)
+    cache = CompletionCache(ttl_seconds=60, disk_path=str(tmp_path / "cache.db"))
+    cache.put(key("a"), "reply")
+    clock.now += 59
+    assert cache.get(key("a")) == ("reply", False)
+    clock.now += 2
+    # Expired in memory and on disk alike
+    assert cache.get(key("a")) == (None, False)
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = CompletionCache(max_entries=2)
+    cache.put(key("a"), "A")
+    cache.put(key("b"), "B")
+    assert cache.get(key("a"))[0] == "A"
+    cache.put(key("c"), "C")
+    assert cache.get(key("b")) == (None, False)
+    assert cache.get(key("a"))[0] == "A"
+    assert cache.get(key("c"))[0] == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_outlives_the_memory_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+    CompletionCache(disk_path=path).put(key("a"), "A")
+    assert CompletionCache(disk_path=path).get(key("a")) == ("A", False)
+
+
+def test_near_duplicate_topics_share_a_completion():
+    cache = CompletionCache(near_threshold=0.6)
+    cache.put(key("Introduce the topic.", "I feel lost at work lately"), "intro")
+    assert cache.get(key("Introduce the topic.", "I feel lost at work lately!")) == ("intro", True)
+    assert cache.get(key("Introduce the topic.", "My cat will not eat")) == (None, False)
+    # The rest of the conversation still has to match exactly
+    assert cache.get(key("Ask the first guest.", "I feel lost at work lately!")) == (None, False)
+
+
+def test_near_lookup_is_off_by_default():
+    cache = CompletionCache()
+    cache.put(key("Introduce the topic.", "I feel lost at work lately"), "intro")
+    assert cache.get(key("Introduce the topic.", "I feel lost at work lately!")) == (None, False)
@@ -0,0 +1,94 @@
+import asyncio
+from autogen_core.models import AssistantMessage, UserMessage
+from context_budget import SUMMARY_SOURCE, SummarizingChatCompletionContext, first_sentence
+
+
+def turn(index: int, words: int = 10):
+    content = f"Turn {index} opens here. " + " ".join(["word"] * words)
+    if index % 2:
+        return AssistantMessage(content=content, source=f"guest{index}")
+    return UserMessage(content=content, source=f"guest{index}")
+
+
+class CountingSummarizer:
+    def __init__(self):
+        self.folded = []
+
+    async def __call__(self, summary, messages):
+        self.folded.append([m.source for m in messages])
+        return "\n".join(filter(None, [summary, *(f"- {m.source}" for m in messages)]))
+
+
+async def fill(context, count: int, words: int = 10):
+    await context.add_message(UserMessage(content="I feel lost at work", source="user"))
+    for index in range(1, count + 1):
+        await context.add_message(turn(index, words))
+
+
+def test_keeps_concern_and_last_turns_verbatim():
+    async def run():
+        summarizer = CountingSummarizer()
+        context = SummarizingChatCompletionContext(keep_last=3, summarizer=summarizer)
+        await fill(context, 8)
+        return await context.get_messages(), summarizer.folded, context.stats()
+
+    messages, folded, stats = asyncio.run(run())
+    assert messages[0].content == "I feel lost at work"
+    assert messages[1].source == SUMMARY_SOURCE
+    assert [m.source for m in messages[2:]] == ["guest6", "guest7", "guest8"]
+    assert folded == [[f"guest{i}" for i in range(1, 6)]]
+    assert 0 < stats["prompt_tokens_sent"] < stats["prompt_tokens_full"]
+
+
+def test_each_message_is_summarized_once():
+    async def run():
+        summarizer = CountingSummarizer()
+        context = SummarizingChatCompletionContext(keep_last=2, summarizer=summarizer)
+        await fill(context, 4)
+        await context.get_messages()
+        await context.get_messages()
+        await context.add_message(turn(5))
+        messages = await context.get_messages()
+        return messages, summarizer.folded, context.summaries
+
+    messages, folded, summaries = asyncio.run(run())
+    # The second call folds only what fell out of the window since the first
+    assert folded == [["guest1", "guest2"], ["guest3"]]
+    assert summaries == 2
+    assert messages[1].content.endswith("- guest1\n- guest2\n- guest3")
+
+
+def test_token_budget_folds_more_of_the_window():
+    async def run():
+        context = SummarizingChatCompletionContext(keep_last=6, max_tokens=60, summarizer=CountingSummarizer(),
+                                                   count_tokens=lambda text: len(text.split()))
+        await fill(context, 6, words=30)
+        return await context.get_messages()
+
+    messages = asyncio.run(run())
+    verbatim = messages[2:]
+    assert len(verbatim) < 6
+    assert sum(len(m.content.split()) for m in verbatim) <= 60
+    # Folding runs from the oldest verbatim turn; the newest is kept
+    assert verbatim[-1].source == "guest6"
+
+
+def test_preview_summary_is_reused():
+    async def run():
+        summarizer = CountingSummarizer()
+        context = SummarizingChatCompletionContext(keep_last=2, summarizer=summarizer)
+        await fill(context, 3)
+        preview = await context.preview([turn(4)])
+        await context.add_message(turn(4))
+        messages = await context.get_messages()
+        return preview, messages, summarizer.folded
+
+    preview, messages, folded = asyncio.run(run())
+    assert [m.content for m in preview] == [m.content for m in messages]
+    assert folded == [["guest1", "guest2"]]
+
+
+def test_first_sentence():
+    assert first_sentence("We shipped it.  Then   we rested.") == "We shipped it."
+    assert first_sentence("我们做了。然后休息。") == "我们做了。"
+    assert first_sentence("x" * 300).endswith("…")
@@ -0,0 +1,93 @@
+import asyncio
+import os
+from autogen_core.models import SystemMessage, UserMessage
+from doc_index import DocumentIndex, chunk_text, tokenize
+from retrieval import RetrievalChatCompletionClient
+from stub_model import StubChatCompletionClient
+
+DOCUMENTS = {
+    "ada.txt": "Ada Lovelace wrote the first published algorithm. She worked with Babbage on the Analytical Engine.",
+    "kitchen.md": "Bread needs flour, water, salt and time. A slow rise gives bread more flavour.",
+    "nankai.txt": "南开大学创办于1919年。张伯苓是南开的校长。",
+}
+
+
+def documents(tmp_path):
+    folder = tmp_path / "documents"
+    folder.mkdir()
+    for name, text in DOCUMENTS.items():
+        (folder / name).write_text(text, encoding="utf-8")
+    (folder / "notes.pdf").write_bytes(b"%PDF not indexed")
+    return folder
+
+
+def test_tokenize_words_and_cjk_bigrams():
+    assert tokenize("Hello, World 42!") == ["hello", "world", "42"]
+    assert tokenize("南开大学") == ["南开", "开大", "大学"]
+    # A lone CJK character is a term of its own
+    assert tokenize("在 Tianjin") == ["在", "tianjin"]
+
+
+def test_chunks_overlap_by_one_sentence():
+    chunks = chunk_text("One two three. Four five six. Seven eight nine.", max_chars=30)
+    assert chunks == ["One two three.Four five six.", "Four five six.Seven eight nine."]
+    assert tokenize(chunks[0]) == ["one", "two", "three", "four", "five", "six"]
+
+
+def test_search_ranks_the_matching_passage_first(tmp_path):
+    index = DocumentIndex(documents(tmp_path))
+    assert index.sources() == ["ada.txt", "kitchen.md", "nankai.txt"]
+
+    top = index.search("Who wrote the first algorithm?", k=1)
+    assert [p.source for p in top] == ["ada.txt"]
+    assert index.search("南开的校长", k=1)[0].source == "nankai.txt"
+    # Each passage matching any term can come back, best first
+    results = index.search("bread algorithm", k=3)
+    assert {p.source for p in results} == {"ada.txt", "kitchen.md"}
+    assert results == sorted(results, key=lambda p: -p.score)
+    assert index.search("bread", sources=["ada.txt"]) == []
+    assert index.search("zebra") == []
+
+
+def test_changed_files_are_reindexed(tmp_path):
+    folder = documents(tmp_path)
+    index = DocumentIndex(folder, refresh_seconds=0)
+    assert sorted(index.refresh()["indexed"]) == ["ada.txt", "kitchen.md", "nankai.txt"]
+    assert index.refresh()["indexed"] == []
+
+    (folder / "kitchen.md").write_text("Sourdough starter needs feeding every day.", encoding="utf-8")
+    os.utime(folder / "kitchen.md", ns=(1, 1))
+    (folder / "nankai.txt").unlink()
+    report = index.refresh()
+    assert report["indexed"] == ["kitchen.md"] and report["removed"] == ["nankai.txt"]
+    assert index.search("sourdough", k=1)[0].source == "kitchen.md"
+    assert index.search("bread") == []
+
+    # A new process loads the segments from disk instead of rebuilding them
+    report = DocumentIndex(folder).refresh()
+    assert report["indexed"] == [] and sorted(report["unchanged"]) == ["ada.txt", "kitchen.md"]
+    # The removed file's segment is gone too
+    assert len(list((folder / ".index").glob("*.json"))) == 2
+
+
+class EchoScript:
+    def __init__(self):
+        self.prompts = []
+
+    def reply(self, messages: list[dict]) -> str:
+        self.prompts.append(messages)
+        return "Noted."
+
+
+def test_retrieval_adds_passages_for_one_call(tmp_path):
+    script = EchoScript()
+    client = RetrievalChatCompletionClient(StubChatCompletionClient(script=script),
+                                           DocumentIndex(documents(tmp_path)), sources=["ada.txt"], timeout=5)
+    messages = [SystemMessage(content="You are Ada."), UserMessage(content="Tell us about your algorithm", source="Host")]
+    asyncio.run(client.create(messages))
+
+    prompt = script.prompts[0]
+    assert len(prompt) == 3 and "[ada.txt] Ada Lovelace" in str(prompt[1])
+    # The agent's own messages are left as they were
+    assert len(messages) == 2
+    assert client.episode_stats()["retrieval"]["passages"] == 1
@@ -0,0 +1,94 @@
+import asyncio
+from autogen_core.models import AssistantMessage, SystemMessage, UserMessage
+from completion_cache import CachedChatCompletionClient, CompletionCache
+from length_budget import (
+    GUEST_FIRST_TURN, GUEST_TURN, HOST_TURN, LengthBoundedChatCompletionClient, ends_sentence, sentence_cut,
+    sentence_limits
+)
+from stub_model import StubChatCompletionClient
+from team_pool import DIALOGUE_RULES
+
+LIMITS = {HOST_TURN: 2, GUEST_FIRST_TURN: 4, GUEST_TURN: 2}
+LONG_REPLY = "One thing. Two things! Three things? Four things. Five things."
+
+
+class FixedScript:
+    def __init__(self, reply: str):
+        self.reply_text = reply
+        self.calls = 0
+
+    def reply(self, messages: list[dict]) -> str:
+        self.calls += 1
+        return self.reply_text
+
+
+def bounded(reply: str, host: bool = True):
+    script = FixedScript(reply)
+    client = LengthBoundedChatCompletionClient(StubChatCompletionClient(script=script), "Host", host, LIMITS)
+    return client, script
+
+
+def test_limits_come_from_dialogue_rules():
+    assert sentence_limits(DIALOGUE_RULES) == LIMITS
+
+
+def test_sentence_cut_counts_latin_and_cjk_ends():
+    assert sentence_cut("One. Two. Three.", 2) == len("One. Two.")
+    assert sentence_cut("一。二！三？", 2) == len("一。二！")
+    # A Latin full stop only ends a sentence before whitespace
+    assert sentence_cut("Pi is 3.14 today. Yes", 1) == len("Pi is 3.14 today.")
+    assert sentence_cut("Only one.", 2) is None
+
+
+def test_ends_sentence():
+    assert ends_sentence("Done. ")
+    assert ends_sentence("完了。")
+    assert not ends_sentence("Cut off mid")
+
+
+def test_create_trims_to_the_limit():
+    client, _ = bounded(LONG_REPLY)
+    result = asyncio.run(client.create([SystemMessage(content="You are the host"), UserMessage(content="Hi", source="user")]))
+    assert result.content == "One thing. Two things!"
+    assert result.finish_reason == "length"
+    assert client.is_complete(result)
+
+
+def test_guest_limit_depends_on_earlier_turns():
+    client, _ = bounded(LONG_REPLY, host=False)
+    first = [UserMessage(content="Hi", source="user")]
+    later = [*first, AssistantMessage(content="Earlier.", source="Host"), UserMessage(content="More", source="user")]
+    assert asyncio.run(client.create(first)).content == "One thing. Two things! Three things? Four things."
+    assert asyncio.run(client.create(later)).content == "One thing. Two things!"
+
+
+def test_stream_stops_past_the_limit():
+    client, _ = bounded(LONG_REPLY)
+
+    async def collect():
+        return [chunk async for chunk in client.create_stream([UserMessage(content="Hi", source="user")])]
+
+    chunks = asyncio.run(collect())
+    text = "".join(chunk for chunk in chunks if isinstance(chunk, str))
+    assert text.strip() == "One thing. Two things!"
+    assert chunks[-1].finish_reason == "length"
+    # Every generated token is still counted
+    assert chunks[-1].usage.completion_tokens > 0
+
+
+def test_reply_at_its_limit_is_not_marked_cut():
+    client, _ = bounded("One thing. Two things.")
+    result = asyncio.run(client.create([UserMessage(content="Hi", source="user")]))
+    assert result.finish_reason == "stop"
+
+
+def test_cut_reply_is_served_from_the_cache():
+    client, script = bounded(LONG_REPLY)
+    cached = CachedChatCompletionClient(client, CompletionCache(), agent="Host", model="stub")
+    messages = [UserMessage(content="Hi", source="user")]
+
+    first = asyncio.run(cached.create(messages))
+    second = asyncio.run(cached.create(messages))
+    assert script.calls == 1
+    assert second.cached
+    assert second.content == first.content == "One thing. Two things!"
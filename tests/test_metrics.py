@@ -0,0 +1,64 @@
+import pytest
+from metrics import Histogram, MetricsRegistry, TurnTracer, panel_metrics
+
+
+def test_quantile_interpolates_inside_a_bucket():
+    histogram = Histogram((1.0, 2.0, 4.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 0]
+    assert histogram.quantile(0.25) == pytest.approx(1.0)
+    assert histogram.quantile(0.5) == pytest.approx(1.5)
+    assert histogram.quantile(1.0) == pytest.approx(4.0)
+
+
+def test_bounds_are_inclusive_and_overflow_is_capped():
+    histogram = Histogram((1.0, 2.0))
+    histogram.observe(1.0)
+    histogram.observe(50.0)
+    assert histogram.counts == [1, 0, 1]
+    # Values past the last bucket can only be placed at its bound
+    assert histogram.quantile(0.99) == pytest.approx(2.0)
+
+
+def test_render_is_prometheus_text():
+    metrics = MetricsRegistry()
+    metrics.counter("turns_total", "Finished turns")
+    metrics.histogram("ttft_seconds", "Time to first token", (0.1, 1.0))
+    metrics.inc("turns_total", agent="Host")
+    metrics.inc("turns_total", 2, agent='Sultan "the Conqueror"\\')
+    metrics.observe("ttft_seconds", 0.05, agent="Host")
+    metrics.observe("ttft_seconds", 0.5, agent="Host")
+    assert metrics.render() == (
+        "# HELP turns_total Finished turns\n"
+        "# TYPE turns_total counter\n"
+        'turns_total{agent="Host"} 1\n'
+        'turns_total{agent="Sultan \\"the Conqueror\\"\\\\"} 2\n'
+        "# HELP ttft_seconds Time to first token\n"
+        "# TYPE ttft_seconds histogram\n"
+        'ttft_seconds_bucket{agent="Host",le="0.1"} 1\n'
+        'ttft_seconds_bucket{agent="Host",le="1.0"} 2\n'
+        'ttft_seconds_bucket{agent="Host",le="+Inf"} 2\n'
+        'ttft_seconds_sum{agent="Host"} 0.55\n'
+        'ttft_seconds_count{agent="Host"} 2\n'
+    )
+
+
+def test_tracer_spans_and_token_totals():
+    metrics = panel_metrics()
+    tracer = TurnTracer(metrics, models={"Host": "big", "selector": "small"})
+    tracer.selected("llm", 0.01)
+    tracer.selector_call(0.2, prompt_tokens=300, completion_tokens=2)
+    tracer.completion("Host", ttft=0.1, seconds=0.5, prompt_tokens=400, completion_tokens=40)
+    tracer.completion("Ada", ttft=None, seconds=0.3, prompt_tokens=100, completion_tokens=20)
+
+    first, second = tracer.spans
+    assert first["selector"] == "llm" and first["selector_ms"] == pytest.approx(210)
+    assert second["selector"] is None and second["turn"] == 2
+    assert tracer.usage["small"] == {"calls": 1, "prompt_tokens": 300, "completion_tokens": 2}
+    assert tracer.usage["unknown"]["completion_tokens"] == 20
+    rendered = metrics.render()
+    assert 'panel_turns_total{agent="Host",selector="llm"} 1' in rendered
+    assert 'panel_turns_total{agent="Ada",selector="none"} 1' in rendered
+    assert tracer.cancelled("disconnect", max_turns=12)["tokens_saved_estimate"] == 280 * 10
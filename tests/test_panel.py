@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+from panel import DISCONNECTED, PANEL_DEADLINE, PROTOCOL_DELTAS, TURN_DEADLINE, DeadlineExceeded, Panel
+
+
+class Turns:
+    """Team events: one turn_end per entry of `delays`, each after that many seconds"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.finished = False
+        self.cancelled = False
+
+    async def __aiter__(self):
+        try:
+            for turn, delay in enumerate(self.delays, start=1):
+                await asyncio.sleep(delay)
+                yield {"type": "turn_end", "turn": turn}
+            self.finished = True
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+async def collect(panel: Panel, turns: Turns) -> list[dict]:
+    return [event async for event in panel.stream(turns.__aiter__())]
+
+
+def test_stream_merges_notifications_in_arrival_order():
+    async def run():
+        panel = Panel(PROTOCOL_DELTAS)
+        panel.notify({"type": "queue", "position": 1})
+        return await collect(panel, Turns([0.01, 0.01]))
+
+    assert [event["type"] for event in asyncio.run(run())] == ["queue", "turn_end", "turn_end"]
+
+
+def test_turn_deadline_runs_from_the_last_finished_turn():
+    async def run():
+        # Three turns of 0.05s fit a 0.1s turn deadline though the panel takes longer
+        panel = Panel(PROTOCOL_DELTAS, turn_deadline=0.1)
+        events = await collect(panel, Turns([0.05, 0.05, 0.05]))
+        assert len(events) == 3 and panel.cancelled is None
+
+        panel, turns = Panel(PROTOCOL_DELTAS, turn_deadline=0.1), Turns([0.01, 1])
+        with pytest.raises(DeadlineExceeded, match="Turn deadline of 0.1s"):
+            await collect(panel, turns)
+        return panel, turns
+
+    panel, turns = asyncio.run(run())
+    assert panel.cancelled == TURN_DEADLINE
+    assert panel.cancellation.is_cancelled()
+    assert turns.cancelled
+
+
+def test_panel_deadline_covers_the_whole_run():
+    async def run():
+        panel, turns = Panel(PROTOCOL_DELTAS, deadline=0.12, turn_deadline=1), Turns([0.05] * 5)
+        seen = []
+        with pytest.raises(DeadlineExceeded, match="Deadline of 0.12s"):
+            async for event in panel.stream(turns.__aiter__()):
+                seen.append(event)
+        return panel, seen
+
+    panel, seen = asyncio.run(run())
+    assert panel.cancelled == PANEL_DEADLINE
+    assert 1 <= len(seen) < 5
+
+
+def test_consumer_leaving_cancels_the_panel():
+    async def run():
+        panel, turns = Panel(PROTOCOL_DELTAS), Turns([0.01, 1, 1])
+        stream = panel.stream(turns.__aiter__())
+        assert (await stream.__anext__())["turn"] == 1
+        await stream.aclose()
+        return panel, turns
+
+    panel, turns = asyncio.run(run())
+    assert panel.cancelled == DISCONNECTED
+    assert turns.cancelled and not turns.finished
+
+
+def test_until_disconnected_keeps_polling_a_slow_turn(engine, monkeypatch):
+    monkeypatch.setattr(engine, "DISCONNECT_POLL_SECONDS", 0.02)
+    polls = []
+
+    async def connected():
+        polls.append(True)
+        return False
+
+    async def run():
+        turns = Turns([0.01, 0.1])
+        return [event async for event in engine.until_disconnected(turns.__aiter__(), connected)], turns
+
+    events, turns = asyncio.run(run())
+    # No event for several polls is not an error while the client is there
+    assert [event["turn"] for event in events] == [1, 2]
+    assert len(polls) >= 2 and turns.finished
+
+
+def test_until_disconnected_cancels_the_events_once_the_client_is_gone(engine, monkeypatch):
+    monkeypatch.setattr(engine, "DISCONNECT_POLL_SECONDS", 0.02)
+    gone = asyncio.Event()
+
+    async def disconnected():
+        return gone.is_set()
+
+    async def run():
+        turns, received = Turns([0.01, 5]), []
+        async for event in engine.until_disconnected(turns.__aiter__(), disconnected):
+            received.append(event)
+            gone.set()
+        # The pump is cancelled without being awaited; let it unwind
+        await asyncio.sleep(0.01)
+        return received, turns
+
+    received, turns = asyncio.run(run())
+    assert [event["turn"] for event in received] == [1]
+    assert turns.cancelled
@@ -0,0 +1,90 @@
+import time
+from panel import PROTOCOL_DELTAS, PROTOCOL_MESSAGES, already_sent
+from panel_store import FAILED, FINISHED, RUNNING, SQLitePanelStore
+
+ROSTER = {"host": "Host", "guests": ["Ada", "Grace"]}
+
+
+def store(tmp_path, **kwargs) -> SQLitePanelStore:
+    panels = SQLitePanelStore(tmp_path / "panels.db", **kwargs)
+    panels.create("p1", "I feel lost at work", ROSTER, PROTOCOL_DELTAS, owner="w1", lease_seconds=30)
+    return panels
+
+
+def test_events_are_numbered_and_replayed_after_a_seq(tmp_path):
+    panels = store(tmp_path)
+    for seq in (1, 2, 3):
+        assert panels.append("p1", "w1", seq, {"type": "delta", "n": seq})
+    # A seq at or below the last one is never written twice
+    assert not panels.append("p1", "w1", 3, {"type": "delta", "n": 99})
+    assert [seq for seq, _ in panels.events("p1", after=1)] == [2, 3]
+    assert panels.get("p1")["last_seq"] == 3
+    assert panels.get("p1")["roster"] == ROSTER
+
+
+def test_live_lease_cannot_be_claimed(tmp_path):
+    panels = store(tmp_path)
+    assert not panels.claim("p1", "w2", lease_seconds=30)
+    assert panels.renew("p1", "w1", lease_seconds=30)
+    assert panels.get("p1")["owner"] == "w1"
+
+
+def test_lapsed_lease_moves_the_panel_to_its_claimer(tmp_path):
+    panels = store(tmp_path)
+    panels.append("p1", "w1", 1, {"type": "turn_start"})
+    panels.release("p1", "w1")
+    assert panels.claim("p1", "w2", lease_seconds=30)
+    # Only one worker wins the lapsed lease
+    assert not panels.claim("p1", "w3", lease_seconds=30)
+    # The old owner's writes are refused from here on
+    assert not panels.append("p1", "w1", 2, {"type": "delta"})
+    assert not panels.renew("p1", "w1", lease_seconds=30)
+    assert not panels.finish("p1", "w1", FAILED)
+    assert panels.append("p1", "w2", 2, {"type": "delta"})
+    assert panels.get("p1")["status"] == RUNNING
+
+
+def test_finished_panels_are_not_claimed_and_drop_their_journal(tmp_path):
+    panels = store(tmp_path)
+    panels.save_journal("p1", {"turns": [["Host", "Welcome"]]})
+    assert panels.load_journal("p1") == {"turns": [["Host", "Welcome"]]}
+    assert panels.finish("p1", "w1", FINISHED)
+    panels.release("p1", "w1")
+    assert not panels.claim("p1", "w2", lease_seconds=30)
+    assert panels.load_journal("p1") is None
+
+
+def test_old_panels_are_pruned_when_another_ends(tmp_path):
+    panels = store(tmp_path, retention_seconds=0)
+    panels.append("p1", "w1", 1, {"type": "turn_start"})
+    panels.finish("p1", "w1", FINISHED)
+    time.sleep(0.01)
+    panels.create("p2", "Another topic", ROSTER, PROTOCOL_DELTAS, owner="w1", lease_seconds=30)
+    panels.finish("p2", "w1", FINISHED)
+    assert panels.get("p1") is None
+    # Events go with their panel
+    assert panels.events("p1") == []
+
+
+def turn(number: int, speaker: str) -> list[dict]:
+    return [
+        {"type": "turn_start", "turn": number, "speaker": speaker},
+        {"type": "delta", "turn": number, "speaker": speaker, "content": "..."},
+        {"type": "turn_end", "turn": number, "speaker": speaker},
+    ]
+
+
+def test_rerun_skips_finished_turns_and_repeats_a_cut_one():
+    task = {"type": "message", "speaker": "user", "content": "I feel lost at work"}
+    sent = [task, *turn(1, "Host"), *turn(2, "Ada")[:2]]
+    seen = already_sent(sent, PROTOCOL_DELTAS)
+    rerun = [task, *turn(1, "Host"), *turn(2, "Ada"), *turn(3, "Host")]
+    unsent = [event for event in rerun if not seen(event)]
+    # Turn 2 was cut off mid-stream, so it is sent again from its turn_start
+    assert unsent == [*turn(2, "Ada"), *turn(3, "Host")]
+
+
+def test_rerun_skips_as_many_messages_as_were_sent():
+    messages = [{"type": "message", "speaker": speaker, "content": speaker} for speaker in ("user", "Host", "Ada")]
+    seen = already_sent(messages[:2], PROTOCOL_MESSAGES)
+    assert [event for event in messages if not seen(event)] == messages[2:]
@@ -0,0 +1,21 @@
+from persona_cards import ROOT, extractive_card, is_statement
+
+
+def test_statements_are_whole_sentences():
+    assert is_statement("She founded the company in 2012 with four friends.")
+    assert is_statement("“我们确实不是一个新闻客户端，做最懂你的信息平台。”")
+    assert not is_statement("Born in 1983.")
+    assert not is_statement("Early years and the first company")
+    assert not is_statement("——2019年《沸腾新十年：移动互联网丛林里的勇敢穿越者》作者拜访张一鸣>>")
+    assert not is_statement("See https://example.com/interview for the full 2014 interview.")
+    assert not is_statement("The valuation was reported at the time [3] by several outlets.")
+    assert not is_statement("除了这次风波（2014年《今日头条：一个内容APP，何以估值5亿美元？")
+    assert not is_statement("- grew the team to 200 people by the end of 2015.")
+
+
+def test_key_facts_skip_citations():
+    text = (ROOT / "documents" / "zym.txt").read_text(encoding="utf-8")
+    card = extractive_card(text)
+    assert card.key_facts
+    for line in card.core_story + card.key_facts:
+        assert is_statement(line), line
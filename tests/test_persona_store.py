@@ -0,0 +1,68 @@
+import json
+import pytest
+from persona_store import PersonaStore
+
+
+def make_store(tmp_path, count: int = 25) -> PersonaStore:
+    store = PersonaStore(tmp_path / "personas.db", legacy_json=None)
+    for index in range(count):
+        store.add({
+            "name": f"Guest{index:02d}",
+            "description": "A composer" if index % 2 else "A physicist",
+            "tags": "Music, Baroque" if index % 2 else ["science"],
+        })
+    return store
+
+
+def test_query_pages_in_name_order(tmp_path):
+    store = make_store(tmp_path)
+    first, total = store.query(limit=10)
+    last, _ = store.query(limit=10, offset=20)
+    assert total == 25
+    assert [p["name"] for p in first] == [f"Guest{i:02d}" for i in range(10)]
+    assert [p["name"] for p in last] == [f"Guest{i:02d}" for i in range(20, 25)]
+
+
+def test_query_searches_names_and_descriptions(tmp_path):
+    store = make_store(tmp_path)
+    composers, total = store.query(search="compos", limit=100)
+    assert total == 12 and all(p["description"] == "A composer" for p in composers)
+    assert store.query(search="Guest07")[1] == 1
+    # LIKE wildcards in the search are taken literally
+    assert store.query(search="%")[1] == 0
+    assert store.query(search="Guest_1")[1] == 0
+
+
+def test_query_filters_by_tag(tmp_path):
+    store = make_store(tmp_path)
+    personas, total = store.query(tag="BAROQUE", search="Guest1")
+    assert total == 5
+    assert personas[0]["tags"] == ["baroque", "music"]
+
+
+def test_host_is_seeded_and_left_out_by_default(tmp_path):
+    legacy = tmp_path / "personas.json"
+    legacy.write_text(json.dumps([{"name": "Handel", "description": "A composer"}]))
+    store = PersonaStore(tmp_path / "personas.db", legacy_json=legacy)
+    assert store.names() == ["Handel"]
+    assert store.query(include_host=True)[1] == 2
+    assert store.host()["name"] == "Host"
+
+
+def test_add_never_replaces_a_persona(tmp_path):
+    store = make_store(tmp_path, count=1)
+    assert not store.add({"name": "Guest00", "description": "An impostor"})
+    assert store.get("Guest00")["description"] == "A physicist"
+    # The host's name is the show's, not a guest's
+    with pytest.raises(ValueError):
+        store.add({"name": "Host", "description": "A guest who wants the mic"})
+    assert store.host()["name"] == "Host" and "Host" not in store.names()
+
+
+def test_update_keeps_the_host(tmp_path):
+    store = make_store(tmp_path, count=1)
+    assert store.update({"name": "Host", "description": "A night-shift host", "tags": "radio"})
+    host = store.host()
+    assert host["is_host"] and host["description"] == "A night-shift host" and host["tags"] == ["radio"]
+    assert not store.update({"name": "Nobody", "description": "Not in the store"})
+    assert store.get("Nobody") is None
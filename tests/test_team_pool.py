@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from team_pool import TeamPool
+
+
+class FakeTeam:
+    def __init__(self, roster, reset_seconds: float = 0.0):
+        self.roster = roster
+        self.reset_seconds = reset_seconds
+        self.resets = 0
+
+    async def reset(self):
+        await asyncio.sleep(self.reset_seconds)
+        self.resets += 1
+
+
+def created(pool: TeamPool, roster) -> int:
+    return next(entry["created"] for entry in pool.snapshot()["rosters"] if entry["personas"] == list(roster.personas))
+
+
+class Roster:
+    model = "stub"
+    stream = False
+
+    def __init__(self, *guests: str):
+        self.personas = ("Host", *(guests or ("Guest",)))
+
+
+ROSTER = Roster()
+
+
+async def resets(pool: TeamPool) -> int:
+    """Check out ROSTER's team and hand it back; how often it was reset before"""
+    async with pool.checkout(ROSTER) as team:
+        return team.resets
+
+
+def test_teams_are_reused_and_capped():
+    async def run():
+        pool = TeamPool(FakeTeam, max_per_roster=1)
+        async with pool.checkout(ROSTER) as first:
+            waiting = asyncio.create_task(pool.checkout(ROSTER).__aenter__())
+            await asyncio.sleep(0)
+            assert not waiting.done()
+        second = await waiting
+        assert second is first and first.resets == 1
+        return pool.snapshot()
+
+    stats = asyncio.run(run())
+    assert (stats["hits"], stats["misses"], stats["waits"]) == (1, 1, 1)
+
+
+def test_failed_run_discards_the_team():
+    async def run():
+        pool = TeamPool(FakeTeam, max_per_roster=1)
+        with pytest.raises(RuntimeError):
+            async with pool.checkout(ROSTER):
+                raise RuntimeError("mid-turn")
+        async with pool.checkout(ROSTER):
+            pass
+        return pool
+
+    pool = asyncio.run(run())
+    assert pool.stats.discarded == 1 and pool.stats.misses == 2
+
+
+def test_cancel_during_release_keeps_capacity():
+    async def run():
+        pool = TeamPool(lambda roster: FakeTeam(roster, reset_seconds=0.05), max_per_roster=1)
+
+        async def panel():
+            async with pool.checkout(ROSTER):
+                pass
+
+        task = asyncio.create_task(panel())
+        await asyncio.sleep(0.01)  # now resetting the team
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The team is still reset and handed back
+        assert await asyncio.wait_for(resets(pool), 1) == 1
+        return pool
+
+    pool = asyncio.run(run())
+    assert created(pool, ROSTER) == 1 and pool.stats.hits == 1
+
+
+def test_cancel_while_discarding_keeps_capacity():
+    async def run():
+        pool = TeamPool(FakeTeam, max_per_roster=1)
+
+        checked_out, fail = asyncio.Event(), asyncio.Event()
+
+        async def failing_panel():
+            async with pool.checkout(ROSTER):
+                checked_out.set()
+                await fail.wait()
+                raise RuntimeError("mid-turn")
+
+        task = asyncio.create_task(failing_panel())
+        await checked_out.wait()
+        # The release has to wait for the pool's lock, where it is cancelled
+        async with pool._available:
+            fail.set()
+            await asyncio.sleep(0.01)
+            task.cancel()
+        with pytest.raises((asyncio.CancelledError, RuntimeError)):
+            await task
+        await asyncio.wait_for(resets(pool), 1)
+        return pool
+
+    pool = asyncio.run(run())
+    assert created(pool, ROSTER) == 1
+
+
+def test_idle_teams_are_capped_across_rosters():
+    async def run():
+        pool = TeamPool(FakeTeam, max_per_roster=2, max_idle=2)
+        ada, grace, alan = Roster("Ada"), Roster("Grace"), Roster("Alan")
+        for roster in (ada, grace):
+            async with pool.checkout(roster):
+                pass
+        # Grace's team is used again, so Ada's is the least recent
+        async with pool.checkout(grace):
+            pass
+        async with pool.checkout(alan):
+            pass
+        return pool, ada, grace, alan
+
+    pool, ada, grace, alan = asyncio.run(run())
+    stats = pool.snapshot()
+    assert stats["evicted"] == 1
+    assert {entry["personas"][1]: entry["idle"] for entry in stats["rosters"]} == {"Grace": 1, "Alan": 1}
+    # Evicted teams no longer count against their roster
+    assert ada not in pool._created and created(pool, grace) == 1
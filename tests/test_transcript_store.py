@@ -0,0 +1,75 @@
+import asyncio
+from panel import PROTOCOL_DELTAS, PROTOCOL_MESSAGES, replay_events
+from transcript_store import TranscriptRecorder, TranscriptStore
+
+TURNS = [
+    ("Host", "Welcome to the show. Tonight a listener feels lost at work."),
+    ("Ada", "I copied tables by hand for years, and it taught me patience."),
+    ("Host", "Thank you both for coming."),
+]
+
+
+def recorded_panel() -> dict:
+    """A short panel as /chat streamed it under protocol 2"""
+    recorder = TranscriptRecorder("ep1", "I feel lost at work", ["Host", "Ada"], model="stub")
+    recorder.add({"type": "message", "protocol": PROTOCOL_DELTAS, "speaker": "user",
+                  "content": "I feel lost at work", "timestamp": "2026-01-01T20:00:00"})
+    for turn, (speaker, content) in enumerate(TURNS, start=1):
+        recorder.add({"type": "turn_start", "turn": turn, "speaker": speaker})
+        for word in content.split(" "):
+            recorder.add({"type": "delta", "turn": turn, "speaker": speaker, "content": word})
+        recorder.add({"type": "turn_end", "turn": turn, "speaker": speaker, "content": content,
+                      "timestamp": f"2026-01-01T20:0{turn}:00"})
+    recorder.add({"type": "episode_end", "stop_reason": "Host said goodbye", "stats": {"turns": 3}})
+    return recorder.transcript()
+
+
+async def replayed(transcript: dict, protocol: int) -> list[dict]:
+    return [event async for event in replay_events(transcript, protocol)]
+
+
+def test_finished_panel_round_trips(tmp_path):
+    store = TranscriptStore(tmp_path / "transcripts.db")
+    transcript = recorded_panel()
+    assert store.append(transcript)
+    # Stored episodes are never overwritten
+    assert not store.append({**transcript, "messages": []})
+
+    saved = store.get("ep1")
+    assert saved["messages"] == transcript["messages"]
+    assert saved["turns"] == 3 and saved["stop_reason"] == "Host said goodbye"
+    assert saved["stats"] == {"turns": 3} and saved["personas"] == ["Host", "Ada"]
+    summaries, total = store.query(persona="Ada", search="lost")
+    assert total == 1 and summaries[0]["id"] == "ep1"
+    assert store.query(persona="Grace")[1] == 0
+
+
+def test_replay_as_protocol_2(tmp_path):
+    store = TranscriptStore(tmp_path / "transcripts.db")
+    store.append(recorded_panel())
+    events = asyncio.run(replayed(store.get("ep1"), PROTOCOL_DELTAS))
+
+    assert events[0]["type"] == "message" and events[0]["speaker"] == "user"
+    assert [e["speaker"] for e in events if e["type"] == "turn_start"] == ["Host", "Ada", "Host"]
+    for turn, (_, content) in enumerate(TURNS, start=1):
+        deltas = [e["content"] for e in events if e["type"] == "delta" and e["turn"] == turn]
+        assert "".join(deltas) == content
+    end = events[-1]
+    assert end["type"] == "episode_end" and end["replay"] and end["turns"] == 3
+    assert end["episode_id"] == "ep1" and end["stop_reason"] == "Host said goodbye"
+
+    # Recording the replay gives back the same transcript
+    again = TranscriptRecorder("ep1", "I feel lost at work", ["Host", "Ada"], model="stub")
+    for event in events:
+        again.add(event)
+    assert again.messages == store.get("ep1")["messages"]
+
+
+def test_replay_as_protocol_1(tmp_path):
+    store = TranscriptStore(tmp_path / "transcripts.db")
+    store.append(recorded_panel())
+    events = asyncio.run(replayed(store.get("ep1"), PROTOCOL_MESSAGES))
+
+    assert {event["type"] for event in events} == {"message"}
+    assert [(e["speaker"], e["content"]) for e in events] == [("user", "I feel lost at work"), *TURNS]
+    assert events[1]["timestamp"] == "2026-01-01T20:01:00"
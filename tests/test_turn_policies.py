@@ -0,0 +1,82 @@
+import turn_policies
+from metrics import panel_metrics
+from turn_policies import Deadline, EarlyStop, Repetition, Stall, TokenBudget, default_policies
+
+TURNS = [
+    ("Host", "Welcome to the show. Tonight we talk about feeling lost at work."),
+    ("Ada", "I spent my first years copying tables of numbers by hand, and it taught me patience."),
+    ("Host", "Grace, what kept you going when the work felt pointless?"),
+    ("Grace", "A bug in the machine. Finding it made the whole team curious again."),
+]
+
+
+def test_token_budget_counts_every_turn():
+    policy = TokenBudget(100)
+    assert policy.observe("Host", "", 60) is None
+    assert "100" in policy.observe("Ada", "", 40)
+    policy.start()
+    assert policy.used == 0
+
+
+def test_deadline_runs_from_the_panel_start(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(turn_policies.time, "monotonic", lambda: now[0])
+    policy = Deadline(30)
+    now[0] = 1000.0
+    # Time spent waiting in the pool doesn't count
+    policy.start()
+    now[0] += 29
+    assert policy.observe("Host", "", 0) is None
+    now[0] += 1
+    assert policy.observe("Host", "", 0).startswith("Deadline of 30s")
+
+
+def test_repetition_catches_echoes_within_the_window():
+    policy = Repetition(threshold=0.9, window=2)
+    for speaker, text in TURNS[:3]:
+        assert policy.observe(speaker, text, 0) is None
+    reason = policy.observe("Ada", TURNS[2][1].upper(), 0)
+    assert reason.startswith("Ada repeated a recent turn by Host")
+    # Out of the window, a repeat is let through
+    assert policy.observe("Host", TURNS[0][1], 0) is None
+
+
+def test_stall_needs_patience_turns_in_a_row():
+    policy = Stall(patience=2, min_novelty=0.2)
+    for speaker, text in TURNS:
+        assert policy.observe(speaker, text, 0) is None
+    assert policy.observe("Ada", TURNS[1][1] + " " + TURNS[3][1], 0) is None
+    assert "2 turns in a row" in policy.observe("Grace", TURNS[3][1], 0)
+    # New content resets the count
+    policy = Stall(patience=2)
+    policy.observe("Ada", TURNS[1][1], 0)
+    policy.observe("Ada", TURNS[1][1], 0)
+    assert policy.stalled == 1
+    policy.observe("Grace", "Something else entirely, never said before tonight.", 0)
+    assert policy.stalled == 0
+
+
+def test_early_stop_reports_the_turns_it_saved():
+    metrics = panel_metrics()
+    early_stop = EarlyStop([TokenBudget(250)], max_turns=12, metrics=metrics)
+    for speaker, text in TURNS[:2]:
+        assert early_stop.observe(speaker, text, tokens=100) is None
+    reason = early_stop.observe(*TURNS[2], tokens=100)
+    assert reason
+    assert early_stop.stop == {"policy": "token_budget", "message": reason, "turns": 3,
+                               "turns_saved": 9, "tokens_saved_estimate": 900}
+    # Once stopped, later turns change nothing
+    assert early_stop.observe(*TURNS[3], tokens=100) == reason
+    assert early_stop.turns == 3
+    rendered = metrics.render()
+    assert 'panel_early_stops_total{policy="token_budget"} 1' in rendered
+    assert 'panel_turns_saved_total{policy="token_budget"} 9' in rendered
+    early_stop.start()
+    assert early_stop.stop is None and early_stop.turns == 0
+
+
+def test_default_policies_leave_out_disabled_settings():
+    assert [p.name for p in default_policies()] == ["repetition", "stall"]
+    assert [p.name for p in default_policies(token_budget=0, repetition_threshold=0, stall_turns=0)] == []
+    assert [p.name for p in default_policies(token_budget=5000, deadline_seconds=60)] == \
+        ["token_budget", "deadline", "repetition", "stall"]
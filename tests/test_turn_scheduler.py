@@ -0,0 +1,76 @@
+from turn_scheduler import CLOSING, HOST, INTERACTION, OPENING, RuleBasedScheduler, persona_aliases
+
+ALIASES = {"Ada": ["ada"], "Grace": ["grace"], "Alan": ["alan"]}
+
+
+def scheduler(guests, max_turns):
+    return RuleBasedScheduler([HOST, *guests], max_turns, aliases=ALIASES)
+
+
+def run_panel(rules: RuleBasedScheduler, say=lambda speaker, index: f"{speaker} speaks") -> list[str]:
+    """Speakers of a whole panel when every turn says `say(speaker, index)`"""
+    turns = [("user", "What makes a good first program?")]
+    while len(turns) - 1 < rules.max_turns:
+        speaker = rules.select(turns)
+        turns.append((speaker, say(speaker, len(turns) - 1)))
+    return [speaker for speaker, _ in turns[1:]]
+
+
+def test_phases_follow_dialogue_rules():
+    rules = scheduler(["Ada", "Grace"], 12)
+    assert rules.closing_start == 8
+    speakers = run_panel(rules)
+    # Opening: every guest gives a first speech before anyone speaks twice
+    assert speakers[:4] == [HOST, "Ada", HOST, "Grace"]
+    # Closing: summary question, one answer per guest, closing summary
+    assert speakers[8:] == [HOST, "Ada", "Grace", HOST]
+    assert rules.phase([("user", "")] + [(s, "") for s in speakers[:3]]) == OPENING
+    assert rules.phase([("user", "")] + [(s, "") for s in speakers[:4]]) == INTERACTION
+    assert rules.phase([("user", "")] + [(s, "") for s in speakers[:8]]) == CLOSING
+
+
+def test_closing_never_starts_before_every_first_speech():
+    rules = scheduler(["Ada", "Grace", "Alan"], 6)
+    # Six turns can't hold the opening and a full closing; the opening wins
+    assert rules.closing_start == 6
+    assert run_panel(rules) == [HOST, "Ada", HOST, "Grace", HOST, "Alan"]
+
+
+def test_host_invitation_and_guest_resonance():
+    rules = scheduler(["Ada", "Grace"], 16)
+    lines = {4: "Ada made her case; Grace, do you agree?", 5: "I disagree with Ada here."}
+    speakers = run_panel(rules, lambda speaker, index: lines.get(index, f"{speaker} speaks"))
+    # The host's question goes to Grace, who names Ada, who gets one comment back
+    assert speakers[4:8] == [HOST, "Grace", "Ada", HOST]
+
+
+def test_summary_question_follows_a_guest_turn():
+    rules = scheduler(["Ada", "Grace"], 12)
+    lines = {5: "Grace would say otherwise."}
+    speakers = run_panel(rules, lambda speaker, index: lines.get(index, f"{speaker} speaks"))
+    # Ada names Grace at 5 and Grace answers at 6; the turn before closing stays a guest's
+    assert speakers[5:9] == ["Ada", "Grace", "Ada", HOST]
+
+
+def test_closing_answers_fan_out():
+    rules = scheduler(["Ada", "Grace"], 12)
+    turns = [("user", "")] + [(speaker, "") for speaker in run_panel(rules)]
+    assert rules.fan_out(turns[:rules.closing_start + 1]) == []
+    assert rules.fan_out(turns[:rules.closing_start + 2]) == ["Ada", "Grace"]
+    assert rules.fan_out(turns[:rules.closing_start + 3]) == []
+
+
+def test_fan_out_stops_at_max_turns():
+    rules = scheduler(["Ada", "Grace", "Alan"], 9)
+    assert rules.closing_start == 6
+    turns = [("user", "")] + [(speaker, "") for speaker in run_panel(rules)[:7]]
+    # Only two answers fit before max_turns
+    assert rules.fan_out(turns) == ["Ada", "Grace"]
+
+
+def test_invited_takes_the_last_mention():
+    rules = RuleBasedScheduler([HOST, "SultanMehmed", "Laozi"], 12,
+                               aliases={"SultanMehmed": persona_aliases("SultanMehmed"), "Laozi": ["laozi", "老子"]})
+    assert rules.invited("Laozi, and then Mehmed: what do you say?") == "SultanMehmed"
+    assert rules.invited("请老子先说") == "Laozi"
+    assert rules.invited("Sultanate history") is None